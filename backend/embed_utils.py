@@ -1,8 +1,21 @@
 # embed_utils.py
+"""
+Embedding models and the cross-encoder reranker.
+
+Nothing heavy is imported at module load: sentence_transformers (and with
+it torch and transformers) is imported when a model is first loaded, either
+by the first embedding/rerank call or by warm_up(), which the API server
+runs in a background thread at startup (ZoteroChatbot.start_warm_up) so it
+can answer requests, and report readiness on /health, while models load.
+"""
 
-from sentence_transformers import SentenceTransformer, CrossEncoder
 import numpy as np
+import os
+import threading
 from typing import Optional
+from backend.embedding_cache import EmbeddingCache, QueryEmbeddingCache, DEFAULT_MAX_BYTES as DEFAULT_EMBEDDING_CACHE_BYTES
+from backend.onnx_embedder import OnnxEmbedder, export_model, read_export_config
+from backend.model_cache import ModelCache
 
 # Available embedding models with different speed/quality tradeoffs
 EMBEDDING_MODELS = {
@@ -38,8 +51,47 @@ EMBEDDING_MODELS = {
 
 # Default model configuration
 DEFAULT_MODEL_ID = 'bge-base'
+# Default number of texts per encode() call when embedding chunks in bulk
+DEFAULT_BATCH_SIZE = 32
+# Truncate very long texts to avoid memory issues
+MAX_SEQ_LENGTH = 512  # Max token length for models that do not declare one
+# Inference backends for EMBEDDING_MODELS: PyTorch, or ONNX Runtime on CPU
+# (exported once per model, see onnx_embedder.py), optionally int8-quantized
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_EMBEDDING_BACKEND = 'torch'
+# ONNX exports, shared by all profiles
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser("~"), ".zotero-llm", "models", "onnx")
+_embedding_backend = DEFAULT_EMBEDDING_BACKEND
+_onnx_dir = DEFAULT_ONNX_DIR
+
+# Most recently used model ID
 _current_model_id = DEFAULT_MODEL_ID
-_current_model: Optional[SentenceTransformer] = None
+
+# Loaded embedding models keyed by (model_id, backend): SentenceTransformer,
+# or OnnxEmbedder for the ONNX backends. Several stay loaded (LRU within a
+# memory budget) so switching between models does not reload them from disk.
+_model_cache = ModelCache(size_of=lambda model: model_nbytes(model))
+
+# Cross-encoder for re-ranking retrieved passages, loaded on first use
+# This is much more accurate than cosine similarity for relevance scoring
+RERANKER_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+_reranker = None
+
+# Serializes loading the reranker, so a warm-up and a first request never load it twice
+_reranker_lock = threading.Lock()
+
+# Progress of the last warm_up() call
+_warm_up_state = {"status": "idle", "error": None, "model_id": None, "backend": None}
+_warm_up_lock = threading.Lock()
+
+# On-disk embedding cache (one EmbeddingCache per model), disabled until configured
+_embedding_cache_dir: Optional[str] = None
+_embedding_cache_max_bytes = DEFAULT_EMBEDDING_CACHE_BYTES
+_embedding_caches: dict = {}
+_embedding_cache_lock = threading.Lock()
+
+# Embeddings of recent queries, keyed by ((model_id, backend), normalized query)
+_query_cache = QueryEmbeddingCache()
 
 def get_model_config(model_id: str = None) -> dict:
     """Get configuration for a specific embedding model."""
@@ -56,57 +108,338 @@ def get_embedding_dimension(model_id: str = None) -> int:
     """Get the embedding dimension for a specific model."""
     return get_model_config(model_id)['dimension']
 
-def load_embedding_model(model_id: str = None) -> SentenceTransformer:
-    """Load the embedding model, reusing cached instance if same model."""
-    global _current_model, _current_model_id
+def configure_embedding_backend(backend: str, onnx_dir: Optional[str] = None) -> None:
+    """Select the inference backend used from now on ('torch', 'onnx' or 'onnx-int8').
     
-    target_model_id = model_id or DEFAULT_MODEL_ID
+    Args:
+        backend: One of EMBEDDING_BACKENDS
+        onnx_dir: Optional directory for ONNX exports (default: DEFAULT_ONNX_DIR)
+    """
+    global _embedding_backend, _onnx_dir
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}. Available: {list(EMBEDDING_BACKENDS)}")
+    if backend != _embedding_backend:
+        _query_cache.clear()
+    _embedding_backend = backend
+    if onnx_dir:
+        _onnx_dir = onnx_dir
+
+def get_embedding_backend() -> str:
+    """Get the currently selected inference backend."""
+    return _embedding_backend
+
+def load_embedding_model(model_id: str = None, backend: str = None):
+    """Load the embedding model, reusing the loaded instance of the same model and backend.
     
-    # Return cached model if already loaded and same
-    if _current_model is not None and _current_model_id == target_model_id:
-        return _current_model
+    Concurrent calls for a model that is still loading wait for that load.
     
-    # Load new model
+    Returns:
+        SentenceTransformer for the 'torch' backend, otherwise an OnnxEmbedder
+        (both provide encode())
+    """
+    global _current_model_id
+    
+    target_model_id = model_id or DEFAULT_MODEL_ID
+    target_backend = backend or _embedding_backend
     config = get_model_config(target_model_id)
-    print(f"Loading embedding model: {config['name']} ({config['description']})")
-    _current_model = SentenceTransformer(config['name'])
+    
+    def load():
+        print(f"Loading embedding model: {config['name']} ({config['description']}) with {target_backend}")
+        if target_backend == 'torch':
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(config['name'])
+        return load_onnx_model(target_model_id, quantized=target_backend == 'onnx-int8')
+    
+    model = _model_cache.get((target_model_id, target_backend), load)
     _current_model_id = target_model_id
+    return model
+
+def model_nbytes(model) -> int:
+    """Estimated memory held by a loaded embedding model (parameters, or the ONNX graph size)."""
+    if isinstance(model, OnnxEmbedder):
+        return model.nbytes
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return 0
+    return sum(p.numel() * p.element_size() for p in parameters())
+
+def configure_model_cache(max_bytes: Optional[int] = None, idle_seconds: Optional[float] = None) -> None:
+    """Set the memory budget and idle timeout of loaded embedding models (None keeps the current value)."""
+    _model_cache.configure(max_bytes=max_bytes, idle_seconds=idle_seconds)
+
+def get_model_cache_stats() -> dict:
+    """Hit/miss/load counters, load time and loaded models of the embedding model cache."""
+    return _model_cache.stats()
+
+def load_onnx_model(model_id: str, quantized: bool = False) -> OnnxEmbedder:
+    """Load a model with ONNX Runtime, exporting it first if there is no current export."""
+    config = get_model_config(model_id)
+    model_dir = os.path.join(_onnx_dir, model_id)
+    export = read_export_config(model_dir)
+    if export is None or export.get('model_name') != config['name']:
+        export_model(config['name'], model_dir)
+    return OnnxEmbedder(model_dir, quantized=quantized)
+
+def embedding_cache_key(model_id: str, backend: str) -> str:
+    """Name of the embedding cache of a model and backend.
     
-    return _current_model
+    PyTorch vectors keep the plain model id (so existing caches stay valid);
+    the ONNX backends get caches of their own since their vectors differ
+    slightly (int8 noticeably).
+    """
+    return model_id if backend == 'torch' else f"{model_id}-{backend}"
 
-# Cross-encoder for re-ranking retrieved passages
-# This is much more accurate than cosine similarity for relevance scoring
-reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+def configure_embedding_cache(cache_dir: Optional[str], max_bytes: Optional[int] = None) -> None:
+    """Store computed embeddings under cache_dir and reuse them (None disables caching).
+    
+    Args:
+        cache_dir: Directory of the per-model caches, or None
+        max_bytes: Size budget of each model's cached vectors (unchanged if None)
+    """
+    global _embedding_cache_dir
+    with _embedding_cache_lock:
+        for cache in _embedding_caches.values():
+            cache.close()
+        _embedding_caches.clear()
+        _embedding_cache_dir = cache_dir
+    if max_bytes is not None:
+        set_embedding_cache_budget(max_bytes)
+
+def set_embedding_cache_budget(max_bytes: int) -> None:
+    """Change the size budget of each model's cached vectors; open caches over it are compacted."""
+    global _embedding_cache_max_bytes
+    with _embedding_cache_lock:
+        _embedding_cache_max_bytes = max_bytes
+        caches = list(_embedding_caches.values())
+    for cache in caches:
+        cache.max_bytes = max_bytes
+        cache.prune()
+
+def get_embedding_cache_stats() -> dict:
+    """Size, budget and hit/miss counters of each open embedding cache, by cache name."""
+    with _embedding_cache_lock:
+        caches = dict(_embedding_caches)
+    return {key: cache.stats() for key, cache in caches.items()}
+
+def get_embedding_cache(model_id: str = None, backend: str = None) -> Optional[EmbeddingCache]:
+    """Get the embedding cache for a model and backend, or None if caching is not configured."""
+    target_model_id = model_id or DEFAULT_MODEL_ID
+    target_backend = backend or _embedding_backend
+    key = embedding_cache_key(target_model_id, target_backend)
+    with _embedding_cache_lock:
+        if not _embedding_cache_dir:
+            return None
+        cache = _embedding_caches.get(key)
+        if cache is None:
+            config = get_model_config(target_model_id)
+            model_name = config['name'] if target_backend == 'torch' else f"{config['name']} ({target_backend})"
+            cache = EmbeddingCache(
+                _embedding_cache_dir, key, model_name, config['dimension'], max_bytes=_embedding_cache_max_bytes
+            )
+            _embedding_caches[key] = cache
+        return cache
+
+def get_reranker():
+    """Load the cross-encoder reranker on first use and return it."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            from sentence_transformers import CrossEncoder
+            print(f"Loading reranker: {RERANKER_MODEL}")
+            _reranker = CrossEncoder(RERANKER_MODEL)
+        return _reranker
+
+def warm_up(model_id: str = None) -> None:
+    """Load the embedding model and the reranker now instead of on the first request."""
+    target_model_id = model_id or DEFAULT_MODEL_ID
+    backend = _embedding_backend
+    with _warm_up_lock:
+        _warm_up_state.update(status="loading", error=None, model_id=target_model_id, backend=backend)
+    try:
+        load_embedding_model(target_model_id, backend)
+        get_reranker()
+    except Exception as e:
+        print(f"Model warm-up failed: {e}")
+        with _warm_up_lock:
+            _warm_up_state.update(status="error", error=str(e))
+        return
+    with _warm_up_lock:
+        _warm_up_state.update(status="ready", error=None)
+    print("Models loaded")
+
+def get_readiness() -> dict:
+    """Which models are loaded, for health checks.
+    
+    Returns:
+        Dict with 'ready' (the warmed-up embedding model and the reranker
+        are loaded), 'status' of the warm-up ('idle', 'loading', 'ready' or
+        'error'), 'embedding_model' and 'embedding_backend' of the warm-up,
+        'reranker' (bool), 'loaded_models' ("model_id/backend" of every
+        loaded embedding model) and 'error'
+    """
+    with _warm_up_lock:
+        state = dict(_warm_up_state)
+    loaded = _model_cache.keys()
+    model_loaded = (state["model_id"], state["backend"]) in loaded
+    return {
+        "ready": model_loaded and _reranker is not None,
+        "status": state["status"],
+        "embedding_model": state["model_id"],
+        "embedding_backend": state["backend"],
+        "reranker": _reranker is not None,
+        "loaded_models": [f"{mid}/{backend}" for mid, backend in loaded],
+        "error": state["error"],
+    }
+
+def clear_query_embedding_cache() -> None:
+    """Forget cached query embeddings (called when the embedding model changes)."""
+    _query_cache.clear()
+
+def get_query_embedding_cache_stats() -> dict:
+    """Entries, size cap and hit/miss counters of the query embedding cache."""
+    return _query_cache.stats()
 
 def get_embedding(text: str, model_id: str = None) -> np.ndarray:
     """Generate embeddings for semantic search.
     
+    Embeddings of recent queries are kept in memory, so repeating a query
+    with the same model and backend skips the encoder.
+    
     Args:
         text: Text to embed
         model_id: Optional model ID to use (defaults to current model)
     
     Returns:
-        numpy.ndarray: Embedding vector (dimension depends on model)
+        numpy.ndarray: Embedding vector (dimension depends on model), read-only
     """
-    model = load_embedding_model(model_id)
-    config = get_model_config(model_id)
+    model_key = (model_id or DEFAULT_MODEL_ID, _embedding_backend)
+    vector = _query_cache.get(model_key, text)
+    if vector is None:
+        vector = _query_cache.put(model_key, text, get_embeddings([text], model_id=model_id)[0])
+    return vector
+
+def truncate_to_tokens(model, texts: list[str]) -> tuple[list[str], list[int]]:
+    """Cut texts to what the model encodes, using the model's own tokenizer.
     
-    # Truncate very long texts to avoid memory issues
-    max_length = 512  # Standard max token length
-    if len(text) > max_length * 4:  # rough char estimate
-        text = text[:max_length * 4]
+    Texts longer than the model's max_seq_length (special tokens included)
+    are cut after the last token that fits, so the encoder only tokenizes
+    and the embedding cache only keys what the model actually sees.
     
-    embedding = model.encode([text])[0]
+    Args:
+        model: Loaded SentenceTransformer or OnnxEmbedder
+        texts: Texts to embed
     
-    # Validate dimension to catch configuration issues early
-    expected_dim = config['dimension']
-    if len(embedding) != expected_dim:
-        raise ValueError(
-            f"Embedding dimension mismatch! Expected {expected_dim}, got {len(embedding)}. "
-            f"Model: {config['name']}"
+    Returns:
+        (texts, token_counts): the texts, stripped (and lowercased for
+        uncased models) and cut where needed, and the number of tokens each
+        is encoded to
+    """
+    max_length = getattr(model, 'max_seq_length', None) or MAX_SEQ_LENGTH
+    texts = [str(text).strip() for text in texts]
+    if isinstance(model, OnnxEmbedder):
+        lower = model.do_lower_case
+    else:
+        tokenizer = getattr(model, 'tokenizer', None)
+        if not getattr(tokenizer, 'is_fast', False):
+            # No character offsets: leave truncation to the model, estimate lengths
+            return texts, [min(max_length, len(text) // 4 + 2) for text in texts]
+        lower = bool(getattr(model[0], 'do_lower_case', False))
+    # Offsets index the string that was tokenized, so that is the one cut; lowercasing
+    # can change lengths (e.g. "İ" becomes two characters), and the model lowercases anyway
+    if lower:
+        texts = [text.lower() for text in texts]
+    if isinstance(model, OnnxEmbedder):
+        # Truncates at max_seq_length; padding tokens have empty offsets
+        encodings = model.tokenizer.encode_batch(texts)
+        counts = [sum(e.attention_mask) for e in encodings]
+        offsets = [e.offsets for e in encodings]
+    else:
+        encoded = tokenizer(
+            texts, truncation=True, max_length=max_length, return_offsets_mapping=True,
+            return_attention_mask=False, return_token_type_ids=False,
         )
+        counts = [len(ids) for ids in encoded['input_ids']]
+        offsets = encoded['offset_mapping']
+    
+    for i, count in enumerate(counts):
+        if count >= max_length:
+            # Special tokens map to (0, 0), so the largest end is the last kept text token
+            texts[i] = texts[i][:max(end for _, end in offsets[i])]
+    return texts, counts
+
+def length_buckets(token_counts: list[int], batch_size: int) -> list[list[int]]:
+    """Group text positions into batches of similar token length, longest first.
+    
+    Each batch is padded to its longest text, so batching texts of similar
+    length keeps padding (wasted encoder compute) low.
+    """
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i], reverse=True)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+def get_embeddings(
+    texts: list[str],
+    model_id: str = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stats: Optional[dict] = None
+) -> np.ndarray:
+    """Generate embeddings for many texts in batched encode() calls.
+    
+    Texts are encoded with the backend selected by configure_embedding_backend.
+    Texts found in the embedding cache (see configure_embedding_cache) are not
+    encoded again. The rest are cut to the model's max_seq_length tokens and
+    batched by token length (see length_buckets), then the vectors are
+    returned in input order.
+    
+    Args:
+        texts: Texts to embed
+        model_id: Optional model ID to use (defaults to current model)
+        batch_size: Number of texts per encode() call
+        stats: Optional dict whose 'cache_hits'/'cache_misses' counters are incremented
+    
+    Returns:
+        numpy.ndarray: Array of shape (len(texts), dimension)
+    """
+    target_model_id = model_id or DEFAULT_MODEL_ID
+    backend = _embedding_backend
+    config = get_model_config(target_model_id)
+    expected_dim = config['dimension']
+    if not texts:
+        return np.zeros((0, expected_dim), dtype=np.float32)
+    
+    cache = get_embedding_cache(target_model_id, backend)
+    if cache is not None:
+        embeddings, found = cache.lookup(texts)
+        todo = [i for i in range(len(texts)) if not found[i]]
+    else:
+        embeddings = np.empty((len(texts), expected_dim), dtype=np.float32)
+        todo = list(range(len(texts)))
+    
+    if stats is not None:
+        stats["cache_hits"] = stats.get("cache_hits", 0) + len(texts) - len(todo)
+        stats["cache_misses"] = stats.get("cache_misses", 0) + len(todo)
+    
+    if not todo:
+        return embeddings
+    
+    model = load_embedding_model(target_model_id, backend)
+    batch_size = max(1, int(batch_size or DEFAULT_BATCH_SIZE))
+    todo_texts, token_counts = truncate_to_tokens(model, [texts[i] for i in todo])
+    
+    for batch in length_buckets(token_counts, batch_size):
+        vectors = model.encode([todo_texts[j] for j in batch], batch_size=batch_size, convert_to_numpy=True)
+        
+        # Validate dimension to catch configuration issues early
+        if vectors.shape[1] != expected_dim:
+            raise ValueError(
+                f"Embedding dimension mismatch! Expected {expected_dim}, got {vectors.shape[1]}. "
+                f"Model: {config['name']}"
+            )
+        embeddings[[todo[j] for j in batch]] = vectors
+    
+    if cache is not None:
+        cache.store([texts[i] for i in todo], embeddings[todo])
     
-    return embedding
+    return embeddings
 
 def rerank_passages(query: str, passages: list[str], top_k: int = None) -> list[tuple[int, float]]:
     """Re-rank passages using cross-encoder for better relevance scoring.
@@ -126,7 +459,7 @@ def rerank_passages(query: str, passages: list[str], top_k: int = None) -> list[
     pairs = [[query, passage] for passage in passages]
     
     # Get relevance scores
-    scores = reranker.predict(pairs)
+    scores = get_reranker().predict(pairs)
     
     # Sort by score (descending) and return indices with scores
     ranked = sorted(enumerate(scores), key=lambda x: x[1], reverse=True)
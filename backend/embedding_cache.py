@@ -0,0 +1,374 @@
+# embedding_cache.py
+"""
+Content-addressed on-disk cache of text embeddings.
+
+Embeddings are keyed by (embedding model, SHA-1 of the whitespace-normalized
+text), so re-indexing an unchanged library, or re-embedding a chunk that
+reappears after a PDF is replaced, does not run the encoder again.
+
+Layout under <cache_dir>/<model_id>/:
+- meta.json: model name, dimension and storage dtype; the cache is reset if
+  these no longer match the model it is opened for
+- vectors.<n>.bin: fixed-size rows of the storage dtype (float32 by default),
+  appended as new embeddings are computed and read back through np.memmap
+- index.sqlite: text hash -> row number and last access time, and which
+  vectors file is current
+
+The cache is size-bounded: once the vectors exceed the budget, the least
+recently used ones are dropped by compaction, which copies the kept rows to
+a new vectors file and switches to it in the same SQLite commit that
+renumbers them.
+
+QueryEmbeddingCache is a small in-memory LRU for query embeddings, so a
+repeated or retried question does not run the encoder at all.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Bump when the meaning of cached vectors or the index layout changes (e.g. different truncation)
+CACHE_FORMAT_VERSION = 2
+
+# Cached vectors are returned exactly as computed. "float16" halves the
+# footprint but cached vectors then differ from freshly computed ones (cosine
+# similarities by ~1e-3), so re-indexing from the cache is not bit-identical.
+DEFAULT_DTYPE = "float32"
+
+# Default size budget of the vectors of one embedding model
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+# Compact down to this fraction of the budget so compaction is not run on every store
+_EVICT_TARGET = 0.9
+
+# Rows copied per block during compaction
+_COPY_BLOCK_ROWS = 65536
+
+# Query embeddings kept in memory (~3 KB each at 768 dimensions)
+DEFAULT_QUERY_CACHE_ENTRIES = 1024
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so layout-only differences map to the same key."""
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    LRU embedding store for one embedding model, bounded by max_bytes.
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_id: str,
+        model_name: str,
+        dimension: int,
+        dtype: str = DEFAULT_DTYPE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.dir = os.path.join(cache_dir, model_id)
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.dimension * self.dtype.itemsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._mapped_rows = 0
+
+        os.makedirs(self.dir, exist_ok=True)
+        meta = {
+            "format": CACHE_FORMAT_VERSION,
+            "model_name": model_name,
+            "dimension": dimension,
+            "dtype": self.dtype.name,
+        }
+        meta_path = os.path.join(self.dir, "meta.json")
+        if self._read_meta(meta_path) != meta:
+            # Different model/dimension/dtype/layout: cached vectors are unusable
+            for name in os.listdir(self.dir):
+                if name.startswith(("vectors.", "index.sqlite")):
+                    try:
+                        os.remove(os.path.join(self.dir, name))
+                    except OSError:
+                        pass
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=2)
+
+        self._conn = sqlite3.connect(
+            os.path.join(self.dir, "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "key BLOB PRIMARY KEY, row INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rows_lru ON rows(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        current = self._conn.execute("SELECT value FROM state WHERE name = 'vectors_file'").fetchone()
+        self._vectors_name = current[0] if current else "vectors.0.bin"
+        self._vectors_path = os.path.join(self.dir, self._vectors_name)
+
+        # Remove vectors files of a compaction that was interrupted before its commit, or finished after it
+        for name in os.listdir(self.dir):
+            if name.startswith("vectors.") and name != self._vectors_name:
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                except OSError:
+                    pass
+
+        # Drop a partially written trailing row left by an interrupted append
+        if not os.path.exists(self._vectors_path):
+            open(self._vectors_path, "wb").close()
+        size = os.path.getsize(self._vectors_path)
+        self._rows = size // self.row_bytes
+        if size != self._rows * self.row_bytes:
+            os.truncate(self._vectors_path, self._rows * self.row_bytes)
+        self._conn.execute("DELETE FROM rows WHERE row >= ?", (self._rows,))
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Fetch cached embeddings.
+
+        Returns:
+            (vectors, found): float32 array of shape (len(texts), dimension) and a
+            boolean mask of which rows were found in the cache
+        """
+        keys = [text_key(t) for t in texts]
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        found = np.zeros(len(texts), dtype=bool)
+        if not keys:
+            return vectors, found
+
+        with self._lock:
+            rows = {}
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(self._conn.execute(
+                    f"SELECT key, row FROM rows WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            positions = [(i, rows[k]) for i, k in enumerate(keys) if k in rows]
+            if positions:
+                mmap = self._map()
+                idx = np.array([i for i, _ in positions])
+                vectors[idx] = mmap[[row for _, row in positions]]
+                found[idx] = True
+                now = time.time()
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE rows SET last_access = ? WHERE key = ?", [(now, key) for key in rows]
+                )
+                self._conn.execute("COMMIT")
+            self.hits += len(positions)
+            self.misses += len(keys) - len(positions)
+        return vectors, found
+
+    def store(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Append embeddings for texts that are not cached yet, compacting if over budget."""
+        if len(texts) == 0:
+            return
+        keys = [text_key(t) for t in texts]
+        data = np.ascontiguousarray(vectors, dtype=self.dtype).reshape(len(texts), self.dimension)
+
+        with self._lock:
+            new = []
+            seen = set()
+            for i, key in enumerate(keys):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if self._conn.execute("SELECT 1 FROM rows WHERE key = ?", (key,)).fetchone() is None:
+                    new.append(i)
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(data[new].tobytes())
+            first_row = self._rows
+            self._rows += len(new)
+            now = time.time()
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (key, row, last_access) VALUES (?, ?, ?)",
+                [(keys[i], first_row + n, now) for n, i in enumerate(new)],
+            )
+            self._conn.execute("COMMIT")
+            if self._rows * self.row_bytes > self.max_bytes:
+                self._compact_locked(self.max_bytes * _EVICT_TARGET)
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """Drop least recently used embeddings until the vectors fit in max_bytes.
+
+        Args:
+            max_bytes: Size to compact to (defaults to the cache's budget)
+
+        Returns:
+            Number of embeddings dropped
+        """
+        with self._lock:
+            limit = self.max_bytes if max_bytes is None else max_bytes
+            if self._rows * self.row_bytes <= limit:
+                return 0
+            return self._compact_locked(limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._rows,
+                "bytes": self._rows * self.row_bytes,
+                "max_bytes": self.max_bytes,
+                "dtype": self.dtype.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else None,
+                "compactions": self.compactions,
+                "evicted": self.evicted,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
+
+    def _map(self) -> np.ndarray:
+        """Memory-map the vectors file, remapping when rows were appended. Caller holds the lock."""
+        if self._mmap is None or self._mapped_rows != self._rows:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dimension)
+            )
+            self._mapped_rows = self._rows
+        return self._mmap
+
+    def _compact_locked(self, target_bytes: float) -> int:
+        """Keep the most recently used rows that fit in target_bytes. Caller holds the lock.
+
+        The kept rows are copied (in their current order) to a new vectors
+        file, which becomes current in the commit that renumbers them, so an
+        interruption leaves either the old or the new cache intact.
+        """
+        keep = int(target_bytes // self.row_bytes)
+        kept = self._conn.execute(
+            "SELECT key, row, last_access FROM rows ORDER BY last_access DESC, row DESC LIMIT ?", (keep,)
+        ).fetchall()
+        kept.sort(key=lambda entry: entry[1])
+
+        generation = int(self._vectors_name.split(".")[1]) + 1
+        new_name = f"vectors.{generation}.bin"
+        new_path = os.path.join(self.dir, new_name)
+        mmap = self._map()
+        with open(new_path, "wb") as f:
+            for start in range(0, len(kept), _COPY_BLOCK_ROWS):
+                block = [row for _, row, _ in kept[start:start + _COPY_BLOCK_ROWS]]
+                f.write(np.ascontiguousarray(mmap[block]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._conn.execute("BEGIN")
+        self._conn.execute("DELETE FROM rows")
+        self._conn.executemany(
+            "INSERT INTO rows (key, row, last_access) VALUES (?, ?, ?)",
+            [(key, n, last_access) for n, (key, _, last_access) in enumerate(kept)],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (name, value) VALUES ('vectors_file', ?)", (new_name,)
+        )
+        self._conn.execute("COMMIT")
+
+        dropped = self._rows - len(kept)
+        old_path = self._vectors_path
+        self._mmap = None
+        del mmap
+        self._vectors_name, self._vectors_path = new_name, new_path
+        self._rows = len(kept)
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass  # still mapped elsewhere (Windows); removed on the next open
+        self.compactions += 1
+        self.evicted += dropped
+        print(f"Embedding cache {os.path.basename(self.dir)}: dropped {dropped} least recently used embeddings")
+        return dropped
+
+    @staticmethod
+    def _read_meta(path: str):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU of query embeddings keyed by (model, normalized query).
+
+    The model part of the key is whatever identifies the vectors (model id
+    and backend), so entries of one model are never returned for another.
+    Cached vectors are read-only. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_QUERY_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_key: Hashable, query: str) -> Optional[np.ndarray]:
+        """Cached embedding of query for model_key, or None."""
+        key = (model_key, normalize_text(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model_key: Hashable, query: str, vector: np.ndarray) -> np.ndarray:
+        """Cache the embedding of query for model_key; returns the (read-only) cached vector."""
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        if self.max_entries <= 0:
+            return vector
+        with self._lock:
+            self._entries[(model_key, normalize_text(query))] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else None,
+            }
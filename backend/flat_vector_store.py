@@ -0,0 +1,443 @@
+# flat_vector_store.py
+"""
+Exact vector search over a contiguous, memory-mapped NumPy matrix.
+
+An alternative to Chroma's HNSW index for libraries where exact search is
+fast enough (up to around a million chunks) and for item-scoped queries,
+which only score the rows of the selected items instead of filtering an
+approximate search over the whole collection.
+
+FlatCollection mirrors the part of the Chroma collection API that
+ChromaClient uses (add/get/query/delete/count with item_id filters), so
+FlatVectorClient reuses everything else in ChromaClient: BM25, the item
+manifest, hybrid fusion and write buffering.
+
+Layout under <db_path>/flat_<collection name>/:
+- vectors-<generation>.bin: unit-normalized rows of the storage dtype
+  (float32 or float16), appended as chunks are added and read through np.memmap
+- chunks.sqlite: chunk id, item id, document and metadata per row, plus the
+  current vectors generation and storage settings
+
+Deleted chunks leave dead rows in the matrix until more than a quarter of it
+is dead; the live rows are then copied into a new generation.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.vector_db import ChromaClient, _item_scope
+
+DEFAULT_DTYPE = "float32"
+
+# Rows scored per matrix-vector product, bounding temporary memory during a query
+SCORE_BLOCK_ROWS = 65536
+
+# Rows converted to float32 at a time when scoring float16 storage (keeps the copy in cache)
+_CONVERT_ROWS = 2048
+
+# Rewrite the matrix once this fraction of its rows is dead (and at least this many)
+_COMPACT_RATIO = 0.25
+_COMPACT_MIN_ROWS = 10000
+
+
+class FlatCollection:
+    """
+    Chroma-compatible collection storing vectors in a flat memory-mapped matrix.
+
+    Supports where-filters on item_id only ({"item_id": id}, $eq and $in).
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, path: str, dtype: str = DEFAULT_DTYPE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._mmap = None
+        self._mapped_rows = 0
+        os.makedirs(path, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            os.path.join(path, "chunks.sqlite"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                item_id TEXT NOT NULL,
+                document TEXT,
+                metadata TEXT
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_item ON chunks (item_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+
+        settings = dict(self._conn.execute("SELECT key, value FROM settings").fetchall())
+        # The storage dtype is fixed once vectors have been written
+        self.dtype = np.dtype(settings.get("dtype", dtype))
+        self.dimension = int(settings["dimension"]) if "dimension" in settings else None
+        self._generation = int(settings.get("generation", 0))
+        self._set_setting("dtype", self.dtype.name)
+
+        # Remove files of generations that were replaced, or never committed
+        current = os.path.basename(self._vectors_path())
+        for name in os.listdir(path):
+            if name.startswith("vectors-") and name != current:
+                os.remove(os.path.join(path, name))
+
+        self._n_rows = 0
+        if self.dimension:
+            # Rows appended without being committed to SQLite (interrupted add) are dead
+            row_bytes = self.dimension * self.dtype.itemsize
+            size = os.path.getsize(self._vectors_path()) if os.path.exists(self._vectors_path()) else 0
+            self._n_rows = size // row_bytes
+            if size != self._n_rows * row_bytes:
+                os.truncate(self._vectors_path(), self._n_rows * row_bytes)
+        self._live = np.zeros(self._n_rows, dtype=bool)
+        rows = np.array([r for (r,) in self._conn.execute("SELECT row FROM chunks")], dtype=np.int64)
+        rows = rows[rows < self._n_rows]
+        self._live[rows] = True
+        self._conn.execute("DELETE FROM chunks WHERE row >= ?", (self._n_rows,))
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        """Append chunks; ids that already exist are skipped, as in Chroma."""
+        if not ids:
+            return
+        if embeddings is None:
+            raise ValueError("FlatCollection requires precomputed embeddings")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._set_setting("dimension", str(self.dimension))
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {self.dimension}"
+                )
+            existing = self._existing_ids(ids)
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+            # Duplicates within the batch keep their first occurrence
+            seen = set(existing)
+            keep = [i for i in keep if not (ids[i] in seen or seen.add(ids[i]))]
+            if not keep:
+                return
+
+            vectors = _normalize(vectors[keep]).astype(self.dtype)
+            first_row = self._n_rows
+            with open(self._vectors_path(), "ab") as f:
+                f.write(vectors.tobytes())
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, item_id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        first_row + n,
+                        ids[i],
+                        str((metadatas[i] or {}).get("item_id", "")),
+                        documents[i],
+                        json.dumps(metadatas[i]) if metadatas[i] is not None else None,
+                    )
+                    for n, i in enumerate(keep)
+                ],
+            )
+            self._conn.execute("COMMIT")
+            self._n_rows += len(keep)
+            self._live = np.concatenate([self._live, np.ones(len(keep), dtype=bool)])
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")) -> Dict[str, Any]:
+        """Chunks by id and/or item filter, in insertion order (Chroma-style result)."""
+        clauses, params = [], []
+        if ids is not None:
+            ids = [ids] if isinstance(ids, str) else list(ids)
+            if not ids:
+                return self._result([], include)
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params += ids
+        item_ids = self._where_items(where)
+        if item_ids is not None:
+            if not item_ids:
+                return self._result([], include)
+            clauses.append(f"item_id IN ({','.join('?' * len(item_ids))})")
+            params += item_ids
+        sql = "SELECT row, id, document, metadata FROM chunks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            return self._result(rows, include)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """Exact cosine top-k per query embedding (Chroma-style nested result)."""
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        include = list(include)
+        result = {"ids": []}
+        for key in include:
+            result[key] = []
+
+        with self._lock:
+            item_ids = self._where_items(where)
+            scope = None
+            if item_ids is not None:
+                # Only the rows of the selected items are scored
+                scope = np.array(self._rows_of_items(item_ids), dtype=np.int64)
+            for query in queries:
+                rows, scores = self._top_k(query, n_results, scope)
+                hits = {}
+                if len(rows):
+                    fetched = self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(rows))})",
+                        [int(r) for r in rows],
+                    ).fetchall()
+                    hits = {r[0]: r for r in fetched}
+                ordered = [hits[int(r)] for r in rows if int(r) in hits]
+                found = self._result(ordered, [k for k in include if k != "distances"])
+                result["ids"].append(found["ids"])
+                for key in include:
+                    if key == "distances":
+                        distances = {int(r): 1.0 - float(s) for r, s in zip(rows, scores)}
+                        result[key].append([distances[r[0]] for r in ordered])
+                    else:
+                        result[key].append(found[key])
+        return result
+
+    def delete(self, ids=None, where=None) -> None:
+        with self._lock:
+            if ids is not None:
+                rows = self._rows_of_ids(list(ids))
+            else:
+                item_ids = self._where_items(where)
+                rows = self._rows_of_items(item_ids) if item_ids is not None else []
+            if not rows:
+                return
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(r,) for r in rows])
+            self._conn.execute("COMMIT")
+            self._live[rows] = False
+            dead = self._n_rows - int(self._live.sum())
+            if dead > max(_COMPACT_MIN_ROWS, _COMPACT_RATIO * self._n_rows):
+                self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
+
+    # -- internals -------------------------------------------------------
+
+    def _top_k(self, query: np.ndarray, k: int, scope: Optional[np.ndarray]):
+        """Rows and cosine similarities of the k best live rows (optionally within scope)."""
+        if self._n_rows == 0 or k <= 0 or (scope is not None and len(scope) == 0):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        matrix = self._map()
+        best_rows, best_scores = [], []
+        if scope is not None:
+            scope = np.sort(scope)
+            blocks = [scope[i:i + SCORE_BLOCK_ROWS] for i in range(0, len(scope), SCORE_BLOCK_ROWS)]
+        else:
+            blocks = [np.arange(i, min(i + SCORE_BLOCK_ROWS, self._n_rows)) for i in range(0, self._n_rows, SCORE_BLOCK_ROWS)]
+        for rows in blocks:
+            if scope is None:
+                block = matrix[rows[0]:rows[-1] + 1]
+            else:
+                block = matrix[rows]
+            scores = _score(block, query)
+            scores[~self._live[rows]] = -np.inf
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_rows.append(rows[top])
+            best_scores.append(scores[top])
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        keep = np.isfinite(scores)
+        rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:k]
+        return rows[order], scores[order]
+
+    def _compact(self) -> None:
+        """Copy live rows into a new vectors generation and renumber them. Caller holds the lock."""
+        live_rows = np.flatnonzero(self._live)
+        new_path = self._vectors_path(self._generation + 1)
+        matrix = self._map()
+        with open(new_path, "wb") as f:
+            for start in range(0, len(live_rows), SCORE_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(matrix[live_rows[start:start + SCORE_BLOCK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        old_path = self._vectors_path()
+        self._conn.execute("BEGIN")
+        # Ascending order never collides: each live row moves to a lower or equal free slot
+        self._conn.executemany(
+            "UPDATE chunks SET row = ? WHERE row = ?",
+            [(new, int(old)) for new, old in enumerate(live_rows) if new != old],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('generation', ?)", (str(self._generation + 1),)
+        )
+        self._conn.execute("COMMIT")
+        self._generation += 1
+        self._mmap = None
+        self._n_rows = len(live_rows)
+        self._live = np.ones(self._n_rows, dtype=bool)
+        try:
+            os.remove(old_path)
+        except OSError:
+            # Still mapped elsewhere (Windows); removed when the collection is next opened
+            pass
+
+    def _map(self) -> np.ndarray:
+        """Memory-map the vectors file, remapping when rows were appended. Caller holds the lock."""
+        if self._mmap is None or self._mapped_rows != self._n_rows:
+            self._mmap = np.memmap(
+                self._vectors_path(), dtype=self.dtype, mode="r", shape=(self._n_rows, self.dimension)
+            )
+            self._mapped_rows = self._n_rows
+        return self._mmap
+
+    def _vectors_path(self, generation: Optional[int] = None) -> str:
+        return os.path.join(self.path, f"vectors-{self._generation if generation is None else generation}.bin")
+
+    def _set_setting(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    def _where_items(self, where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        if not where:
+            return None
+        item_ids = _item_scope(where)
+        if item_ids is None or len(where) != 1:
+            raise ValueError(f"FlatCollection only supports item_id filters, got {where}")
+        return item_ids
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        existing = set()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            existing.update(doc_id for (doc_id,) in self._conn.execute(
+                f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            ))
+        return existing
+
+    def _rows_of_ids(self, ids: List[str]) -> List[int]:
+        rows = []
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            rows += [r for (r,) in self._conn.execute(
+                f"SELECT row FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            )]
+        return rows
+
+    def _rows_of_items(self, item_ids: List[str]) -> List[int]:
+        rows = []
+        for start in range(0, len(item_ids), 500):
+            batch = item_ids[start:start + 500]
+            rows += [r for (r,) in self._conn.execute(
+                f"SELECT row FROM chunks WHERE item_id IN ({','.join('?' * len(batch))})", batch
+            )]
+        return rows
+
+    def _result(self, rows, include) -> Dict[str, Any]:
+        """Chroma-style flat result from (row, id, document, metadata) tuples."""
+        result = {"ids": [r[1] for r in rows]}
+        if "documents" in include:
+            result["documents"] = [r[2] for r in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[3]) if r[3] is not None else None for r in rows]
+        if "embeddings" in include:
+            if rows:
+                result["embeddings"] = np.asarray(self._map()[[r[0] for r in rows]], dtype=np.float32)
+            else:
+                result["embeddings"] = np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return result
+
+
+class FlatVectorClient(ChromaClient):
+    """
+    ChromaClient storing chunk vectors in a FlatCollection instead of Chroma.
+
+    Everything except the collection (BM25 index, item manifest, hybrid
+    retrieval) is shared with ChromaClient. Point it at its own db_path so
+    its sparse index and manifest are not mixed with a Chroma store's.
+    """
+
+    # FlatCollection already scores item-scoped queries exactly, row by row
+    scoped_exact_max_chunks = 0
+
+    def __init__(self, db_path: str, collection_name: str = "zotero_lib", embedding_model_id: str = "bge-base", dtype: str = DEFAULT_DTYPE):
+        self.dtype = dtype
+        super().__init__(db_path, collection_name=collection_name, embedding_model_id=embedding_model_id)
+
+    @classmethod
+    def open(cls, base_path: str, embedding_model_id: str, options: Optional[Dict[str, Any]] = None) -> "FlatVectorClient":
+        """Open an embedding model's store under <base_path>/flat.
+        
+        The flatVectorDtype option only applies to collections created now;
+        existing ones keep the dtype they were written with.
+        """
+        options = options or {}
+        # Own directory, so its BM25 index and manifest are not mixed with Chroma's
+        return cls(
+            os.path.join(base_path, "flat"),
+            embedding_model_id=embedding_model_id,
+            dtype=options.get("flatVectorDtype") or DEFAULT_DTYPE,
+        )
+
+    @classmethod
+    def list_collections(cls, base_path: str) -> List[Dict[str, Any]]:
+        """Flat collections of every embedding model stored under <base_path>/flat."""
+        root = os.path.join(base_path, "flat")
+        collections = []
+        for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            if not name.startswith("flat_zotero_lib_"):
+                continue
+            collection = FlatCollection(os.path.join(root, name))
+            try:
+                item_count = collection.count()
+            finally:
+                collection.close()
+            collections.append({
+                "collection_name": name[len("flat_"):],
+                "embedding_model_id": name[len("flat_zotero_lib_"):],
+                "item_count": item_count,
+            })
+        return collections
+
+    def _open_collection(self):
+        self.chroma_client = None
+        return FlatCollection(os.path.join(self.db_path, f"flat_{self.collection_name}"), dtype=self.dtype)
+
+    def get_or_create_db(self):
+        """The flat collection is created when the client is opened."""
+        return self.collection
+
+
+def _score(block: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Cosine similarities of unit rows with a unit query."""
+    if block.dtype == np.float32:
+        return block @ query
+    scores = np.empty(len(block), dtype=np.float32)
+    for start in range(0, len(block), _CONVERT_ROWS):
+        scores[start:start + _CONVERT_ROWS] = block[start:start + _CONVERT_ROWS].astype(np.float32) @ query
+    return scores
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,125 @@
+# index_checkpoint.py
+"""
+Durable checkpoints for indexing jobs.
+
+A job is recorded in a directory (one per embedding model) as:
+- job.json: manifest with job id, mode, model, status and timestamps,
+  replaced atomically on every status change
+- completed.log: append-only list of finished item IDs, one per line,
+  flushed after every item so it survives the backend being killed
+
+A job whose status is still "running" (backend killed), "cancelled" or
+"failed" can be resumed; its completed items are skipped without asking the
+vector store about them.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional, Set
+
+RESUMABLE_STATUSES = ("running", "cancelled", "failed")
+
+
+class IndexCheckpoint:
+    """Manifest plus completed-item log for the latest indexing job of one embedding model."""
+
+    def __init__(self, job_dir: str):
+        self.job_dir = job_dir
+        self.manifest_path = os.path.join(job_dir, "job.json")
+        self.log_path = os.path.join(job_dir, "completed.log")
+        self._log = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the manifest of the latest job, or None if there is none."""
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_resumable(self) -> Optional[Dict[str, Any]]:
+        """Return the manifest of the latest job if it did not complete."""
+        job = self.load()
+        if job and job.get("status") in RESUMABLE_STATUSES:
+            job["completed_items"] = len(self.completed_ids())
+            return job
+        return None
+
+    def start(self, mode: str, embedding_model_id: str) -> Dict[str, Any]:
+        """Begin a new job, discarding the previous job's completed items."""
+        os.makedirs(self.job_dir, exist_ok=True)
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "mode": mode,
+            "embedding_model_id": embedding_model_id,
+            "status": "running",
+            "started_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            self._close_log()
+            self._log = open(self.log_path, "w", encoding="utf-8")
+            self._write_manifest(job)
+        return job
+
+    def resume(self) -> Set[str]:
+        """Reopen the latest job for appending and return its completed item IDs."""
+        job = self.load() or {}
+        completed = self.completed_ids()
+        job["status"] = "running"
+        job["updated_at"] = time.time()
+        job["resumed_at"] = job["updated_at"]
+        with self._lock:
+            self._close_log()
+            self._log = open(self.log_path, "a", encoding="utf-8")
+            self._write_manifest(job)
+        return completed
+
+    def mark_completed(self, item_ids: Iterable[str]) -> None:
+        """Append finished items to the log."""
+        with self._lock:
+            if self._log is None:
+                return
+            for item_id in item_ids:
+                self._log.write(f"{item_id}\n")
+            self._log.flush()
+
+    def finish(self, status: str) -> None:
+        """Record the final status ("completed", "cancelled" or "failed")."""
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            self._close_log()
+            job = self.load()
+            if job is None:
+                return
+            job["status"] = status
+            job["updated_at"] = time.time()
+            self._write_manifest(job)
+
+    def completed_ids(self) -> Set[str]:
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                # A torn last line (killed mid-write) is simply not counted as complete
+                return {line.rstrip("\n") for line in f if line.endswith("\n")}
+        except OSError:
+            return set()
+
+    def _close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _write_manifest(self, job: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
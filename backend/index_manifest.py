@@ -0,0 +1,265 @@
+# index_manifest.py
+"""
+Item-level manifest of what is stored in the vector database.
+
+One row per (embedding model, item) with the item's chunk count, fingerprint
+and indexing time, kept in a small SQLite file next to the Chroma store. It
+answers "which items are indexed, and at which fingerprint" with an indexed
+lookup instead of a scan of every chunk's metadata.
+
+Bibliographic fields (title, authors, ...) are stored here once per item in
+the item_metadata table rather than copied into every chunk's metadata, and
+joined back in when search results are turned into snippets. Editing them
+only touches one row.
+
+The manifest is updated right after each Chroma write or delete (see
+ChromaClient). Chroma and SQLite cannot share a transaction, so the client
+checks the manifest's chunk total against the collection on first use and
+rebuilds it from the chunk metadata when they disagree (libraries indexed
+before the manifest existed, or a write interrupted between the two stores).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+MANIFEST_FILENAME = "index_manifest.sqlite"
+
+# Per-item fields kept in the item_metadata table (chunks only carry item_id, chunk_idx and page)
+ITEM_FIELDS = ("title", "authors", "tags", "collections", "year", "pdf_path", "pdf_fingerprint")
+
+
+class IndexManifest:
+    """
+    Per-model item manifest backed by SQLite.
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, db_dir: str, embedding_model_id: str):
+        self.path = os.path.join(db_dir, MANIFEST_FILENAME)
+        self.embedding_model_id = embedding_model_id
+        # Incremented on every write, so results derived from the manifest can be cached
+        self.version = 0
+        self._lock = threading.Lock()
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS items (
+                embedding_model TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL DEFAULT '',
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (embedding_model, item_id)
+            )"""
+        )
+        columns = ", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in ITEM_FIELDS)
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS item_metadata (
+                embedding_model TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                {columns},
+                PRIMARY KEY (embedding_model, item_id)
+            )"""
+        )
+
+    def record_chunks(self, chunks: Dict[str, Tuple[int, str]], item_metadata: Optional[Dict[str, dict]] = None) -> None:
+        """Add newly written chunks to their items' counts.
+
+        Args:
+            chunks: item_id -> (number of chunks written, item fingerprint)
+            item_metadata: Optional item_id -> bibliographic fields (see ITEM_FIELDS)
+        """
+        if not chunks:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._upsert_metadata({
+                item_id: fields for item_id, fields in (item_metadata or {}).items() if item_id in chunks
+            })
+            self._conn.executemany(
+                """INSERT INTO items (embedding_model, item_id, chunk_count, fingerprint, indexed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (embedding_model, item_id) DO UPDATE SET
+                    chunk_count = chunk_count + excluded.chunk_count,
+                    fingerprint = excluded.fingerprint,
+                    indexed_at = excluded.indexed_at""",
+                [
+                    (self.embedding_model_id, item_id, count, fingerprint or "", now)
+                    for item_id, (count, fingerprint) in chunks.items()
+                ],
+            )
+            self._conn.execute("COMMIT")
+            self.version += 1
+
+    def update_item(self, item_id: str, fingerprint: str, fields: dict) -> None:
+        """Replace an indexed item's fingerprint and bibliographic fields (chunks are untouched)."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "UPDATE items SET fingerprint = ?, indexed_at = ? WHERE embedding_model = ? AND item_id = ?",
+                (fingerprint or "", time.time(), self.embedding_model_id, item_id),
+            )
+            self._upsert_metadata({item_id: fields})
+            self._conn.execute("COMMIT")
+            self.version += 1
+
+    def remove_item(self, item_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in ("items", "item_metadata"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE embedding_model = ? AND item_id = ?",
+                    (self.embedding_model_id, item_id),
+                )
+            self._conn.execute("COMMIT")
+            self.version += 1
+
+    def replace_all(self, chunks: Dict[str, Tuple[int, str]], item_metadata: Optional[Dict[str, dict]] = None) -> None:
+        """Replace every row of this model (used when rebuilding from the collection).
+
+        Fingerprints and metadata already recorded for items that are still
+        indexed are kept (chunks written since the item table existed no
+        longer carry them).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            known = dict(self._conn.execute(
+                "SELECT item_id, fingerprint FROM items WHERE embedding_model = ?", (self.embedding_model_id,)
+            ).fetchall())
+            chunks = {
+                item_id: (count, fingerprint or known.get(item_id, ""))
+                for item_id, (count, fingerprint) in chunks.items()
+            }
+            self._conn.execute("DELETE FROM items WHERE embedding_model = ?", (self.embedding_model_id,))
+            self._conn.executemany(
+                "INSERT INTO items (embedding_model, item_id, chunk_count, fingerprint, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.embedding_model_id, item_id, count, fingerprint or "", now)
+                    for item_id, (count, fingerprint) in chunks.items()
+                ],
+            )
+            self._upsert_metadata(item_metadata or {})
+            self._conn.execute(
+                "DELETE FROM item_metadata WHERE embedding_model = ? AND item_id NOT IN "
+                "(SELECT item_id FROM items WHERE embedding_model = ?)",
+                (self.embedding_model_id, self.embedding_model_id),
+            )
+            self._conn.execute("COMMIT")
+            self.version += 1
+
+    def item_ids(self) -> set:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id FROM items WHERE embedding_model = ?", (self.embedding_model_id,)
+            ).fetchall()
+        return {item_id for (item_id,) in rows}
+
+    def fingerprints(self) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, fingerprint FROM items WHERE embedding_model = ?", (self.embedding_model_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def pdf_fingerprints(self) -> Dict[str, str]:
+        """item_id -> fingerprint of the PDF the item's chunks were extracted from ('' if unknown)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, pdf_fingerprint FROM item_metadata WHERE embedding_model = ?",
+                (self.embedding_model_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def get_items_metadata(self, item_ids: Iterable[str]) -> Dict[str, dict]:
+        """Bibliographic fields of the given items (items without a row are left out)."""
+        item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+        result = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(item_ids), 500):
+                batch = item_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT item_id, {', '.join(ITEM_FIELDS)} FROM item_metadata "
+                    f"WHERE embedding_model = ? AND item_id IN ({placeholders})",
+                    [self.embedding_model_id, *batch],
+                ).fetchall()
+                for item_id, *values in rows:
+                    result[item_id] = dict(zip(ITEM_FIELDS, values))
+        return result
+
+    def chunk_counts(self, item_ids: Iterable[str]) -> Dict[str, int]:
+        """item_id -> chunk count for the given items that are indexed."""
+        item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+        result = {}
+        with self._lock:
+            for start in range(0, len(item_ids), 500):
+                batch = item_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT item_id, chunk_count FROM items WHERE embedding_model = ? AND item_id IN ({placeholders})",
+                    [self.embedding_model_id, *batch],
+                ).fetchall()
+                result.update(rows)
+        return result
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        """Manifest row of an item (chunk_count, fingerprint, indexed_at), or None if not indexed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunk_count, fingerprint, indexed_at FROM items WHERE embedding_model = ? AND item_id = ?",
+                (self.embedding_model_id, item_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"chunk_count": row[0], "fingerprint": row[1], "indexed_at": row[2]}
+
+    def stats(self) -> Dict[str, int]:
+        """Number of indexed items and their total number of chunks."""
+        with self._lock:
+            items, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM items WHERE embedding_model = ?",
+                (self.embedding_model_id,),
+            ).fetchone()
+        return {"items": items, "chunks": chunks}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _upsert_metadata(self, item_metadata: Dict[str, dict]) -> None:
+        """Write item_metadata rows. Caller holds the lock (and usually a transaction)."""
+        if not item_metadata:
+            return
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO item_metadata (embedding_model, item_id, {', '.join(ITEM_FIELDS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(ITEM_FIELDS))})",
+            [
+                (self.embedding_model_id, str(item_id), *(str(fields.get(f) or "") for f in ITEM_FIELDS))
+                for item_id, fields in item_metadata.items()
+            ],
+        )
+
+
+def item_fields(metadata: dict) -> dict:
+    """The ITEM_FIELDS of a metadata dict (e.g. a chunk written before the side table existed)."""
+    return {field: metadata.get(field) or "" for field in ITEM_FIELDS}
+
+
+def count_chunks(metadatas: Iterable[Optional[dict]]) -> Dict[str, Tuple[int, str]]:
+    """Group chunk metadata by item: item_id -> (chunk count, fingerprint)."""
+    chunks: Dict[str, Tuple[int, str]] = {}
+    for metadata in metadatas:
+        if not metadata or "item_id" not in metadata:
+            continue
+        item_id = str(metadata["item_id"])
+        count, fingerprint = chunks.get(item_id, (0, ""))
+        chunks[item_id] = (count + 1, fingerprint or metadata.get("fingerprint") or "")
+    return chunks
@@ -0,0 +1,279 @@
+# index_pipeline.py
+"""
+Staged, streaming producer/consumer pipeline for library indexing.
+
+PDF text extraction (PyMuPDF) is CPU-bound and independent per file, so it runs
+in a pool of worker processes. Extracted items are streamed to a single
+embedding stage, which lets extraction of the next PDFs overlap with
+chunking/embedding of the current one. PDFs found in the optional
+ExtractionCache are handed to the embedding stage without being parsed.
+
+Memory is bounded by `max_in_flight`: an item takes a slot when it is
+submitted for extraction and gives it back only once the embedding stage is
+done with it, so at most that many items' page text is held at any time,
+regardless of library size.
+
+Stage depths are published into a caller-provided dict so they can be
+reported through /index_status:
+- extracting: PDFs submitted to the extraction pool and not yet finished
+- queued: extracted items waiting for the embedding stage
+- embedding: items currently being chunked/embedded/stored (0 or 1)
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Maximum number of items between extraction submit and end of embedding
+DEFAULT_MAX_IN_FLIGHT = 16
+
+# Sentinel placed on the queue once the producer has nothing left to hand over
+_DONE = object()
+
+
+class _ProducerFailed:
+    """Placed on the queue instead of _DONE when the producer raised; re-raised by the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def extract_pages(filepath: str) -> List[Dict[str, Any]]:
+    """Extract page-aware text from a PDF.
+
+    Module-level so it can be pickled and run in worker processes.
+    """
+    from backend.pdf import PDF
+    return PDF(filepath).extract_text_with_pages()
+
+
+def default_extract_workers() -> int:
+    """Number of extraction processes, leaving one core for the embedding stage."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class IndexPipeline:
+    """
+    Streams items through PDF extraction (process pool) to a consumer.
+
+    Typical usage:
+        pipeline = IndexPipeline(should_cancel=lambda: cancelled, stages=progress["stages"])
+        for item, pages_data in pipeline.iter_extracted(items):
+            ...  # chunk, embed, store
+
+    or equivalently pipeline.run(items, consume).
+
+    If the producer itself fails (e.g. iterating `items` or the process pool
+    raises), iter_extracted() re-raises that exception after the items
+    extracted before it, so the run is not mistaken for a complete one.
+
+    `items` may be any iterable (including a generator); it is consumed
+    lazily as slots free up. Items are yielded in extraction completion
+    order. Items without an accessible PDF (and PDFs that fail to parse) are
+    yielded with empty pages_data so the consumer can account for them in its
+    progress.
+    """
+
+    def __init__(
+        self,
+        extract_fn: Callable[[str], List[Dict[str, Any]]] = extract_pages,
+        max_workers: Optional[int] = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        stages: Optional[Dict[str, int]] = None,
+        cache: Optional[Any] = None,
+    ):
+        """
+        Args:
+            extract_fn: Module-level function mapping a PDF path to pages_data
+                        (pool workers are spawned and import it by name)
+            max_workers: Extraction processes (None = one per spare core,
+                         0 = extract in a background thread without a pool)
+            max_in_flight: Maximum number of items extracted or being
+                           extracted but not yet released by the consumer
+            should_cancel: Polled between items; returning True stops the pipeline
+            stages: Dict updated in place with per-stage depths
+            cache: Optional ExtractionCache; cached PDFs are not re-parsed
+        """
+        self.extract_fn = extract_fn
+        self.max_workers = default_extract_workers() if max_workers is None else max_workers
+        self.max_in_flight = max(1, max_in_flight)
+        self.should_cancel = should_cancel or (lambda: False)
+        self.stages = stages if stages is not None else {}
+        self.stages.update({"extracting": 0, "queued": 0, "embedding": 0})
+        self.cache = cache
+        self.cache_hits = 0
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable[Any], consume: Callable[[Any, List[Dict[str, Any]]], None]) -> None:
+        """Extract every item and pass it to consume() as soon as it is ready."""
+        extracted = self.iter_extracted(items)
+        try:
+            for item, pages_data in extracted:
+                consume(item, pages_data)
+        finally:
+            extracted.close()
+
+    def iter_extracted(self, items: Iterable[Any]) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+        """Yield (item, pages_data) pairs, holding at most max_in_flight items in memory.
+
+        The slot of a yielded item is released when the caller asks for the
+        next one, i.e. after it has finished processing the current item.
+
+        Raises:
+            The producer's exception if extraction could not be completed
+        """
+        q: "queue.Queue" = queue.Queue()
+        producer = threading.Thread(target=self._produce, args=(items, q), daemon=True)
+        producer.start()
+        try:
+            while True:
+                entry = q.get()
+                self._adjust("queued", -1)
+                if entry is _DONE:
+                    break
+                if isinstance(entry, _ProducerFailed):
+                    raise entry.error
+                if self._cancelled():
+                    # Keep draining so the producer can observe cancellation and exit
+                    self._slots.release()
+                    continue
+                self.stages["embedding"] = 1
+                try:
+                    yield entry
+                finally:
+                    self.stages["embedding"] = 0
+                    entry = None
+                    self._slots.release()
+        finally:
+            self._stop.set()
+            producer.join()
+            self.stages.update({"extracting": 0, "queued": 0, "embedding": 0})
+
+    def _cancelled(self) -> bool:
+        return self._stop.is_set() or self.should_cancel()
+
+    def _adjust(self, stage: str, delta: int) -> None:
+        with self._lock:
+            self.stages[stage] = max(0, self.stages.get(stage, 0) + delta)
+
+    def _acquire_slot(self) -> bool:
+        """Wait for a free in-flight slot; gives up once the pipeline is cancelled."""
+        while not self._cancelled():
+            if self._slots.acquire(timeout=0.2):
+                return True
+        return False
+
+    def _hand_over(self, q: "queue.Queue", item: Any, pages_data: List[Dict[str, Any]]) -> None:
+        self._adjust("queued", 1)
+        q.put((item, pages_data))
+
+    def _produce(self, items: Iterable[Any], q: "queue.Queue") -> None:
+        end = _DONE
+        try:
+            if self.max_workers > 0:
+                self._produce_with_pool(items, q)
+            else:
+                self._produce_inline(items, q)
+        except Exception as e:
+            print(f"Indexing pipeline producer failed: {e}")
+            end = _ProducerFailed(e)
+        finally:
+            self.stages["extracting"] = 0
+            self._adjust("queued", 1)
+            q.put(end)
+
+    def _produce_inline(self, items: Iterable[Any], q: "queue.Queue") -> None:
+        for item in items:
+            if not self._acquire_slot():
+                return
+            if not _has_pdf(item):
+                self._hand_over(q, item, [])
+                continue
+            cache_key, pages_data = self._cached(item)
+            if pages_data is not None:
+                self._hand_over(q, item, pages_data)
+                continue
+            self._adjust("extracting", 1)
+            try:
+                pages_data = self.extract_fn(item.filepath)
+                self._store(cache_key, pages_data)
+            except Exception as e:
+                print(f"PDF extraction failed for {item.filepath}: {e}")
+                pages_data = []
+            self._adjust("extracting", -1)
+            self._hand_over(q, item, pages_data)
+
+    def _produce_with_pool(self, items: Iterable[Any], q: "queue.Queue") -> None:
+        outstanding = threading.Semaphore(0)
+        submitted = 0
+
+        def on_done(future, item=None, cache_key=None):
+            self._adjust("extracting", -1)
+            pages_data = []
+            if not future.cancelled():
+                try:
+                    pages_data = future.result()
+                    self._store(cache_key, pages_data)
+                except Exception as e:
+                    print(f"PDF extraction failed for {item.filepath}: {e}")
+                    pages_data = []
+            self._hand_over(q, item, pages_data)
+            outstanding.release()
+
+        # A forked child inherits locks held by the backend's other threads (Chroma, torch) and can deadlock
+        pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for item in items:
+                if not self._acquire_slot():
+                    break
+                if not _has_pdf(item):
+                    # Nothing to extract; hand it straight to the consumer
+                    self._hand_over(q, item, [])
+                    continue
+                cache_key, pages_data = self._cached(item)
+                if pages_data is not None:
+                    # Already parsed in an earlier run; skip the pool entirely
+                    self._hand_over(q, item, pages_data)
+                    continue
+                self._adjust("extracting", 1)
+                future = pool.submit(self.extract_fn, item.filepath)
+                submitted += 1
+                future.add_done_callback(lambda f, it=item, key=cache_key: on_done(f, it, key))
+        finally:
+            cancelled = self._cancelled()
+            pool.shutdown(wait=not cancelled, cancel_futures=cancelled)
+            # Every submitted future reports back (cancelled ones with empty pages)
+            for _ in range(submitted):
+                outstanding.acquire()
+
+    def _cached(self, item: Any) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+        """Look up an item in the extraction cache. Returns (cache_key, pages_data or None)."""
+        if self.cache is None:
+            return None, None
+        try:
+            cache_key = self.cache.key_for(item.filepath)
+        except OSError:
+            return None, None
+        pages_data = self.cache.get(cache_key)
+        if pages_data is not None:
+            self.cache_hits += 1
+        return cache_key, pages_data
+
+    def _store(self, cache_key: Optional[str], pages_data: List[Dict[str, Any]]) -> None:
+        if self.cache is None or cache_key is None:
+            return
+        try:
+            self.cache.put(cache_key, pages_data)
+        except Exception as e:
+            print(f"Failed to cache extracted text: {e}")
+
+
+def _has_pdf(item: Any) -> bool:
+    filepath = getattr(item, "filepath", None)
+    return bool(filepath and os.path.exists(filepath))
@@ -2,9 +2,16 @@
 
 from backend.zotero_dbase import ZoteroLibrary
 from backend.zoteroitem import ZoteroItem
-from backend.pdf import PDF
-from backend.vector_db import ChromaClient
-from backend.embed_utils import get_embedding, rerank_passages
+from backend.vector_db import ChunkWriteBuffer, DEFAULT_WRITE_BATCH_SIZE
+from backend.vector_store import open_vector_store, DEFAULT_VECTOR_BACKEND
+from backend.flat_vector_store import DEFAULT_DTYPE as DEFAULT_FLAT_DTYPE
+from backend.embed_utils import (
+    get_embeddings, rerank_passages, configure_embedding_cache, configure_embedding_backend, warm_up,
+    DEFAULT_BATCH_SIZE, DEFAULT_EMBEDDING_BACKEND, DEFAULT_EMBEDDING_CACHE_BYTES,
+)
+from backend.index_pipeline import IndexPipeline, DEFAULT_MAX_IN_FLIGHT
+from backend.text_cache import ExtractionCache, DEFAULT_MAX_BYTES
+from backend.index_checkpoint import IndexCheckpoint
 from backend.model_providers import ProviderManager, Message
 from backend.conversation_store import ConversationStore
 import os
@@ -12,6 +19,9 @@ from collections import OrderedDict
 import threading
 import time
 
+# Longest time library_stats() reuses a result while the index and Zotero database are unchanged
+LIBRARY_STATS_MAX_AGE = 300
+
 class ZoteroChatbot:
     def __init__(
         self, 
@@ -20,12 +30,46 @@ class ZoteroChatbot:
         active_provider_id="ollama",
         active_model=None,
         credentials=None,
-        embedding_model_id="bge-base"
+        embedding_model_id="bge-base",
+        embedding_batch_size=DEFAULT_BATCH_SIZE,
+        cache_dir=None,
+        extraction_cache_bytes=DEFAULT_MAX_BYTES,
+        embedding_cache_bytes=DEFAULT_EMBEDDING_CACHE_BYTES,
+        jobs_dir=None,
+        vector_backend=DEFAULT_VECTOR_BACKEND,
+        flat_vector_dtype=DEFAULT_FLAT_DTYPE,
+        embedding_backend=DEFAULT_EMBEDDING_BACKEND
     ):
         self.zlib = ZoteroLibrary(db_path)
         self.embedding_model_id = embedding_model_id
-        # Pass embedding model ID to ChromaClient so it creates model-specific collections
-        self.chroma = ChromaClient(chroma_path, embedding_model_id=embedding_model_id)
+        # Number of chunks per encode() call during indexing
+        self.embedding_batch_size = embedding_batch_size
+        # Inference backend of the embedding model: "torch", "onnx" or "onnx-int8"
+        self.embedding_backend = embedding_backend
+        configure_embedding_backend(embedding_backend)
+        # Vector store backend from backend.vector_store: "chroma" (HNSW) or "flat" (exact search over a memory-mapped matrix)
+        self.chroma_path = chroma_path
+        self.vector_backend = vector_backend
+        self.flat_vector_dtype = flat_vector_dtype
+        # Vector store of the embedding model (model-specific collections), opened
+        # on first use so creating the chatbot does not wait for Chroma
+        self._chroma = None
+        self._chroma_backend = None
+        self._chroma_lock = threading.Lock()
+        # Extracted PDF text, shared by all embedding models of this profile
+        self.cache_dir = cache_dir
+        self.text_cache = (
+            ExtractionCache(os.path.join(cache_dir, "extracted_text"), max_bytes=extraction_cache_bytes)
+            if cache_dir else None
+        )
+        # Embeddings keyed by (model, chunk text hash), reused across re-indexes and queries
+        configure_embedding_cache(
+            os.path.join(cache_dir, "embeddings") if cache_dir else None, max_bytes=embedding_cache_bytes
+        )
+        # Checkpoints of indexing jobs (one per embedding model) so interrupted jobs can resume
+        self.jobs_dir = jobs_dir
+        self._checkpoint = None
+        self._resume_job = False
         
         # Initialize provider manager for LLM interactions
         self.provider_manager = ProviderManager(
@@ -50,6 +94,86 @@ class ZoteroChatbot:
             "eta_seconds": None,
         }
         self._index_thread = None
+        # Number of PDF extraction processes (None = one per spare CPU core)
+        self.extract_workers = None
+        # Upper bound on items held in memory by the indexing pipeline
+        self.max_items_in_flight = DEFAULT_MAX_IN_FLIGHT
+        # Item IDs whose existing chunks are replaced when they are re-indexed
+        self._items_to_replace = set()
+        # Chunks buffered across items before each Chroma write
+        self.write_batch_size = DEFAULT_WRITE_BATCH_SIZE
+        self._write_buffer = None
+        # Head of the fused hybrid ranking passed to the cross-encoder
+        self.rerank_candidates = 12
+        # Last library_stats() result: (store, index version, library version, computed at, stats)
+        self._library_stats = None
+    
+    @property
+    def chroma(self):
+        """Vector store of the current embedding model (opened on first access)."""
+        if self._chroma is None:
+            with self._chroma_lock:
+                if self._chroma is None:
+                    self._chroma = self.open_vector_client(self.embedding_model_id)
+                    self._chroma_backend = self.vector_backend
+        return self._chroma
+    
+    @chroma.setter
+    def chroma(self, store):
+        with self._chroma_lock:
+            self._chroma = store
+            self._chroma_backend = self.vector_backend
+    
+    @property
+    def vector_store_open(self):
+        return self._chroma is not None
+    
+    @property
+    def open_vector_backend(self):
+        """Backend of the vector store serving queries (the configured one until a store is open)."""
+        return self._chroma_backend if self._chroma is not None else self.vector_backend
+    
+    def reopen_vector_store(self):
+        """Open the store of the current backend and embedding model, then close the previous one.
+        
+        Must not run while indexing, which writes to the open store.
+        """
+        with self._chroma_lock:
+            previous = self._chroma
+            self._chroma = self.open_vector_client(self.embedding_model_id)
+            self._chroma_backend = self.vector_backend
+        if previous is not None:
+            try:
+                previous.close()
+            except Exception as e:
+                print(f"Failed to close the previous vector store: {e}")
+        return self._chroma
+    
+    def start_warm_up(self):
+        """Open the vector store and load the embedding model and reranker in a background thread.
+        
+        Returns:
+            The started daemon thread
+        """
+        def run():
+            try:
+                self.chroma
+            except Exception as e:
+                print(f"Opening the vector store failed: {e}")
+            warm_up(self.embedding_model_id)
+        
+        thread = threading.Thread(target=run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def open_vector_client(self, embedding_model_id):
+        """Open the vector store of the configured backend for an embedding model."""
+        return open_vector_store(
+            self.vector_backend,
+            self.chroma_path,
+            embedding_model_id,
+            {"flatVectorDtype": self.flat_vector_dtype},
+        )
     
     def update_provider_settings(
         self,
@@ -68,242 +192,368 @@ class ZoteroChatbot:
                 self.provider_manager.set_credentials(provider_id, creds)
     
     def _index_library_worker(self):
+        """Re-extract and re-embed every item, replacing existing chunks and dropping deleted items."""
+        status = "failed"
         try:
             start_time = time.time()
             self.index_progress["start_time"] = start_time
+            completed = self._begin_job("full")
             
             raw_items = self.zlib.search_parent_items_with_pdfs()
+            added, updated, unchanged, removed_ids = self.diff_library(raw_items)
+            # Items finished by an interrupted run of this job are not re-embedded
+            pending = [it for it in raw_items if str(it['item_id']) not in completed]
             self.index_progress["total_items"] = len(raw_items)
-            self.index_progress["processed_items"] = 0
-            items = [ZoteroItem(filepath=it['pdf_path'], metadata=it) for it in raw_items]
-
-            # Extract text for each item using PDF logic with page numbers
-            for item in items:
-                if self._cancel_indexing:
-                    break
-                if not (item.filepath and os.path.exists(item.filepath)):
-                    self.index_progress["processed_items"] += 1
-                    continue  # Skip missing or inaccessible PDFs
-                pdf = PDF(item.filepath)
-                # Use page-aware extraction
-                pages_data = pdf.extract_text_with_pages()
-                # Store page data for later chunking
-                item.metadata['pages_data'] = pages_data
-                # Also store concatenated text for backward compatibility
-                text = "\n\n".join([p['text'] for p in pages_data])
-                item.metadata['text'] = text if text else ""
-
-            # Vectorize each item's text (chunk/embedding logic with page tracking)
-            for item in items:
-                if self._cancel_indexing:
-                    break
-                pages_data = item.metadata.get('pages_data') or []
-                if not pages_data:
-                    self.index_progress["processed_items"] += 1
-                    continue
-                
-                # Chunk with page awareness
-                chunks_with_pages = self.chunk_text_with_pages(pages_data)
-                if not chunks_with_pages:
-                    self.index_progress["processed_items"] += 1
-                    continue
-                
-                chunks = [c['text'] for c in chunks_with_pages]
-                vectors = [get_embedding(chunk, self.embedding_model_id) for chunk in chunks]
-                
-                # Validate embedding dimensions
-                from backend.embed_utils import get_embedding_dimension
-                expected_dim = get_embedding_dimension(self.embedding_model_id)
-                if vectors and len(vectors[0]) != expected_dim:
-                    print(f"WARNING: Unexpected embedding dimension {len(vectors[0])} for item {item.metadata.get('item_id')}, expected {expected_dim}")
-
-                # Generate unique chunk IDs
-                item_id = str(item.metadata.get('item_id'))
-                chunk_ids = [f"{item_id}:{i}" for i in range(len(chunks))]
-
-                # Sanitize metadata per chunk to primitives, no None
-                meta_src = item.metadata
-                title = meta_src.get("title") or ""
-                authors = meta_src.get("authors") or ""
-                tags = meta_src.get("tags") or ""
-                collections = meta_src.get("collections") or ""
-                year = meta_src.get("date") or ""
-                pdf_path = meta_src.get("pdf_path") or ""
-
-                metas = []
-                for i, chunk_info in enumerate(chunks_with_pages):
-                    metas.append({
-                        "item_id": item_id,
-                        "chunk_idx": int(i),
-                        "title": title,
-                        "authors": authors,
-                        "tags": tags,
-                        "collections": collections,
-                        "year": year,
-                        "pdf_path": pdf_path,
-                        "page": chunk_info['page'],  # Add page number!
-                    })
+            self.index_progress["processed_items"] = len(raw_items) - len(pending)
+            self.index_progress["resumed_items"] = len(raw_items) - len(pending)
+            self.index_progress["added_items"] = len(added)
+            self.index_progress["updated_items"] = len(raw_items) - len(added)
+            self.index_progress["removed_items"] = len(removed_ids)
+            
+            # Every previously indexed item is re-embedded, so its old chunks must go first
+            added_ids = {str(it['item_id']) for it in added}
+            self._items_to_replace = {str(it['item_id']) for it in raw_items} - added_ids
+            self._remove_items(removed_ids)
+            
+            # Items are streamed through the pipeline; page text is only held for items in flight
+            items = (ZoteroItem(filepath=it['pdf_path'], metadata=it) for it in pending)
 
-                self.chroma.add_chunks(
-                    ids=chunk_ids,
-                    documents=chunks,
-                    metadatas=metas,
-                    embeddings=vectors
-                )
-                # Update progress after processing this item
-                self.index_progress["processed_items"] += 1
-                
-                # Calculate time estimates
-                elapsed = time.time() - self.index_progress["start_time"]
-                self.index_progress["elapsed_seconds"] = int(elapsed)
-                
-                processed = self.index_progress["processed_items"]
-                total = self.index_progress["total_items"]
-                if processed > 0 and total > 0:
-                    avg_time_per_item = elapsed / processed
-                    remaining_items = total - processed
-                    self.index_progress["eta_seconds"] = int(avg_time_per_item * remaining_items)
-                
-                # small sleep to allow cancellation to be checked promptly in CPU-bound loops
-                time.sleep(0)
+            # Extract PDFs in worker processes while chunks are embedded and stored
+            self._run_index_pipeline(items)
             
-            # Build BM25 index after adding all chunks
-            print("Building BM25 index for sparse retrieval...")
-            self.chroma.build_bm25_index()
+            # The BM25 index was updated chunk by chunk; persist it
+            self.chroma.save_bm25_index()
+            status = "cancelled" if self._cancel_indexing else "completed"
         finally:
+            self._finish_job(status)
             self.is_indexing = False
             self._cancel_indexing = False
 
     def _index_library_incremental_worker(self):
-        """Index only new items that aren't already in the database."""
+        """Sync the index with Zotero: embed new and modified items, delete removed ones.
+        
+        Items are compared by fingerprint (see ZoteroItem.fingerprint), so replaced
+        PDFs and edited metadata are picked up without a full re-index.
+        """
+        status = "failed"
         try:
             start_time = time.time()
             self.index_progress["start_time"] = start_time
+            completed = self._begin_job("incremental")
             
-            # Get all items from Zotero
+            # Get all items from Zotero and compare them with the index
             raw_items = self.zlib.search_parent_items_with_pdfs()
-            all_item_ids = {str(it['item_id']) for it in raw_items}
+            added, updated, unchanged, removed_ids = self.diff_library(raw_items)
+            # Items whose PDF is unchanged only need their item fields refreshed, not re-embedding
+            metadata_only = [it for it in updated if it.get('metadata_only')]
+            reindex = [it for it in updated if not it.get('metadata_only')]
+            pending = [it for it in added + reindex if str(it['item_id']) not in completed]
             
-            # Get already indexed item IDs
-            indexed_ids = self.chroma.get_indexed_item_ids()
+            self.index_progress["total_items"] = len(added) + len(reindex)
+            self.index_progress["processed_items"] = len(added) + len(reindex) - len(pending)
+            self.index_progress["resumed_items"] = len(added) + len(reindex) - len(pending)
+            self.index_progress["skipped_items"] = unchanged
+            self.index_progress["added_items"] = len(added)
+            self.index_progress["updated_items"] = len(reindex)
+            self.index_progress["metadata_updated_items"] = len(metadata_only)
+            self.index_progress["removed_items"] = len(removed_ids)
             
-            # Find new items
-            new_item_ids = all_item_ids - indexed_ids
-            
-            # Filter to only new items
-            new_items_data = [it for it in raw_items if str(it['item_id']) in new_item_ids]
+            if not added and not updated and not removed_ids:
+                print("No new, modified or removed items to index.")
+                status = "completed"
+                return
             
-            self.index_progress["total_items"] = len(new_items_data)
-            self.index_progress["processed_items"] = 0
-            self.index_progress["skipped_items"] = len(indexed_ids)
+            print(
+                f"Found {len(added)} new, {len(reindex)} modified, {len(metadata_only)} with edited metadata "
+                f"and {len(removed_ids)} removed items (skipping {unchanged} unchanged)"
+            )
             
-            if len(new_items_data) == 0:
-                print("No new items to index.")
-                return
+            self._remove_items(removed_ids)
+            for it in metadata_only:
+                self.chroma.update_item_metadata(str(it['item_id']), it['fingerprint'], self._item_fields(it))
             
-            print(f"Found {len(new_items_data)} new items to index (skipping {len(indexed_ids)} already indexed)")
-            
-            items = [ZoteroItem(filepath=it['pdf_path'], metadata=it) for it in new_items_data]
-
-            # Extract text for each new item
-            for item in items:
-                if self._cancel_indexing:
-                    break
-                if not (item.filepath and os.path.exists(item.filepath)):
-                    self.index_progress["processed_items"] += 1
-                    continue
-                pdf = PDF(item.filepath)
-                pages_data = pdf.extract_text_with_pages()
-                item.metadata['pages_data'] = pages_data
-                text = "\n\n".join([p['text'] for p in pages_data])
-                item.metadata['text'] = text if text else ""
-
-            # Vectorize each new item
-            for item in items:
-                if self._cancel_indexing:
-                    break
-                pages_data = item.metadata.get('pages_data') or []
-                if not pages_data:
-                    self.index_progress["processed_items"] += 1
-                    continue
-                
-                chunks_with_pages = self.chunk_text_with_pages(pages_data)
-                if not chunks_with_pages:
-                    self.index_progress["processed_items"] += 1
-                    continue
-                
-                chunks = [c['text'] for c in chunks_with_pages]
-                vectors = [get_embedding(chunk, self.embedding_model_id) for chunk in chunks]
-                
-                from backend.embed_utils import get_embedding_dimension
-                expected_dim = get_embedding_dimension(self.embedding_model_id)
-                if vectors and len(vectors[0]) != expected_dim:
-                    print(f"WARNING: Unexpected embedding dimension {len(vectors[0])} for item {item.metadata.get('item_id')}, expected {expected_dim}")
-
-                item_id = str(item.metadata.get('item_id'))
-                chunk_ids = [f"{item_id}:{i}" for i in range(len(chunks))]
-
-                meta_src = item.metadata
-                title = meta_src.get("title") or ""
-                authors = meta_src.get("authors") or ""
-                tags = meta_src.get("tags") or ""
-                collections = meta_src.get("collections") or ""
-                year = meta_src.get("date") or ""
-                pdf_path = meta_src.get("pdf_path") or ""
-
-                metas = []
-                for i, chunk_info in enumerate(chunks_with_pages):
-                    metas.append({
-                        "item_id": item_id,
-                        "chunk_idx": int(i),
-                        "title": title,
-                        "authors": authors,
-                        "tags": tags,
-                        "collections": collections,
-                        "year": year,
-                        "pdf_path": pdf_path,
-                        "page": chunk_info['page'],
-                    })
+            self._items_to_replace = {str(it['item_id']) for it in reindex}
+            items = (ZoteroItem(filepath=it['pdf_path'], metadata=it) for it in pending)
 
-                self.chroma.add_chunks(
-                    ids=chunk_ids,
-                    documents=chunks,
-                    metadatas=metas,
-                    embeddings=vectors
-                )
-                self.index_progress["processed_items"] += 1
-                
-                # Calculate time estimates
-                elapsed = time.time() - self.index_progress["start_time"]
-                self.index_progress["elapsed_seconds"] = int(elapsed)
-                
-                processed = self.index_progress["processed_items"]
-                total = self.index_progress["total_items"]
-                if processed > 0 and total > 0:
-                    avg_time_per_item = elapsed / processed
-                    remaining_items = total - processed
-                    self.index_progress["eta_seconds"] = int(avg_time_per_item * remaining_items)
-                
-                time.sleep(0)
+            self._run_index_pipeline(items)
             
-            # Rebuild BM25 index after adding new chunks
-            if self.index_progress["processed_items"] > 0:
-                print("Rebuilding BM25 index...")
-                self.chroma.build_bm25_index()
+            # The BM25 index was updated chunk by chunk; persist it
+            self.chroma.save_bm25_index()
+            status = "cancelled" if self._cancel_indexing else "completed"
         finally:
+            self._finish_job(status)
             self.is_indexing = False
             self._cancel_indexing = False
+
+    def _begin_job(self, mode):
+        """Start (or resume) the checkpoint for an indexing job.
+        
+        Returns:
+            Set of item IDs already completed by the resumed job (empty for a new job)
+        """
+        self._checkpoint = self._job_checkpoint()
+        if self._checkpoint is None:
+            return set()
+        if self._resume_job:
+            completed = self._checkpoint.resume()
+            print(f"Resuming {mode} indexing job; {len(completed)} items already completed")
+            return completed
+        self._checkpoint.start(mode, self.embedding_model_id)
+        return set()
+
+    def _finish_job(self, status):
+        if self._checkpoint is not None:
+            try:
+                self._checkpoint.finish(status)
+            except OSError as e:
+                print(f"Failed to update indexing checkpoint: {e}")
+            self._checkpoint = None
+
+    def _job_checkpoint(self):
+        if not self.jobs_dir:
+            return None
+        name = self.embedding_model_id
+        if self.vector_backend != "chroma":
+            name = f"{name}-{self.vector_backend}"
+        return IndexCheckpoint(os.path.join(self.jobs_dir, name))
+
+    def get_resumable_job(self):
+        """Manifest of an interrupted indexing job for the current embedding model, or None."""
+        checkpoint = self._job_checkpoint()
+        return checkpoint.load_resumable() if checkpoint else None
+
+    def diff_library(self, raw_items):
+        """Compare Zotero items against the index using per-item fingerprints.
+        
+        Stores each item's current fingerprint under its 'fingerprint' key (and
+        that of its PDF under 'pdf_fingerprint') so they are recorded when the
+        item is (re-)indexed. Updated items whose PDF fingerprint still
+        matches the indexed one are flagged with 'metadata_only'.
+        
+        Items with an empty fingerprint or without an item fields row count as
+        updated too: the manifest was rebuilt from the collection (which holds
+        neither) or a write stopped between the collection and the manifest.
+        Without a recorded PDF fingerprint they are re-embedded.
+        
+        Args:
+            raw_items: ZoteroItems from search_parent_items_with_pdfs()
+            
+        Returns:
+            Tuple (added, updated, unchanged_count, removed_ids)
+        """
+        indexed = self.chroma.get_indexed_fingerprints()
+        indexed_pdfs = self.chroma.get_indexed_pdf_fingerprints()
+        
+        added = []
+        updated = []
+        current_ids = set()
+        for it in raw_items:
+            item_id = str(it['item_id'])
+            current_ids.add(item_id)
+            it['fingerprint'] = it.fingerprint()
+            it['pdf_fingerprint'] = it.pdf_fingerprint()
+            if item_id not in indexed:
+                added.append(it)
+            elif not indexed[item_id] or item_id not in indexed_pdfs or indexed[item_id] != it['fingerprint']:
+                it['metadata_only'] = bool(indexed_pdfs.get(item_id)) and indexed_pdfs[item_id] == it['pdf_fingerprint']
+                updated.append(it)
+        
+        removed_ids = set(indexed) - current_ids
+        unchanged = len(raw_items) - len(added) - len(updated)
+        return added, updated, unchanged, removed_ids
+
+    def library_stats(self, refresh=False):
+        """Counts of new, modified, unchanged and removed items, as diff_library() finds them.
+        
+        Diffing stats every PDF of the library, so the result is reused until
+        the index or the Zotero database changes, or for at most
+        LIBRARY_STATS_MAX_AGE seconds (PDFs replaced outside Zotero only show
+        up in the files themselves).
+        
+        Args:
+            refresh: Recompute even if nothing seems to have changed
+            
+        Returns:
+            Dict with 'zotero_items', 'new_items', 'modified_items',
+            'unchanged_items' and 'removed_items'
+        """
+        store = self.chroma
+        index_version = store.index_version()
+        library_version = self.zlib.library_version()
+        cached = self._library_stats
+        if (
+            not refresh and cached is not None
+            and cached[0] is store and cached[1] == index_version and cached[2] == library_version
+            and time.time() - cached[3] < LIBRARY_STATS_MAX_AGE
+        ):
+            return dict(cached[4])
+        
+        raw_items = self.zlib.search_parent_items_with_pdfs()
+        added, updated, unchanged, removed_ids = self.diff_library(raw_items)
+        stats = {
+            "zotero_items": len(raw_items),
+            "new_items": len(added),
+            "modified_items": len(updated),
+            "unchanged_items": unchanged,
+            "removed_items": len(removed_ids),
+        }
+        # Versions read before the diff: a write during it makes the next call recompute
+        self._library_stats = (store, index_version, library_version, time.time(), stats)
+        return dict(stats)
+
+    def _remove_items(self, item_ids):
+        """Delete the chunks of items that no longer exist in Zotero."""
+        for item_id in item_ids:
+            if self._cancel_indexing:
+                break
+            self.chroma.delete_item(item_id)
+
+    def _run_index_pipeline(self, items):
+        """Extract PDF text in a process pool and embed/store items as they become ready.
+        
+        At most max_items_in_flight items are extracted but not yet stored at any
+        time, so peak memory does not grow with library size. PDFs whose text is
+        already in the extraction cache are not parsed again. Stage depths are
+        reported under index_progress["stages"].
+        
+        Chunks are embedded in batches of embedding_batch_size and written to
+        Chroma in batches of write_batch_size, both spanning several items; the
+        buffer is flushed when the pipeline finishes or is cancelled, and items
+        are checkpointed only after their chunks have been written.
+        """
+        pipeline = IndexPipeline(
+            max_workers=self.extract_workers,
+            max_in_flight=self.max_items_in_flight,
+            should_cancel=lambda: self._cancel_indexing,
+            stages=self.index_progress.setdefault("stages", {}),
+            cache=self.text_cache,
+        )
+        self._write_buffer = ChunkWriteBuffer(
+            self.chroma, batch_size=self.write_batch_size, on_flush=self._checkpoint_items,
+            embed=self._embed_chunks, embed_batch_size=self.embedding_batch_size,
+        )
+        try:
+            pipeline.run(items, self._index_item)
+        finally:
+            self._write_buffer.flush()
+            self.index_progress["chroma_writes"] = self._write_buffer.flushes
+            self.index_progress["embedding_calls"] = self._write_buffer.embed_calls
+            self._write_buffer = None
+        self.index_progress["text_cache_hits"] = pipeline.cache_hits
+
+    def _index_item(self, item, pages_data):
+        """Chunk, embed and store a single extracted item (embedding stage of the pipeline)."""
+        item_id = str(item.metadata.get('item_id'))
+        if item_id in self._items_to_replace:
+            # Drop the previous version's chunks before storing the new ones
+            self.chroma.delete_item(item_id)
+        
+        if not pages_data:
+            # Missing, inaccessible or empty PDF
+            self._store_chunks(item_id, [], [], [])
+            return
+        
+        # Chunk with page awareness
+        chunks_with_pages = self.chunk_text_with_pages(pages_data)
+        if not chunks_with_pages:
+            self._store_chunks(item_id, [], [], [])
+            return
+        
+        chunks = [c['text'] for c in chunks_with_pages]
+
+        # Generate unique chunk IDs
+        chunk_ids = [f"{item_id}:{i}" for i in range(len(chunks))]
+
+        # Chunks only carry their position; item fields are stored once in the item table
+        metas = [
+            {"item_id": item_id, "chunk_idx": int(i), "page": chunk_info['page']}
+            for i, chunk_info in enumerate(chunks_with_pages)
+        ]
+
+        # Embedded by the write buffer together with the chunks of the next items
+        self._store_chunks(item_id, chunk_ids, chunks, metas, self._item_fields(item.metadata))
+
+    def _embed_chunks(self, texts):
+        """Embed chunk texts in batches, counting embedding cache hits in the index progress.
+        
+        Returns:
+            One vector (list of floats) per text
+        """
+        # Cached chunks are not re-encoded
+        cache_stats = self.index_progress.setdefault("embedding_cache", {})
+        vectors = get_embeddings(
+            texts, self.embedding_model_id, batch_size=self.embedding_batch_size, stats=cache_stats
+        ).tolist()
+        looked_up = cache_stats.get("cache_hits", 0) + cache_stats.get("cache_misses", 0)
+        cache_stats["hit_ratio"] = round(cache_stats.get("cache_hits", 0) / looked_up, 3) if looked_up else None
+        return vectors
+
+    @staticmethod
+    def _item_fields(meta_src):
+        """Per-item fields stored in the item table, sanitized to strings (no None)."""
+        return {
+            "title": meta_src.get("title") or "",
+            "authors": meta_src.get("authors") or "",
+            "tags": meta_src.get("tags") or "",
+            "collections": meta_src.get("collections") or "",
+            "year": meta_src.get("date") or "",
+            "pdf_path": meta_src.get("pdf_path") or "",
+            "fingerprint": meta_src.get("fingerprint") or "",
+            "pdf_fingerprint": meta_src.get("pdf_fingerprint") or "",
+        }
+
+    def _store_chunks(self, item_id, ids, documents, metadatas, item_metadata=None):
+        """Hand an item's chunks to the write buffer to be embedded and written (or do both directly outside the pipeline)."""
+        if self._write_buffer is not None:
+            self._write_buffer.add(item_id, ids, documents, metadatas, None, item_metadata)
+        else:
+            if ids:
+                self.chroma.add_chunks(
+                    ids=ids, documents=documents, metadatas=metadatas, embeddings=self._embed_chunks(documents),
+                    item_metadata={item_id: item_metadata} if item_metadata else None,
+                )
+            self._checkpoint_items([item_id])
+        self._mark_item_processed()
+
+    def _checkpoint_items(self, item_ids):
+        """Record items whose chunks are stored in the job checkpoint."""
+        if self._checkpoint is not None:
+            self._checkpoint.mark_completed(item_ids)
+
+    def _mark_item_processed(self):
+        """Advance the progress counter and refresh the time estimates."""
+        self.index_progress["processed_items"] += 1
+        
+        elapsed = time.time() - self.index_progress["start_time"]
+        self.index_progress["elapsed_seconds"] = int(elapsed)
+        
+        processed = self.index_progress["processed_items"]
+        total = self.index_progress["total_items"]
+        # Items completed before a resume took no time in this run
+        processed_now = processed - self.index_progress.get("resumed_items", 0)
+        if processed_now > 0 and total > 0:
+            avg_time_per_item = elapsed / processed_now
+            remaining_items = total - processed
+            self.index_progress["eta_seconds"] = int(avg_time_per_item * remaining_items)
     
-    def start_indexing(self, incremental: bool = True):
+    def start_indexing(self, incremental: bool = True, resume: bool = False):
         """Start indexing in a background thread. No-op if already indexing.
         
         Args:
             incremental: If True, only index new items. If False, reindex everything.
+            resume: If True and an interrupted job exists for the current embedding
+                    model, continue it (in its original mode) and skip the items it
+                    already completed.
         """
         if self.is_indexing:
             return
+        job = self.get_resumable_job() if resume else None
+        if job:
+            incremental = job.get("mode") == "incremental"
+        self._resume_job = job is not None
         self.is_indexing = True
         self._cancel_indexing = False
+        self._items_to_replace = set()
         # Reset progress
         self.index_progress = {
             "processed_items": 0,
@@ -312,7 +562,15 @@ class ZoteroChatbot:
             "elapsed_seconds": 0,
             "eta_seconds": None,
             "skipped_items": 0,
+            "added_items": 0,
+            "updated_items": 0,
+            "metadata_updated_items": 0,
+            "removed_items": 0,
+            "resumed_items": 0,
+            "resumed": job is not None,
             "mode": "incremental" if incremental else "full",
+            "stages": {"extracting": 0, "queued": 0, "embedding": 0},
+            "embedding_cache": {"cache_hits": 0, "cache_misses": 0, "hit_ratio": None},
         }
         
         # Choose worker based on mode
@@ -502,6 +760,27 @@ class ZoteroChatbot:
 
 
 
+    def _join_item_fields(self, metas):
+        """Add each chunk's item fields (title, authors, ...) from the item table.
+        
+        Chunks indexed before the item table existed carry these fields
+        themselves and are used as they are when the item has no entry.
+        """
+        item_ids = [str(m.get("item_id")) for m in metas if m and m.get("item_id") is not None]
+        try:
+            items = self.chroma.get_items_metadata(item_ids) if item_ids else {}
+        except Exception as e:
+            print(f"Failed to load item metadata: {e}")
+            items = {}
+        joined = []
+        for meta in metas:
+            meta = dict(meta or {})
+            fields = items.get(str(meta.get("item_id")))
+            if fields:
+                meta.update({key: value for key, value in fields.items() if value or key not in meta})
+            joined.append(meta)
+        return joined
+
     def chat(self, query, filter_item_ids=None, session_id=None):
         """
         Process a chat query with stateful conversation history.
@@ -532,8 +811,14 @@ class ZoteroChatbot:
         
         # 2) RE-RANK using cross-encoder for better relevance
         # This is the key improvement from the Reddit thread
+        # Candidates are in fused (RRF) order, so only the head is worth scoring
+        docs = docs[:self.rerank_candidates]
+        metas = self._join_item_fields(metas[:self.rerank_candidates])
+        timings = dict(results.get("timings") or {})
         if docs:
+            rerank_start = time.perf_counter()
             ranked = rerank_passages(query, docs, top_k=10)
+            timings["rerank_ms"] = round((time.perf_counter() - rerank_start) * 1000, 2)
             # Reorder docs and metas based on re-ranking scores
             docs = [docs[idx] for idx, score in ranked]
             metas = [metas[idx] for idx, score in ranked]
@@ -662,6 +947,7 @@ class ZoteroChatbot:
             "citations": citations,
             "snippets": snippets,
             "generated_title": generated_title,  # Include in response for frontend
+            "retrieval_timings": timings,
         }
     
     def build_contextual_user_message(self, question: str, snippets: list[dict]) -> str:
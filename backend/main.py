@@ -1,6 +1,7 @@
 # backend/main.py
 # uvicorn backend.main:app --reload
 from fastapi import FastAPI, Query, Body
+from fastapi.responses import JSONResponse
 from typing import Optional
 from backend.zoteroitem import ZoteroItem
 from backend.external_api_utils import fetch_google_book_reviews, fetch_semantic_scholar_data
@@ -8,14 +9,28 @@ from backend.pdf import PDF
 from backend.zotero_dbase import ZoteroLibrary
 from fastapi.middleware.cors import CORSMiddleware
 from backend.interface import ZoteroChatbot
-from backend.vector_db import ChromaClient
-from backend.embed_utils import get_embedding
+from backend.vector_store import list_vector_collections, DEFAULT_VECTOR_BACKEND
+from backend.embed_utils import (
+    get_embedding, configure_embedding_backend, configure_model_cache, get_readiness, get_model_cache_stats,
+    clear_query_embedding_cache, get_query_embedding_cache_stats, get_embedding_cache_stats, set_embedding_cache_budget,
+    DEFAULT_BATCH_SIZE, DEFAULT_EMBEDDING_BACKEND,
+)
 from backend.profile_manager import ProfileManager
+from contextlib import asynccontextmanager
 import os
 import json
 from pathlib import Path
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Open the vector store and load the models in the background, so the
+    # server binds right away and /health reports when they are ready
+    chatbot.start_warm_up()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Initialize profile manager
 try:
@@ -69,6 +84,14 @@ def load_settings(profile_id: str = None):
         "activeProviderId": "ollama",
         "activeModel": "",
         "embeddingModel": "bge-base",
+        "embeddingBatchSize": DEFAULT_BATCH_SIZE,
+        "embeddingBackend": DEFAULT_EMBEDDING_BACKEND,
+        "modelCacheSizeMB": 2048,
+        "modelIdleMinutes": 30,
+        "extractionCacheSizeMB": 1024,
+        "embeddingCacheSizeMB": 1024,
+        "vectorBackend": DEFAULT_VECTOR_BACKEND,
+        "flatVectorDtype": "float32",
         "zoteroPath": DB_PATH,
         "chromaPath": CHROMA_PATH,
         "providers": {
@@ -205,6 +228,12 @@ def initialize_chatbot():
         if provider_config.get("enabled"):
             provider_credentials[provider_id] = provider_config.get("credentials", {})
     
+    # Loaded embedding models kept in memory (LRU within the budget, unloaded when idle)
+    configure_model_cache(
+        max_bytes=int(settings.get("modelCacheSizeMB") or 2048) * 1024 * 1024,
+        idle_seconds=float(settings.get("modelIdleMinutes") or 0) * 60,
+    )
+    
     # Use profile-specific chroma path if not customized
     chroma_path = settings.get("chromaPath")
     if not chroma_path:
@@ -216,7 +245,15 @@ def initialize_chatbot():
         active_provider_id=settings.get("activeProviderId", "ollama"),
         active_model=settings.get("activeModel"),
         credentials=provider_credentials,
-        embedding_model_id=settings.get("embeddingModel", "bge-base")
+        embedding_model_id=settings.get("embeddingModel", "bge-base"),
+        embedding_batch_size=int(settings.get("embeddingBatchSize") or DEFAULT_BATCH_SIZE),
+        cache_dir=profile_manager.get_profile_cache_path(active['id']),
+        extraction_cache_bytes=int(settings.get("extractionCacheSizeMB") or 1024) * 1024 * 1024,
+        embedding_cache_bytes=int(settings.get("embeddingCacheSizeMB") or 1024) * 1024 * 1024,
+        jobs_dir=profile_manager.get_profile_index_jobs_path(active['id']),
+        vector_backend=settings.get("vectorBackend") or DEFAULT_VECTOR_BACKEND,
+        flat_vector_dtype=settings.get("flatVectorDtype") or "float32",
+        embedding_backend=settings.get("embeddingBackend") or DEFAULT_EMBEDDING_BACKEND
     )
 
 chatbot = initialize_chatbot()
@@ -275,6 +312,23 @@ def health_check():
             }
             health_status["status"] = "degraded"
         
+        # Vector store, embedding model and reranker load in the background after startup
+        models = get_readiness()
+        health_status["ready"] = models["ready"] and chatbot.vector_store_open
+        health_status["components"]["vector_store"] = {
+            "status": "ok" if chatbot.vector_store_open else "loading",
+            "backend": chatbot.open_vector_backend
+        }
+        health_status["components"]["models"] = {
+            "status": "ok" if models["ready"] else ("error" if models["status"] == "error" else "loading"),
+            **models,
+            "cache": get_model_cache_stats(),
+            "query_cache": get_query_embedding_cache_stats(),
+            "embedding_cache": get_embedding_cache_stats()
+        }
+        if models["status"] == "error":
+            health_status["status"] = "degraded"
+        
         return health_status
         
     except Exception as e:
@@ -346,11 +400,17 @@ def index_library(payload: dict = Body(default={"incremental": True})):
         payload: JSON with optional "incremental" boolean (default: True)
                  - True: Only index new items not already in the database
                  - False: Full reindex of all items
+                 and optional "resume" boolean (default: False)
+                 - True: Continue an interrupted job (in its original mode),
+                   skipping the items it already completed
     """
     try:
         incremental = payload.get("incremental", True)
-        chatbot.start_indexing(incremental=incremental)
-        mode = "incremental" if incremental else "full"
+        resume = bool(payload.get("resume", False))
+        chatbot.start_indexing(incremental=incremental, resume=resume)
+        mode = chatbot.index_progress.get("mode") or ("incremental" if incremental else "full")
+        if chatbot.index_progress.get("resumed"):
+            return {"msg": f"Indexing resumed ({mode} mode)."}
         return {"msg": f"Indexing started ({mode} mode)."}
     except Exception as e:
         return {"error": str(e)}
@@ -434,7 +494,9 @@ def index_status():
     try:
         status = "indexing" if getattr(chatbot, "is_indexing", False) else "idle"
         progress = getattr(chatbot, "index_progress", None) or {}
-        return {"status": status, "progress": progress}
+        # An interrupted job can be continued with POST /index_library {"resume": true}
+        resumable_job = None if status == "indexing" else chatbot.get_resumable_job()
+        return {"status": status, "progress": progress, "resumable_job": resumable_job}
     except Exception as e:
         return {"error": str(e)}
 
@@ -452,35 +514,36 @@ def db_health():
 
 
 @app.get("/index_stats")
-def index_stats():
+def index_stats(refresh: bool = Query(False)):
     """Get statistics about the indexed library.
     
+    The comparison with Zotero is reused until the index or the Zotero
+    database changes (see ZoteroChatbot.library_stats); pass refresh=true to
+    recompute it.
+    
     Returns:
         - indexed_items: Number of unique items in the database
         - total_chunks: Total number of text chunks indexed
         - zotero_items: Total number of items in Zotero library with PDFs
         - new_items: Number of items in Zotero not yet indexed
+        - modified_items: Number of indexed items whose PDF or metadata changed
+        - removed_items: Number of indexed items no longer in Zotero
     """
     try:
-        # Get indexed item IDs
-        indexed_ids = chatbot.chroma.get_indexed_item_ids()
+        # Compare Zotero items with the index by fingerprint
+        stats = chatbot.library_stats(refresh=refresh)
         
         # Get total chunks
         total_chunks = chatbot.chroma.get_document_count()
         
-        # Get all Zotero items
-        raw_items = chatbot.zlib.search_parent_items_with_pdfs()
-        zotero_item_ids = {str(it['item_id']) for it in raw_items}
-        
-        # Calculate new items
-        new_item_ids = zotero_item_ids - indexed_ids
-        
         return {
-            "indexed_items": len(indexed_ids),
+            "indexed_items": stats["unchanged_items"] + stats["modified_items"] + stats["removed_items"],
             "total_chunks": total_chunks,
-            "zotero_items": len(zotero_item_ids),
-            "new_items": len(new_item_ids),
-            "needs_sync": len(new_item_ids) > 0,
+            "zotero_items": stats["zotero_items"],
+            "new_items": stats["new_items"],
+            "modified_items": stats["modified_items"],
+            "removed_items": stats["removed_items"],
+            "needs_sync": bool(stats["new_items"] or stats["modified_items"] or stats["removed_items"]),
             "current_embedding_model": chatbot.embedding_model_id,
             "collection_name": chatbot.chroma.collection_name
         }
@@ -494,33 +557,18 @@ def list_embedding_collections():
     Shows which embedding models have been used to index the library.
     """
     try:
-        settings = load_settings()
-        chroma_path = settings.get("chromaPath", CHROMA_PATH)
-        
-        # Create a temporary ChromaDB client to list collections
-        import chromadb
-        from chromadb.config import Settings
-        client = chromadb.PersistentClient(path=chroma_path, settings=Settings())
-        
-        collections = client.list_collections()
-        
-        # Parse collection names to extract embedding models
-        embedding_collections = []
-        for col in collections:
-            # Collection names follow pattern: zotero_lib_{embedding_model_id}
-            if col.name.startswith("zotero_lib_"):
-                embedding_model_id = col.name.replace("zotero_lib_", "")
-                item_count = col.count()
-                embedding_collections.append({
-                    "collection_name": col.name,
-                    "embedding_model_id": embedding_model_id,
-                    "item_count": item_count,
-                    "is_current": embedding_model_id == chatbot.embedding_model_id
-                })
+        # The store serving queries, which may differ from saved settings until it is reopened
+        vector_backend = chatbot.open_vector_backend
+        
+        embedding_collections = [
+            {**col, "is_current": col["embedding_model_id"] == chatbot.embedding_model_id}
+            for col in list_vector_collections(vector_backend, chatbot.chroma_path)
+        ]
         
         return {
             "collections": embedding_collections,
-            "current_embedding_model": chatbot.embedding_model_id
+            "current_embedding_model": chatbot.embedding_model_id,
+            "vector_backend": vector_backend
         }
     except Exception as e:
         return {"error": str(e)}
@@ -586,8 +634,8 @@ def ollama_status():
 
 @app.get("/embedding_models")
 def list_embedding_models():
-    """List all available embedding models."""
-    from backend.embed_utils import EMBEDDING_MODELS
+    """List all available embedding models and inference backends."""
+    from backend.embed_utils import EMBEDDING_MODELS, EMBEDDING_BACKENDS, get_embedding_backend
     try:
         models = [
             {
@@ -596,7 +644,11 @@ def list_embedding_models():
             }
             for model_id, config in EMBEDDING_MODELS.items()
         ]
-        return {"models": models}
+        return {
+            "models": models,
+            "backends": list(EMBEDDING_BACKENDS),
+            "current_backend": get_embedding_backend()
+        }
     except Exception as e:
         return {"error": str(e)}
 
@@ -864,10 +916,39 @@ def save_profile_sessions(profile_id: str, sessions_data: dict = Body(...)):
         return {"error": str(e)}
 
 
+def indexing_setting_changes(settings: dict) -> set:
+    """Settings in an update that differ from those the index is built with.
+    
+    Changing the embedding model, vector backend or flat dtype reopens the
+    vector store; changing the embedding backend changes the vectors new
+    chunks get. Neither may happen while an indexing job runs.
+    """
+    current = {
+        "embeddingModel": (chatbot.embedding_model_id, "bge-base"),
+        "embeddingBackend": (chatbot.embedding_backend, DEFAULT_EMBEDDING_BACKEND),
+        "vectorBackend": (chatbot.vector_backend, DEFAULT_VECTOR_BACKEND),
+        "flatVectorDtype": (chatbot.flat_vector_dtype, "float32"),
+    }
+    return {
+        key for key, (value, default) in current.items()
+        if key in settings and (settings[key] or default) != value
+    }
+
+
 @app.post("/settings")
 def update_settings(settings: dict = Body(...)):
     """Update application settings."""
+    global DB_PATH, CHROMA_PATH, chatbot
     try:
+        # The indexing job would write to a closed store, or mix vectors of two embedding backends
+        index_changes = indexing_setting_changes(settings)
+        if chatbot.is_indexing and index_changes:
+            return JSONResponse(
+                status_code=409,
+                content={"error": "Cannot change the embedding model, embedding backend or vector store "
+                                  "while indexing. Wait for indexing to finish or cancel it first."},
+            )
+        
         current_settings = load_settings()
         
         # Deep copy to avoid mutation issues
@@ -911,12 +992,18 @@ def update_settings(settings: dict = Body(...)):
         
         if save_settings(updated_settings):
             # Update global paths if they changed
-            global DB_PATH, CHROMA_PATH, chatbot
             if "zoteroPath" in settings:
                 DB_PATH = settings["zoteroPath"]
             if "chromaPath" in settings:
                 CHROMA_PATH = settings["chromaPath"]
             
+            # Backend options first, so an embedding model switch below opens the store only once
+            if index_changes & {"vectorBackend", "flatVectorDtype"}:
+                chatbot.vector_backend = updated_settings.get("vectorBackend") or DEFAULT_VECTOR_BACKEND
+                chatbot.flat_vector_dtype = updated_settings.get("flatVectorDtype") or "float32"
+                if "embeddingModel" not in index_changes:
+                    chatbot.reopen_vector_store()
+            
             # Reinitialize chatbot with new provider or embedding settings
             if "activeProviderId" in settings or "activeModel" in settings or "embeddingModel" in settings:
                 try:
@@ -933,22 +1020,40 @@ def update_settings(settings: dict = Body(...)):
                             credentials=provider_credentials
                         )
                     
-                    # Update embedding model if changed - requires new ChromaClient
+                    # Update embedding model if changed - requires a new vector store
                     if "embeddingModel" in settings:
                         new_embedding_model = updated_settings.get("embeddingModel", "bge-base")
                         old_embedding_model = chatbot.embedding_model_id
                         if new_embedding_model != old_embedding_model:
                             print(f"Switching embedding model from {old_embedding_model} to {new_embedding_model}")
-                            print(f"Creating new ChromaClient with collection: zotero_lib_{new_embedding_model}")
+                            print(f"Opening {chatbot.vector_backend} vector store with collection: zotero_lib_{new_embedding_model}")
                             chatbot.embedding_model_id = new_embedding_model
-                            # Reinitialize ChromaClient with new embedding model
-                            chroma_path = updated_settings.get("chromaPath", CHROMA_PATH)
-                            chatbot.chroma = ChromaClient(chroma_path, embedding_model_id=new_embedding_model)
+                            clear_query_embedding_cache()
+                            # Reinitialize the vector store with new embedding model
+                            chatbot.chroma_path = updated_settings.get("chromaPath", CHROMA_PATH)
+                            chatbot.reopen_vector_store()
+                            chatbot.start_warm_up()
                         else:
                             print(f"Embedding model unchanged: {chatbot.embedding_model_id}")
                 except Exception as e:
                     print(f"Warning: Failed to update chatbot settings: {e}")
             
+            if "embeddingBackend" in index_changes:
+                chatbot.embedding_backend = updated_settings.get("embeddingBackend") or DEFAULT_EMBEDDING_BACKEND
+                configure_embedding_backend(chatbot.embedding_backend)
+                chatbot.start_warm_up()
+            if "modelCacheSizeMB" in settings or "modelIdleMinutes" in settings:
+                configure_model_cache(
+                    max_bytes=int(updated_settings.get("modelCacheSizeMB") or 2048) * 1024 * 1024,
+                    idle_seconds=float(updated_settings.get("modelIdleMinutes") or 0) * 60,
+                )
+            if "embeddingBatchSize" in settings:
+                chatbot.embedding_batch_size = int(updated_settings.get("embeddingBatchSize") or DEFAULT_BATCH_SIZE)
+            if "extractionCacheSizeMB" in settings and chatbot.text_cache is not None:
+                chatbot.text_cache.max_bytes = int(updated_settings.get("extractionCacheSizeMB") or 1024) * 1024 * 1024
+            if "embeddingCacheSizeMB" in settings:
+                set_embedding_cache_budget(int(updated_settings.get("embeddingCacheSizeMB") or 1024) * 1024 * 1024)
+            
             return {"success": True, "message": "Settings saved successfully"}
         else:
             return {"error": "Failed to save settings"}
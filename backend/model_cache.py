@@ -0,0 +1,196 @@
+# model_cache.py
+"""
+In-memory cache of loaded models.
+
+Keeps several models loaded at once (for example the embedding models of
+two profiles being compared) within a memory budget. When a load pushes the
+total estimated size over the budget, the least recently used models are
+unloaded. Models unused for idle_seconds are unloaded by a background
+sweeper thread, so a model used once does not stay resident.
+
+Loads are serialized per key: concurrent requests for a model that is
+being loaded wait for that load instead of starting their own, while
+different models can load in parallel.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Default budget for the estimated size of all loaded models
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Unload models that have not been used for this long (None or 0 disables it)
+DEFAULT_IDLE_SECONDS = 30 * 60
+
+
+class _Entry:
+    __slots__ = ("model", "nbytes", "last_used")
+
+    def __init__(self, model: Any, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.last_used = time.monotonic()
+
+
+class ModelCache:
+    """
+    LRU cache of loaded models bounded by estimated memory and idle time.
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        idle_seconds: Optional[float] = DEFAULT_IDLE_SECONDS,
+        size_of: Callable[[Any], int] = lambda model: 0,
+    ):
+        """
+        Args:
+            max_bytes: Budget for the summed size estimates of loaded models
+                (the most recently loaded model is kept even if it alone exceeds it)
+            idle_seconds: Unload models unused for this long (None or 0: never)
+            size_of: Estimates the memory held by a loaded model, in bytes
+        """
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._size_of = size_of
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.evictions = 0
+        self.idle_unloads = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the model cached under key, calling loader() to load it if needed."""
+        with self._lock:
+            model = self._touch(key)
+            if model is not None:
+                self.hits += 1
+                return model
+            self.misses += 1
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Loaded by a concurrent caller while this one waited
+                model = self._touch(key)
+                if model is not None:
+                    return model
+            try:
+                start = time.perf_counter()
+                model = loader()
+                elapsed = time.perf_counter() - start
+                nbytes = int(self._size_of(model) or 0)
+                with self._lock:
+                    self.loads += 1
+                    self.load_seconds += elapsed
+                    self._entries[key] = _Entry(model, nbytes)
+                    self._evict()
+                    self._start_sweeper()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        print(f"Loaded model {key} in {elapsed:.1f}s (~{nbytes / 1024 / 1024:.0f} MB)")
+        return model
+
+    def contains(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def keys(self) -> List[Hashable]:
+        """Keys of the loaded models, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def configure(self, max_bytes: Optional[int] = None, idle_seconds: Optional[float] = None) -> None:
+        """Change the memory budget and/or idle timeout (applied right away)."""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if idle_seconds is not None:
+                self.idle_seconds = idle_seconds
+            self._evict()
+            self._start_sweeper()
+        self.unload_idle()
+
+    def unload_idle(self) -> int:
+        """Unload models unused for idle_seconds; returns how many were unloaded."""
+        with self._lock:
+            if not self.idle_seconds:
+                return 0
+            cutoff = time.monotonic() - self.idle_seconds
+            idle = [key for key, entry in self._entries.items() if entry.last_used < cutoff]
+            for key in idle:
+                del self._entries[key]
+                print(f"Unloaded idle model {key}")
+            self.idle_unloads += len(idle)
+            return len(idle)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters (hits, misses, loads, load time, evictions, idle unloads) and loaded models."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 2),
+                "evictions": self.evictions,
+                "idle_unloads": self.idle_unloads,
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "models": [
+                    {"key": key, "bytes": entry.nbytes, "idle_seconds": round(now - entry.last_used, 1)}
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+    def _touch(self, key: Hashable) -> Any:
+        """Model under key marked as just used, or None. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def _evict(self) -> None:
+        """
+        Unload least recently used models until within budget, always keeping
+        the most recently used one. Caller holds the lock.
+        """
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= self._entries.pop(key).nbytes
+            self.evictions += 1
+            print(f"Unloaded model {key} to stay within the model memory budget")
+
+    def _start_sweeper(self) -> None:
+        """Start the idle sweeper thread if idle unloading is on. Caller holds the lock."""
+        if not self.idle_seconds or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+        self._sweeper = threading.Thread(target=self._sweep, name="model-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while True:
+            idle_seconds = self.idle_seconds
+            if not idle_seconds:
+                return
+            time.sleep(min(max(idle_seconds / 4, 1.0), 60.0))
+            self.unload_idle()
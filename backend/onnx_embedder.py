@@ -0,0 +1,230 @@
+# onnx_embedder.py
+"""
+Sentence embeddings with ONNX Runtime on CPU.
+
+Each embedding model is exported once from its SentenceTransformer and
+cached on disk. Only the transformer goes into the ONNX graph; pooling and
+normalization are read from the SentenceTransformer's own modules at export
+time and applied here in NumPy, so the output matches model.encode(). After
+the export, loading and encoding need only onnxruntime and tokenizers.
+
+The int8 variant quantizes the exported weights dynamically (QInt8 MatMuls).
+It is about four times smaller and faster on CPUs with VNNI, at a cosine
+agreement with the float32 output of about 0.99.
+
+Layout under <export_dir>/<model_id>/:
+- model.onnx: float32 graph (input ids, attention mask[, token type ids] ->
+  last hidden state)
+- model-int8.onnx: quantized copy, written on first use of the int8 backend
+- tokenizer.json: fast tokenizer of the model
+- config.json: pooling mode, normalization, max sequence length, padding
+  token and the export format version (older exports are redone)
+
+Exporting needs torch, sentence_transformers and onnx, which are only
+imported when an export is actually run.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+# Bump when the exported files or their config change meaning
+EXPORT_FORMAT_VERSION = 1
+
+ONNX_OPSET = 17
+
+# Pooling modes of sentence_transformers' Pooling module supported here
+POOLING_MODES = ("cls", "mean", "max")
+
+
+def export_model(model_name: str, out_dir: str) -> None:
+    """
+    Export a SentenceTransformer's transformer to ONNX, with the tokenizer and pooling config.
+
+    Args:
+        model_name: Hugging Face name or local path of the SentenceTransformer
+        out_dir: Directory to create (replaced atomically when the export is complete)
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Exporting {model_name} to ONNX (one-time)...")
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    tokenizer = transformer.tokenizer
+    pooling_mode = "mean"
+    normalize = False
+    for module in list(model)[1:]:
+        kind = type(module).__name__
+        if kind == "Pooling":
+            pooling_mode = module.get_pooling_mode_str()
+        elif kind == "Normalize":
+            normalize = True
+        else:
+            raise ValueError(f"Cannot export {model_name}: unsupported module {kind}")
+    if pooling_mode not in POOLING_MODES:
+        raise ValueError(f"Cannot export {model_name}: unsupported pooling mode {pooling_mode}")
+
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in tokenizer.model_input_names
+    ]
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".export-")
+    try:
+        sample = tokenizer(["an example sentence", "another"], padding=True, return_tensors="pt")
+        dynamic = {"batch": 0, "sequence": 1}
+        encoder = _Encoder(transformer.auto_model).eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                encoder,
+                tuple(sample[name] for name in input_names),
+                os.path.join(tmp_dir, "model.onnx"),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    name: {axis: label for label, axis in dynamic.items()}
+                    for name in [*input_names, "last_hidden_state"]
+                },
+                opset_version=ONNX_OPSET,
+                dynamo=False,
+            )
+        tokenizer.backend_tokenizer.save(os.path.join(tmp_dir, "tokenizer.json"))
+        config = {
+            "format": EXPORT_FORMAT_VERSION,
+            "model_name": model_name,
+            "pooling_mode": pooling_mode,
+            "normalize": normalize,
+            "max_seq_length": model.max_seq_length or 512,
+            "do_lower_case": bool(getattr(transformer, "do_lower_case", False)),
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+            "dimension": model.get_sentence_embedding_dimension(),
+        }
+        with open(os.path.join(tmp_dir, "config.json"), "w") as f:
+            json.dump(config, f, indent=2)
+
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    print(f"Exported {model_name} to {out_dir}")
+
+
+def quantize_model(model_dir: str) -> str:
+    """Write the int8 (dynamically quantized) copy of an exported model and return its path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = os.path.join(model_dir, "model.onnx")
+    target = os.path.join(model_dir, "model-int8.onnx")
+    tmp_path = target + ".tmp"
+    print(f"Quantizing {source} to int8 (one-time)...")
+    quantize_dynamic(source, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, target)
+    return target
+
+
+def read_export_config(model_dir: str) -> Optional[dict]:
+    """Config of an exported model, or None if it is missing or from an older export format."""
+    try:
+        with open(os.path.join(model_dir, "config.json")) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return config if config.get("format") == EXPORT_FORMAT_VERSION else None
+
+
+class OnnxEmbedder:
+    """
+    Encodes texts with an exported model through ONNX Runtime.
+
+    encode() takes the same main arguments as SentenceTransformer.encode()
+    and returns float32 embeddings of the same shape. Safe to share between
+    threads (ONNX Runtime sessions allow concurrent run() calls).
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_dir: Directory written by export_model()
+            quantized: Use the int8 graph (created from the float32 one if missing)
+            num_threads: Intra-op threads (None lets ONNX Runtime use all cores)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        config = read_export_config(model_dir)
+        if config is None:
+            raise ValueError(f"No current ONNX export in {model_dir}")
+        self.config = config
+        self.pooling_mode = config["pooling_mode"]
+        self.normalize = config["normalize"]
+        self.do_lower_case = config.get("do_lower_case", False)
+        self.max_seq_length = config["max_seq_length"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+
+        path = os.path.join(model_dir, "model-int8.onnx" if quantized else "model.onnx")
+        if quantized and not os.path.exists(path):
+            path = quantize_model(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        # Size of the graph's weights, as an estimate of the memory the session holds
+        self.nbytes = os.path.getsize(path)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Embed texts in batches of batch_size; returns an array of shape (len(sentences), dimension)."""
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size=batch_size)[0]
+        # Same preprocessing as sentence_transformers' Transformer.tokenize()
+        sentences = [str(s).strip() for s in sentences]
+        if self.do_lower_case:
+            sentences = [s.lower() for s in sentences]
+        out = np.empty((len(sentences), self.config["dimension"]), dtype=np.float32)
+        for start in range(0, len(sentences), max(1, batch_size)):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+            out[start:start + len(encodings)] = self._pool(hidden, mask)
+        return out
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling_mode == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling_mode == "max":
+            pooled = np.where(mask[:, :, None] > 0, hidden, -1e9).max(axis=1)
+        else:
+            weights = mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32, copy=False)
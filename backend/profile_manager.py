@@ -56,6 +56,14 @@ class ProfileManager:
         """Get the ChromaDB path for a profile."""
         return str(self.get_profile_dir(profile_id) / "chroma")
     
+    def get_profile_cache_path(self, profile_id: str) -> str:
+        """Get the cache directory (extracted text, etc.) for a profile."""
+        return str(self.get_profile_dir(profile_id) / "cache")
+    
+    def get_profile_index_jobs_path(self, profile_id: str) -> str:
+        """Get the directory holding indexing job checkpoints for a profile."""
+        return str(self.get_profile_dir(profile_id) / "index_jobs")
+    
     def get_profile_metadata_file(self, profile_id: str) -> Path:
         """Get the metadata file path for a profile."""
         return self.get_profile_dir(profile_id) / "profile.json"
@@ -0,0 +1,732 @@
+# sparse_index.py
+"""
+Incrementally updatable BM25 index for sparse retrieval.
+
+Documents (chunks) are added and removed as items are indexed, so syncing a
+few papers costs time proportional to their chunks rather than a rebuild of
+the whole library.
+
+Postings are kept in two parts:
+- base: a read-only segment written at the last compaction and opened with
+  np.memmap: a CSR term -> posting matrix (indptr / rows / term frequencies),
+  document lengths, and id / item tables
+- delta: in-memory per-term posting lists for documents added since then
+
+Removed documents are masked out until the next compaction, which merges
+the delta into a new base and drops dead rows.
+
+The chunks of an item occupy contiguous row ranges (an item's chunks are
+added together and compaction preserves row order), which are kept per item
+so that queries scoped to a few items only score postings inside them.
+
+Layout under the index directory:
+- CURRENT: JSON naming the format version and the live base generation
+- base-<generation>/: meta.json plus raw little-endian arrays
+    terms.bin / term_offsets.bin    sorted vocabulary (UTF-8, looked up by binary search)
+    indptr.bin / rows.bin / tf.bin  postings, one CSR row per term
+    lengths.bin                     tokens per document
+    ids.bin / id_offsets.bin        document id of every row
+    items.bin / item_offsets.bin    sorted item ids
+    item_ptr.bin / range_starts.bin / range_ends.bin   row ranges per item
+- ops.jsonl: append-only log of adds/removes since the base was written,
+  replayed on load; folded into a new base once it grows past a fraction of
+  the index
+
+Opening an index maps the base files without reading them, so the first
+query does not wait for the whole index to load and the postings stay in the
+shared page cache.
+
+Scoring matches rank_bm25's BM25Okapi (k1=1.5, b=0.75, negative IDFs floored
+to epsilon * average IDF), but only the postings of the query terms are
+visited and the top k is selected with argpartition.
+"""
+
+import json
+import os
+import shutil
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+# Bump when the on-disk layout changes; other versions are ignored and rebuilt
+FORMAT_VERSION = 3
+
+# Compact once the log holds this fraction of the indexed documents (or this many, whichever is larger)
+_COMPACT_RATIO = 0.25
+_COMPACT_MIN_DOCS = 1000
+
+_EMPTY_ROWS = np.zeros(0, dtype=np.int32)
+_EMPTY_TF = np.zeros(0, dtype=np.float32)
+
+# name -> dtype of every array file in a base segment
+_BASE_ARRAYS = {
+    "terms": "u1",
+    "term_offsets": "<i8",
+    "indptr": "<i8",
+    "rows": "<i4",
+    "tf": "<f4",
+    "lengths": "<f4",
+    "ids": "u1",
+    "id_offsets": "<i8",
+    "items": "u1",
+    "item_offsets": "<i8",
+    "item_ptr": "<i8",
+    "range_starts": "<i8",
+    "range_ends": "<i8",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Simple lowercase whitespace tokenization (shared by documents and queries)."""
+    return text.lower().split()
+
+
+class _BaseSegment:
+    """Read-only, memory-mapped postings and tables written by a compaction."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported sparse index format {meta.get('version')}")
+        self.path = path
+        self.n_terms = meta["n_terms"]
+        self.n_rows = meta["n_rows"]
+        self.n_items = meta["n_items"]
+        for name, dtype in _BASE_ARRAYS.items():
+            setattr(self, name, _map(os.path.join(path, f"{name}.bin"), dtype))
+
+    def term_id(self, term: str) -> Optional[int]:
+        return _bisect(self.terms, self.term_offsets, self.n_terms, term.encode("utf-8"))
+
+    def doc_id(self, row: int) -> str:
+        return _string_at(self.ids, self.id_offsets, row)
+
+    def item_ranges(self, item_id: str) -> List[Tuple[int, int]]:
+        i = _bisect(self.items, self.item_offsets, self.n_items, item_id.encode("utf-8"))
+        if i is None:
+            return []
+        lo, hi = self.item_ptr[i], self.item_ptr[i + 1]
+        return list(zip(self.range_starts[lo:hi].tolist(), self.range_ends[lo:hi].tolist()))
+
+    def all_terms(self) -> List[str]:
+        return _all_strings(self.terms, self.term_offsets)
+
+    def all_doc_ids(self) -> List[str]:
+        return _all_strings(self.ids, self.id_offsets)
+
+    def row_items(self) -> Tuple[List[str], np.ndarray]:
+        """Item ids and, for every row, the index of its item in that list."""
+        items = _all_strings(self.items, self.item_offsets)
+        row_item = np.full(self.n_rows, -1, dtype=np.int64)
+        range_item = np.repeat(np.arange(self.n_items), np.diff(self.item_ptr))
+        for item, start, end in zip(range_item, self.range_starts, self.range_ends):
+            row_item[start:end] = item
+        return items, row_item
+
+
+class SparseIndex:
+    """
+    BM25 inverted index supporting incremental add/remove, persisted on disk.
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._current_path = os.path.join(index_dir, "CURRENT")
+        self._log_path = os.path.join(index_dir, "ops.jsonl")
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._log = None
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._base: Optional[_BaseSegment] = None
+        self._base_rows = 0
+        self._generation = 0
+        # Postings of documents added after the base was written: term -> (rows, tfs)
+        self._delta: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._delta_ids: List[str] = []
+        self._delta_items: List[str] = []
+        self._delta_ranges: Dict[str, List[List[int]]] = {}  # item id -> [start, end) row ranges
+        # Per-row state (base rows first, then delta rows)
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._n_rows = 0
+        self._n_live = 0
+        self._total_len = 0.0
+        # doc id -> row, built on the first add/remove so that queries never need it
+        self._row_index: Optional[Dict[str, int]] = None
+        self._logged_docs = 0
+        # Live document frequencies (base terms as an array, delta-only terms in a dict)
+        self._df_base = None
+        self._df_extra: Dict[str, int] = {}
+        self._average_idf = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._n_live
+
+    def exists(self) -> bool:
+        """Whether the index has been persisted before."""
+        return os.path.exists(self._current_path) or os.path.exists(self._log_path)
+
+    def add(self, ids: List[str], documents: List[str], item_ids: List[str]) -> None:
+        """Index documents, replacing any already indexed under the same id."""
+        if not ids:
+            return
+        entries = [
+            (str(doc_id), str(item_id), dict(Counter(tokenize(doc or ""))))
+            for doc_id, doc, item_id in zip(ids, documents, item_ids)
+        ]
+        with self._lock:
+            self._ensure_loaded()
+            for doc_id, item_id, tf in entries:
+                self._add_doc(doc_id, item_id, tf)
+            self._append_log({"op": "add", "docs": entries})
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove documents by id."""
+        ids = [str(doc_id) for doc_id in ids]
+        with self._lock:
+            self._ensure_loaded()
+            row_index = self._rows()
+            ids = [doc_id for doc_id in ids if doc_id in row_index]
+            if not ids:
+                return
+            for doc_id in ids:
+                self._remove_row(row_index[doc_id])
+            self._append_log({"op": "remove", "ids": ids})
+
+    def remove_items(self, item_ids: Iterable[str]) -> None:
+        """Remove every document belonging to the given items."""
+        with self._lock:
+            self._ensure_loaded()
+            ids = [
+                self._doc_id(row)
+                for item_id in item_ids
+                for start, end in self._item_ranges(str(item_id))
+                for row in range(start, end)
+                if self._live[row]
+            ]
+            self.remove(ids)
+
+    def clear(self) -> None:
+        """Drop all documents and the persisted files."""
+        with self._lock:
+            self._close_log()
+            self._reset_state()
+            for name in os.listdir(self.index_dir) if os.path.isdir(self.index_dir) else []:
+                path = os.path.join(self.index_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._loaded = True
+
+    def search(
+        self, query: str, k: int = 10, item_ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to k (doc_id, score) pairs with a positive BM25 score, best first.
+
+        Args:
+            query: Search query
+            k: Maximum number of results
+            item_ids: Optional item scope; only postings of these items' chunks
+                      are scored. Term statistics (IDF, average length) remain
+                      those of the whole index, so scores do not depend on the scope.
+        """
+        query_terms = Counter(tokenize(query))
+        with self._lock:
+            self._ensure_loaded()
+            n_docs = self._n_live
+            if n_docs == 0 or not query_terms or k <= 0:
+                return []
+            avgdl = self._total_len / n_docs
+            lengths = self._lengths[:self._n_rows]
+            live = self._live[:self._n_rows]
+
+            if item_ids is None:
+                scope = None
+                n_slots = self._n_rows
+            else:
+                scope = self._scope_ranges(item_ids)
+                if scope is None:
+                    return []
+                # Rows in scope, in order; scores are accumulated per scoped row only
+                scope_rows = np.concatenate([np.arange(s, e) for s, e in zip(*scope)])
+                n_slots = len(scope_rows)
+
+            scores = np.zeros(n_slots, dtype=np.float64)
+            touched = np.zeros(n_slots, dtype=bool)
+            for term, count in query_terms.items():
+                doc_freq = self._doc_freq(term)
+                if doc_freq == 0:
+                    continue
+                rows, tf = self._postings(term, scope)
+                keep = live[rows]
+                rows, tf = rows[keep], tf[keep]
+                if len(rows) == 0:
+                    continue
+                idf = np.log(n_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+                if idf < 0:
+                    idf = EPSILON * self._get_average_idf()
+                slots = rows if scope is None else np.searchsorted(scope_rows, rows)
+                # Each occurrence of a query term contributes, as in BM25Okapi.get_scores
+                norm = tf + K1 * (1 - B + B * lengths[rows] / avgdl)
+                scores[slots] += count * idf * tf * (K1 + 1) / norm
+                touched[slots] = True
+
+            candidates = np.flatnonzero(touched)
+            cand_scores = scores[candidates]
+            if len(candidates) > k:
+                top = np.argpartition(-cand_scores, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-cand_scores[top], kind="stable")]
+            if scope is not None:
+                candidates = scope_rows[candidates]
+            return [
+                (self._doc_id(int(candidates[i])), float(cand_scores[i]))
+                for i in top
+                if cand_scores[i] > 0
+            ]
+
+    def save(self, compact: bool = False) -> None:
+        """Flush the log, folding it into a new base if it has grown large (or if compact=True)."""
+        with self._lock:
+            if not self._loaded:
+                return
+            if self._log is not None:
+                self._log.flush()
+            threshold = max(_COMPACT_MIN_DOCS, _COMPACT_RATIO * self._n_live)
+            if compact or self._logged_docs > threshold:
+                self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_log()
+            self._base = None
+
+    # -- state changes ---------------------------------------------------
+
+    def _add_doc(self, doc_id: str, item_id: str, tf: Dict[str, int]) -> None:
+        row_index = self._rows()
+        if doc_id in row_index:
+            self._remove_row(row_index[doc_id])
+        row = self._n_rows
+        self._grow(row + 1)
+        length = sum(tf.values())
+        self._delta_ids.append(doc_id)
+        self._delta_items.append(item_id)
+        self._lengths[row] = length
+        self._live[row] = True
+        self._n_rows += 1
+        self._n_live += 1
+        row_index[doc_id] = row
+        ranges = self._delta_ranges.setdefault(item_id, [])
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] = row + 1
+        else:
+            ranges.append([row, row + 1])
+        for term, count in tf.items():
+            rows, tfs = self._delta.setdefault(term, ([], []))
+            rows.append(row)
+            tfs.append(count)
+        self._total_len += length
+        self._stats_changed()
+
+    def _remove_row(self, row: int) -> None:
+        # Postings and item ranges keep the row until the next compaction; it is masked out
+        if not self._live[row]:
+            return
+        self._live[row] = False
+        self._n_live -= 1
+        self._total_len -= float(self._lengths[row])
+        if self._row_index is not None:
+            self._row_index.pop(self._doc_id(row), None)
+        self._stats_changed()
+
+    def _stats_changed(self) -> None:
+        self._df_base = None
+        self._average_idf = None
+
+    def _grow(self, n_rows: int) -> None:
+        """Make room for n_rows in the per-row arrays (amortized doubling)."""
+        capacity = len(self._lengths)
+        if n_rows <= capacity:
+            return
+        capacity = max(n_rows, 2 * capacity, 1024)
+        lengths = np.zeros(capacity, dtype=np.float32)
+        live = np.zeros(capacity, dtype=bool)
+        lengths[:self._n_rows] = self._lengths[:self._n_rows]
+        live[:self._n_rows] = self._live[:self._n_rows]
+        self._lengths, self._live = lengths, live
+
+    def _rows(self) -> Dict[str, int]:
+        """doc id -> row of every live document, built on first use."""
+        if self._row_index is None:
+            ids = self._base.all_doc_ids() if self._base is not None else []
+            ids += self._delta_ids
+            live = self._live
+            self._row_index = {doc_id: row for row, doc_id in enumerate(ids) if live[row]}
+        return self._row_index
+
+    def _doc_id(self, row: int) -> str:
+        if row < self._base_rows:
+            return self._base.doc_id(row)
+        return self._delta_ids[row - self._base_rows]
+
+    def _item_ranges(self, item_id: str) -> List[Tuple[int, int]]:
+        ranges = self._base.item_ranges(item_id) if self._base is not None else []
+        return ranges + [tuple(r) for r in self._delta_ranges.get(item_id, ())]
+
+    # -- scoring ---------------------------------------------------------
+
+    def _scope_ranges(self, item_ids: Iterable[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Sorted (starts, ends) row ranges covering the given items, or None if none are indexed."""
+        ranges = sorted(
+            r for item_id in set(str(i) for i in item_ids) for r in self._item_ranges(item_id)
+        )
+        if not ranges:
+            return None
+        starts, ends = zip(*ranges)
+        return np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+
+    def _postings(
+        self, term: str, scope: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and term frequencies of a term across base and delta (including removed rows).
+
+        With a scope, only postings inside its row ranges are returned; since
+        posting rows are sorted, each range is located by binary search.
+        """
+        rows, tf = _EMPTY_ROWS, _EMPTY_TF
+        term_id = self._base.term_id(term) if self._base is not None else None
+        if term_id is not None:
+            start, end = self._base.indptr[term_id], self._base.indptr[term_id + 1]
+            rows, tf = self._base.rows[start:end], self._base.tf[start:end]
+            if scope is not None:
+                rows, tf = _select_ranges(rows, tf, scope)
+        delta = self._delta.get(term)
+        if delta:
+            delta_rows = np.asarray(delta[0], dtype=np.int32)
+            delta_tf = np.asarray(delta[1], dtype=np.float32)
+            if scope is not None:
+                delta_rows, delta_tf = _select_ranges(delta_rows, delta_tf, scope)
+            rows = np.concatenate([rows, delta_rows])
+            tf = np.concatenate([tf, delta_tf])
+        return rows, tf
+
+    def _doc_freq(self, term: str) -> int:
+        """Number of live documents containing a term."""
+        self._compute_doc_freqs()
+        term_id = self._base.term_id(term) if self._base is not None else None
+        if term_id is not None:
+            return int(self._df_base[term_id])
+        return self._df_extra.get(term, 0)
+
+    def _compute_doc_freqs(self) -> None:
+        """Recompute live document frequencies of all terms after the index changed."""
+        if self._df_base is not None:
+            return
+        live = self._live[:self._n_rows]
+        base = self._base
+        if base is None:
+            df_base = np.zeros(0, dtype=np.int64)
+        elif live[:self._base_rows].all():
+            # Nothing removed from the base: posting list lengths are the frequencies
+            df_base = np.diff(base.indptr)
+        else:
+            # Live document frequency of every base term via a prefix sum over postings
+            live_prefix = np.concatenate([[0], np.cumsum(live[base.rows], dtype=np.int64)])
+            df_base = live_prefix[base.indptr[1:]] - live_prefix[base.indptr[:-1]]
+        df_base = np.array(df_base, dtype=np.int64)
+        df_extra = {}
+        for term, (rows, _) in self._delta.items():
+            count = int(live[np.asarray(rows, dtype=np.int64)].sum())
+            term_id = base.term_id(term) if base is not None else None
+            if term_id is not None:
+                df_base[term_id] += count
+            elif count:
+                df_extra[term] = count
+        self._df_base, self._df_extra = df_base, df_extra
+
+    def _get_average_idf(self) -> float:
+        """Mean IDF over the vocabulary, recomputed only after the index changed."""
+        if self._average_idf is None:
+            self._compute_doc_freqs()
+            doc_freq = np.concatenate([self._df_base, np.fromiter(self._df_extra.values(), dtype=np.int64)])
+            doc_freq = doc_freq[doc_freq > 0]
+            n_docs = self._n_live
+            idf = np.log(n_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+            self._average_idf = float(idf.mean()) if len(idf) else 0.0
+        return self._average_idf
+
+    # -- persistence -----------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        """Map the base and replay the log on first use. Caller holds the lock."""
+        if self._loaded:
+            return
+        self._reset_state()
+        # Pickled snapshot of earlier versions: never unpickled, the index is rebuilt instead
+        legacy = os.path.join(self.index_dir, "snapshot.pkl")
+        if os.path.exists(legacy):
+            os.remove(legacy)
+            if os.path.exists(self._log_path):
+                os.remove(self._log_path)
+        current = _read_json(self._current_path)
+        if current and current.get("version") == FORMAT_VERSION:
+            try:
+                self._open_base(current["generation"])
+            except Exception as e:
+                print(f"Error opening sparse index: {e}")
+                self._reset_state()
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted write
+                        break
+                    if op["op"] == "add":
+                        for doc_id, item_id, tf in op["docs"]:
+                            self._add_doc(doc_id, item_id, tf)
+                        self._logged_docs += len(op["docs"])
+                    elif op["op"] == "remove":
+                        row_index = self._rows()
+                        for doc_id in op["ids"]:
+                            if doc_id in row_index:
+                                self._remove_row(row_index[doc_id])
+                        self._logged_docs += len(op["ids"])
+        self._loaded = True
+
+    def _open_base(self, generation: int) -> None:
+        base = _BaseSegment(os.path.join(self.index_dir, f"base-{generation}"))
+        self._base = base
+        self._generation = generation
+        self._grow(base.n_rows)
+        self._base_rows = self._n_rows = self._n_live = base.n_rows
+        self._lengths[:base.n_rows] = base.lengths
+        self._live[:base.n_rows] = True
+        self._total_len = float(np.sum(base.lengths, dtype=np.float64))
+
+    def _append_log(self, op: dict) -> None:
+        if self._log is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._log = open(self._log_path, "a", encoding="utf-8")
+        self._log.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self._logged_docs += len(op.get("docs") or op.get("ids") or ())
+
+    def _compact(self) -> None:
+        """Merge base and delta into a new base without removed rows, then truncate the log.
+
+        Caller holds the lock. The new base is written to a fresh directory and
+        made current by atomically replacing CURRENT, so a crash leaves either
+        the old or the new base (plus a log that is safe to replay on either).
+        """
+        n_rows = self._n_rows
+        live = self._live[:n_rows]
+        live_rows = np.flatnonzero(live)
+        new_row = np.cumsum(live, dtype=np.int64) - 1
+        base = self._base
+
+        # Postings as (term index, row, tf) triples over a combined vocabulary
+        terms = base.all_terms() if base is not None else []
+        term_index = {term: i for i, term in enumerate(terms)}
+        term_parts, row_parts, tf_parts = [], [], []
+        if base is not None:
+            term_parts.append(np.repeat(np.arange(base.n_terms, dtype=np.int64), np.diff(base.indptr)))
+            row_parts.append(np.asarray(base.rows))
+            tf_parts.append(np.asarray(base.tf))
+        for term, (rows, tfs) in self._delta.items():
+            term_id = term_index.get(term)
+            if term_id is None:
+                term_id = term_index[term] = len(terms)
+                terms.append(term)
+            term_parts.append(np.full(len(rows), term_id, dtype=np.int64))
+            row_parts.append(np.asarray(rows, dtype=np.int32))
+            tf_parts.append(np.asarray(tfs, dtype=np.float32))
+        all_terms = np.concatenate(term_parts) if term_parts else np.zeros(0, dtype=np.int64)
+        all_rows = np.concatenate(row_parts) if row_parts else _EMPTY_ROWS
+        all_tf = np.concatenate(tf_parts) if tf_parts else _EMPTY_TF
+
+        keep = live[all_rows]
+        all_terms, all_rows, all_tf = all_terms[keep], new_row[all_rows[keep]], all_tf[keep]
+        # Vocabulary of terms still in use, sorted so lookups can binary search it
+        used = np.unique(all_terms)
+        sorted_terms = sorted(terms[t] for t in used)
+        rank = {term: i for i, term in enumerate(sorted_terms)}
+        remap = np.zeros(len(terms), dtype=np.int64)
+        remap[used] = [rank[terms[t]] for t in used]
+        matrix = sparse.csr_matrix(
+            (all_tf, (remap[all_terms], all_rows)), shape=(len(sorted_terms), len(live_rows)), dtype=np.float32
+        )
+        matrix.sort_indices()
+
+        # Item of every row, then contiguous runs of the surviving rows
+        items, row_item = base.row_items() if base is not None else ([], np.zeros(0, dtype=np.int64))
+        item_index = {item: i for i, item in enumerate(items)}
+        delta_item = np.empty(len(self._delta_items), dtype=np.int64)
+        for i, item in enumerate(self._delta_items):
+            if item not in item_index:
+                item_index[item] = len(items)
+                items.append(item)
+            delta_item[i] = item_index[item]
+        row_item = np.concatenate([row_item, delta_item])[live_rows]
+        run_starts = np.flatnonzero(np.concatenate([[True], row_item[1:] != row_item[:-1]])) if len(row_item) else row_item
+        run_ends = np.concatenate([run_starts[1:], [len(row_item)]]).astype(np.int64)
+        run_item = row_item[run_starts]
+        sorted_items = sorted({items[i] for i in run_item.tolist()})
+        item_rank = {item: i for i, item in enumerate(sorted_items)}
+        run_rank = np.array([item_rank[items[i]] for i in run_item.tolist()], dtype=np.int64)
+        order = np.lexsort((run_starts, run_rank))
+        item_ptr = np.concatenate([[0], np.cumsum(np.bincount(run_rank, minlength=len(sorted_items)))])
+
+        doc_ids = (base.all_doc_ids() if base is not None else []) + self._delta_ids
+        live_ids = [doc_ids[r] for r in live_rows.tolist()]
+
+        term_blob, term_offsets = _pack_strings(sorted_terms)
+        id_blob, id_offsets = _pack_strings(live_ids)
+        item_blob, item_offsets = _pack_strings(sorted_items)
+        arrays = {
+            "terms": term_blob,
+            "term_offsets": term_offsets,
+            "indptr": matrix.indptr,
+            "rows": matrix.indices,
+            "tf": matrix.data,
+            "lengths": self._lengths[live_rows],
+            "ids": id_blob,
+            "id_offsets": id_offsets,
+            "items": item_blob,
+            "item_offsets": item_offsets,
+            "item_ptr": item_ptr,
+            "range_starts": run_starts[order],
+            "range_ends": run_ends[order],
+        }
+        meta = {
+            "version": FORMAT_VERSION,
+            "n_terms": len(sorted_terms),
+            "n_rows": len(live_rows),
+            "n_items": len(sorted_items),
+        }
+
+        generation = self._generation + 1
+        path = os.path.join(self.index_dir, f"base-{generation}")
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        for name, dtype in _BASE_ARRAYS.items():
+            with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+                np.ascontiguousarray(arrays[name], dtype=dtype).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        _write_json(os.path.join(path, "meta.json"), meta)
+        _write_json(self._current_path, {"version": FORMAT_VERSION, "generation": generation})
+
+        # Replaying the old log over the new base would be harmless, but it is no longer needed
+        self._close_log()
+        open(self._log_path, "w").close()
+
+        old_path = base.path if base is not None else None
+        self._reset_state()
+        self._open_base(generation)
+        if old_path:
+            # May fail on Windows while a stale mapping is alive; cleaned up on a later compaction
+            shutil.rmtree(old_path, ignore_errors=True)
+        for name in os.listdir(self.index_dir):
+            if name.startswith("base-") and name != f"base-{generation}":
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+    def _close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def _map(path: str, dtype: str) -> np.ndarray:
+    """Memory-map an array file read-only (np.memmap cannot map empty files)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate UTF-8 strings into a byte blob plus offsets (len(strings) + 1)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _string_at(blob: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def _all_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+def _bisect(blob: np.ndarray, offsets: np.ndarray, n: int, key: bytes) -> Optional[int]:
+    """Index of key in a sorted packed string table, or None."""
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        value = blob[offsets[mid]:offsets[mid + 1]].tobytes()
+        if value < key:
+            lo = mid + 1
+        elif value > key:
+            hi = mid
+        else:
+            return mid
+    return None
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _select_ranges(
+    rows: np.ndarray, tf: np.ndarray, scope: Tuple[np.ndarray, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Postings whose (sorted) rows fall inside any of the [start, end) ranges."""
+    starts, ends = scope
+    lo = np.searchsorted(rows, starts)
+    hi = np.searchsorted(rows, ends)
+    counts = hi - lo
+    total = int(counts.sum())
+    if total == 0:
+        return _EMPTY_ROWS, _EMPTY_TF
+    # Concatenated aranges lo[i]..hi[i] without a Python loop
+    offsets = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    index = offsets + np.arange(total)
+    return rows[index], tf[index]
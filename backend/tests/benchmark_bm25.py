@@ -0,0 +1,97 @@
+"""
+Benchmark for BM25 query latency.
+Compares rank_bm25's BM25Okapi (scores every document, then argsort) with
+SparseIndex (scores only the postings of the query terms) on a synthetic
+Zipf-distributed corpus, and times queries scoped to two items (as when a
+chat is limited to selected papers).
+
+Usage:
+    python -m backend.tests.benchmark_bm25 [n_chunks ...]
+"""
+
+import sys
+import time
+import random
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.sparse_index import SparseIndex
+
+VOCAB_SIZE = 50_000
+CHUNK_TOKENS = 150
+N_QUERIES = 20
+
+
+def synthetic_corpus(n_docs, seed=0):
+    rng = np.random.default_rng(seed)
+    # Zipf-like term distribution, roughly like natural text
+    token_ids = np.minimum(rng.zipf(1.1, size=(n_docs, CHUNK_TOKENS)), VOCAB_SIZE) - 1
+    return [" ".join(f"t{t}" for t in row) for row in token_ids]
+
+
+def queries(seed=1):
+    rnd = random.Random(seed)
+    # Mix of frequent and rare terms, 3-6 terms per query
+    return [
+        " ".join(f"t{int(rnd.paretovariate(0.5)) % 5000}" for _ in range(rnd.randint(3, 6)))
+        for _ in range(N_QUERIES)
+    ]
+
+
+def time_queries(search, qs):
+    start = time.perf_counter()
+    for q in qs:
+        search(q)
+    return (time.perf_counter() - start) / len(qs) * 1000
+
+
+def bench(n_docs):
+    docs = synthetic_corpus(n_docs)
+    ids = [f"{i // 30}:{i % 30}" for i in range(n_docs)]
+    qs = queries()
+
+    start = time.perf_counter()
+    reference = BM25Okapi([d.split() for d in docs])
+    ref_build = time.perf_counter() - start
+
+    def ref_search(q, k=15):
+        scores = reference.get_scores(q.split())
+        return np.argsort(scores)[::-1][:k]
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        index = SparseIndex(temp_dir)
+        index.add(ids, docs, [i.split(":")[0] for i in ids])
+        index.save(compact=True)
+        build = time.perf_counter() - start
+
+        ref_ms = time_queries(ref_search, qs)
+        ms = time_queries(lambda q: index.search(q, k=15), qs)
+        scope = ["7", str(n_docs // 60)]
+        scoped_ms = time_queries(lambda q: index.search(q, k=15, item_ids=scope), qs)
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print(
+        f"{n_docs:>8} chunks | rank_bm25: build {ref_build:6.1f}s, {ref_ms:8.1f} ms/query"
+        f" | SparseIndex: build {build:6.1f}s, {ms:6.2f} ms/query | {ref_ms / ms:6.0f}x"
+        f" | 2-item scope: {scoped_ms:5.2f} ms/query"
+    )
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    for n in sizes:
+        bench(n)
+
+
+if __name__ == "__main__":
+    main()
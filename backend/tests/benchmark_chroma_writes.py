@@ -0,0 +1,76 @@
+"""
+Benchmark for Chroma write throughput during indexing.
+Compares one add_chunks() call per item with ChunkWriteBuffer batching
+chunks across items, using random vectors in a fresh persistent collection.
+
+Usage:
+    python -m backend.tests.benchmark_chroma_writes [items] [chunks_per_item] [dimension]
+"""
+
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_db import ChromaClient, ChunkWriteBuffer
+
+
+def synthetic_items(n_items, chunks_per_item, dimension, seed=0):
+    """Yield (item_id, ids, documents, metadatas, embeddings) for fake papers."""
+    rng = np.random.default_rng(seed)
+    for item in range(n_items):
+        item_id = str(item)
+        vectors = rng.standard_normal((chunks_per_item, dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield (
+            item_id,
+            [f"{item_id}:{i}" for i in range(chunks_per_item)],
+            [f"chunk {i} of paper {item_id} " * 40 for i in range(chunks_per_item)],
+            [{"item_id": item_id, "chunk_idx": i, "page": 1 + i // 3} for i in range(chunks_per_item)],
+            vectors.tolist(),
+        )
+
+
+def bench(n_items, chunks_per_item, dimension, buffered):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="bench")
+        items = list(synthetic_items(n_items, chunks_per_item, dimension))
+        start = time.perf_counter()
+        if buffered:
+            buffer = ChunkWriteBuffer(client)
+            for item_id, ids, docs, metas, vectors in items:
+                buffer.add(item_id, ids, docs, metas, vectors)
+            buffer.flush()
+            writes = buffer.flushes
+        else:
+            for item_id, ids, docs, metas, vectors in items:
+                client.add_chunks(ids=ids, documents=docs, metadatas=metas, embeddings=vectors)
+            writes = len(items)
+        elapsed = time.perf_counter() - start
+        assert client.get_document_count() == n_items * chunks_per_item
+        return elapsed, writes
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    chunks_per_item = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    dimension = int(sys.argv[3]) if len(sys.argv) > 3 else 384
+    total = n_items * chunks_per_item
+
+    print(f"{n_items} items x {chunks_per_item} chunks ({total} chunks, dim {dimension})")
+    for label, buffered in (("per-item add_chunks", False), ("ChunkWriteBuffer", True)):
+        elapsed, writes = bench(n_items, chunks_per_item, dimension, buffered)
+        print(f"  {label:<20} {total / elapsed:>9.0f} inserts/sec  ({writes} writes, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
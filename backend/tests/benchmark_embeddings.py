@@ -0,0 +1,148 @@
+"""
+Benchmark for embedding throughput.
+Embeds chunks of synthetic papers (split by the indexer's own chunker, so
+chunk lengths follow what indexing produces) with every embedding model and
+compares how texts are truncated and batched:
+- input order: chunks batched as they come
+- chars: the former approach, cut at 2048 characters and batched by character length
+- tokens: cut at the model's max_seq_length tokens and batched by token length
+  (what get_embeddings does)
+Reports tokens/sec (real, non-padding tokens) and the padding ratio (share of
+padding among all tokens the encoder processed). Downloads the models.
+
+Usage:
+    python -m backend.tests.benchmark_embeddings [n_chunks] [--models bge-base,minilm-l6] [--backend torch]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.embed_utils import (
+    EMBEDDING_MODELS, DEFAULT_BATCH_SIZE, configure_embedding_backend, load_embedding_model,
+    truncate_to_tokens, length_buckets,
+)
+from backend.interface import ZoteroChatbot
+
+OLD_MAX_CHARS = 512 * 4
+
+WORDS = (
+    "model data analysis results method study network learning performance approach "
+    "significant distribution parameters estimation regression sample variance observed "
+    "proposed framework evaluation baseline experiments accuracy respectively however "
+    "heterogeneity spatiotemporal electrophysiological immunohistochemistry"
+).split()
+
+
+def synthetic_sentence(rng):
+    """A sentence of paper prose, with the numbers, citations and symbols papers are full of."""
+    words = list(rng.choice(WORDS, size=int(rng.integers(6, 40))))
+    for _ in range(int(rng.poisson(1.5))):
+        words.insert(int(rng.integers(len(words))), rng.choice([
+            f"{rng.uniform(0, 1):.3f}",
+            f"(p < 0.0{rng.integers(1, 6)})",
+            f"[{rng.integers(1, 80)}, {rng.integers(1, 80)}]",
+            f"(Smith et al., {rng.integers(1990, 2025)})",
+            f"β={rng.normal():.2f}±{rng.uniform(0, 0.5):.2f}",
+        ]))
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_pages(n_pages, seed=0):
+    """Pages as extracted from PDFs: mostly full text, some short (figures, section ends) or run-on (tables)."""
+    rng = np.random.default_rng(seed)
+    pages = []
+    for page_num in range(1, n_pages + 1):
+        kind = rng.random()
+        if kind < 0.15:
+            text = " ".join(synthetic_sentence(rng) for _ in range(int(rng.integers(1, 4))))
+        elif kind < 0.25:
+            # Table rows without sentence breaks end up as oversized chunks
+            text = " ".join(f"{w} {rng.uniform(0, 100):.1f}" for w in rng.choice(WORDS, size=300))
+        else:
+            text = " ".join(synthetic_sentence(rng) for _ in range(int(rng.integers(15, 30))))
+        pages.append({"page_num": page_num, "text": text})
+    return pages
+
+
+def synthetic_chunks(n_chunks):
+    chunks = []
+    n_pages = 8
+    while len(chunks) < n_chunks:
+        chunks = [c["text"] for c in ZoteroChatbot.chunk_text_with_pages(None, synthetic_pages(n_pages))]
+        n_pages *= 2
+    return chunks[:n_chunks]
+
+
+def run(model, texts, token_counts, batches, batch_size):
+    """Encode texts in the given batches; returns (seconds, real tokens, padded tokens)."""
+    start = time.perf_counter()
+    for batch in batches:
+        model.encode([texts[i] for i in batch], batch_size=batch_size, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    real = sum(token_counts)
+    padded = sum(max(token_counts[i] for i in batch) * len(batch) for batch in batches)
+    return elapsed, real, padded
+
+
+def bench(model_id, chunks, batch_size):
+    model = load_embedding_model(model_id)
+    model.encode(chunks[:batch_size], batch_size=batch_size)  # warm-up
+
+    old_texts = [text[:OLD_MAX_CHARS] for text in chunks]
+    _, old_counts = truncate_to_tokens(model, old_texts)
+    in_order = [list(range(i, min(i + batch_size, len(chunks)))) for i in range(0, len(chunks), batch_size)]
+    by_chars = sorted(range(len(chunks)), key=lambda i: len(old_texts[i]), reverse=True)
+    by_chars = [by_chars[i:i + batch_size] for i in range(0, len(by_chars), batch_size)]
+
+    results = {
+        "input order": run(model, old_texts, old_counts, in_order, batch_size),
+        "chars": run(model, old_texts, old_counts, by_chars, batch_size),
+    }
+    # Token truncation is part of the cost of the token strategy
+    start = time.perf_counter()
+    texts, counts = truncate_to_tokens(model, chunks)
+    batches = length_buckets(counts, batch_size)
+    tokenize_seconds = time.perf_counter() - start
+    elapsed, real, padded = run(model, texts, counts, batches, batch_size)
+    results["tokens"] = (elapsed + tokenize_seconds, real, padded)
+
+    truncated = sum(count >= (getattr(model, "max_seq_length", None) or 512) for count in counts)
+    print(f"{model_id}: {len(chunks)} chunks, max_seq_length {model.max_seq_length}, "
+          f"{truncated} cut to it, median {int(np.median(counts))} tokens")
+    for label, (elapsed, real, padded) in results.items():
+        print(f"  {label:<12} {real / elapsed:>9.0f} tokens/sec  "
+              f"padding {(padded - real) / padded:>5.1%}  ({elapsed:.2f}s)")
+
+
+def main():
+    args = sys.argv[1:]
+    model_ids = list(EMBEDDING_MODELS)
+    backend = "torch"
+    if "--models" in args:
+        i = args.index("--models")
+        model_ids = args[i + 1].split(",")
+        del args[i:i + 2]
+    if "--backend" in args:
+        i = args.index("--backend")
+        backend = args[i + 1]
+        del args[i:i + 2]
+    n_chunks = int(args[0]) if args else 1024
+
+    configure_embedding_backend(backend)
+    chunks = synthetic_chunks(n_chunks)
+    lengths = [len(c) for c in chunks]
+    print(f"{len(chunks)} chunks, {np.percentile(lengths, 10):.0f}/{np.median(lengths):.0f}/"
+          f"{np.percentile(lengths, 90):.0f}/{max(lengths)} chars (p10/median/p90/max), "
+          f"batch size {DEFAULT_BATCH_SIZE}, {backend} backend")
+    for model_id in model_ids:
+        bench(model_id, chunks, DEFAULT_BATCH_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark for dense retrieval backends.
+Runs every registered vector store backend (Chroma's HNSW index, the flat
+memory-mapped matrix in float32 and float16) through the VectorStore
+interface on clustered random vectors: recall@10 against exact search,
+latency of unscoped queries and of queries scoped to two items (which
+Chroma answers with scoped exact search).
+
+Usage:
+    python -m backend.tests.benchmark_vector_backends [n_chunks ...] [--backends chroma,flat,flat16]
+"""
+
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_store import VECTOR_BACKENDS, open_vector_store
+
+DIMENSION = 384
+CHUNKS_PER_ITEM = 30
+N_CLUSTERS = 256
+N_QUERIES = 50
+K = 10
+
+# Benchmarked configurations: name -> (registered backend, profile settings)
+BACKENDS = {name: (name, {}) for name in VECTOR_BACKENDS}
+BACKENDS["flat16"] = ("flat", {"flatVectorDtype": "float16"})
+
+
+def clustered_vectors(n, seed):
+    """Unit vectors scattered around random centroids, roughly like embeddings of a library."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((N_CLUSTERS, DIMENSION), dtype=np.float32)
+    vectors = centroids[rng.integers(0, N_CLUSTERS, n)]
+    # In place and in float32, so a million chunks fit in a few GB
+    vectors += 0.6 * rng.standard_normal((n, DIMENSION), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def exact_top_k(vectors, queries, k):
+    top = []
+    for q in queries:
+        scores = vectors @ q
+        top.append(set(np.argpartition(-scores, k)[:k].tolist()))
+    return top
+
+
+def bench(name, n_chunks, vectors, queries, truth):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        backend, options = BACKENDS[name]
+        client = open_vector_store(backend, temp_dir, "bench", options)
+        batch = client.max_write_batch_size()
+        start = time.perf_counter()
+        for i in range(0, n_chunks, batch):
+            end = min(i + batch, n_chunks)
+            client.add_chunks(
+                ids=[str(j) for j in range(i, end)],
+                documents=["" for _ in range(i, end)],
+                metadatas=[{"item_id": str(j // CHUNKS_PER_ITEM), "chunk_idx": j % CHUNKS_PER_ITEM} for j in range(i, end)],
+                embeddings=vectors[i:end],
+            )
+        build = time.perf_counter() - start
+
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            result = client.query_vectors(q, K)
+            hits += len(expected & {int(i) for i in result["ids"][0]})
+        query_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+        scope = {"item_id": {"$in": ["7", str(n_chunks // CHUNKS_PER_ITEM // 2)]}}
+        start = time.perf_counter()
+        for q in queries:
+            client.query_vectors(q, K, scope)
+        scoped_ms = (time.perf_counter() - start) / len(queries) * 1000
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print(
+        f"{n_chunks:>8} chunks | {name:<7} build {build:7.1f}s | recall@{K} {hits / (K * len(queries)):.3f}"
+        f" | {query_ms:7.2f} ms/query | 2-item scope {scoped_ms:6.2f} ms/query"
+    )
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    backends = list(BACKENDS)
+    if "--backends" in sys.argv:
+        backends = sys.argv[sys.argv.index("--backends") + 1].split(",")
+        args = [a for a in args if a != sys.argv[sys.argv.index("--backends") + 1]]
+    sizes = [int(a) for a in args] or [10_000, 100_000, 1_000_000]
+
+    for n in sizes:
+        # Queries come from the same distribution as the indexed chunks
+        data = clustered_vectors(n + N_QUERIES, seed=0)
+        vectors, queries = data[:n], data[n:]
+        truth = exact_top_k(vectors, queries, K)
+        for name in backends:
+            bench(name, n, vectors, queries, truth)
+
+
+if __name__ == "__main__":
+    main()
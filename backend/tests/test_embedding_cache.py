@@ -0,0 +1,132 @@
+"""
+Test script for the on-disk embedding cache.
+Checks that cached vectors come back exactly (float32) or within tolerance
+(float16), that the cache stays within its byte budget by dropping the least
+recently used embeddings, and that a compacted cache reopens intact.
+
+Usage:
+    python -m backend.tests.test_embedding_cache
+"""
+
+import os
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.embedding_cache import EmbeddingCache
+
+DIMENSION = 64
+
+
+def vectors_for(texts, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((len(texts), DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_round_trip_precision():
+    """float32 caches return vectors unchanged; float16 within a cosine tolerance."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        texts = [f"chunk {i}" for i in range(200)]
+        vectors = vectors_for(texts)
+
+        cache = EmbeddingCache(temp_dir, "exact", "test-model", DIMENSION)
+        cache.store(texts, vectors)
+        cached, found = cache.lookup(texts)
+        assert found.all() and np.array_equal(cached, vectors)
+        assert cache.stats()["dtype"] == "float32"
+        cache.close()
+
+        cache = EmbeddingCache(temp_dir, "half", "test-model", DIMENSION, dtype="float16")
+        cache.store(texts, vectors)
+        cached, found = cache.lookup(texts)
+        assert found.all()
+        assert np.abs(cached - vectors).max() < 1e-3
+        cosines = (cached * vectors).sum(axis=1) / np.linalg.norm(cached, axis=1)
+        assert cosines.min() > 1 - 1e-5, f"float16 cosine {cosines.min()}"
+        assert cache.stats()["bytes"] == len(texts) * DIMENSION * 2
+        cache.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ float32 round-trips exactly, float16 within 1e-3")
+
+
+def test_budget_evicts_least_recently_used():
+    """Storing past the budget compacts the cache, keeping recently used vectors."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        row_bytes = DIMENSION * 4
+        cache = EmbeddingCache(temp_dir, "model", "test-model", DIMENSION, max_bytes=100 * row_bytes)
+        old = [f"old {i}" for i in range(60)]
+        cache.store(old, vectors_for(old, seed=1))
+        # Reading the first ten makes them more recent than the rest
+        cache.lookup(old[:10])
+        new = [f"new {i}" for i in range(60)]
+        new_vectors = vectors_for(new, seed=2)
+        cache.store(new, new_vectors)
+
+        stats = cache.stats()
+        assert stats["bytes"] <= stats["max_bytes"], stats
+        assert stats["compactions"] == 1 and stats["evicted"] == 120 - stats["entries"]
+        vector_files = [name for name in os.listdir(cache.dir) if name.startswith("vectors.")]
+        assert len(vector_files) == 1
+        assert os.path.getsize(os.path.join(cache.dir, vector_files[0])) == stats["bytes"]
+
+        _, found = cache.lookup(new)
+        assert found.all(), "just stored vectors were dropped"
+        _, found = cache.lookup(old[:10])
+        assert found.all(), "recently read vectors were dropped"
+        _, found = cache.lookup(old[10:])
+        assert not found.all()
+
+        # An explicit prune goes below the budget
+        cache.lookup(new)
+        assert cache.prune(20 * row_bytes) == stats["entries"] - 20
+        assert cache.stats()["entries"] == 20
+        cache.close()
+
+        # The compacted cache reopens with the same rows and vectors
+        cache = EmbeddingCache(temp_dir, "model", "test-model", DIMENSION, max_bytes=100 * row_bytes)
+        assert cache.stats()["entries"] == 20
+        cached, found = cache.lookup(new)
+        assert found.sum() == 20
+        assert np.array_equal(cached[found], new_vectors[found])
+        cache.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Cache stays within its budget, dropping least recently used vectors")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("EMBEDDING CACHE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_round_trip_precision()
+        test_budget_evicts_least_recently_used()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
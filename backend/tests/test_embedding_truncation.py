@@ -0,0 +1,152 @@
+"""
+Test script for token truncation and length-bucketed batching.
+Runs get_embeddings() on an OnnxEmbedder whose ONNX session is replaced by
+an embedding-table lookup, with a small WordPiece tokenizer built in memory,
+and checks that:
+- vectors come back in input order although texts are batched by length
+- texts cut by truncate_to_tokens embed the same as the model's own
+  truncation of the full text, also for uncased models whose lowercasing
+  changes the text's length ("İ")
+No model is downloaded.
+
+Usage:
+    python -m backend.tests.test_embedding_truncation
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tokenizers")
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import backend.embed_utils as embed_utils
+from backend.embed_utils import EMBEDDING_MODELS, configure_embedding_backend, get_embeddings, truncate_to_tokens
+from backend.onnx_embedder import OnnxEmbedder
+
+MODEL_ID = "minilm-l6"
+MAX_SEQ_LENGTH = 16
+WORDS = "the model İstanbul ıslak data analysis results method study network learning".split()
+
+
+class TableSession:
+    """Stands in for an ONNX Runtime session: each token's hidden state is a fixed random vector."""
+
+    def __init__(self, vocab_size, dimension):
+        self.table = np.random.default_rng(0).standard_normal((vocab_size, dimension)).astype(np.float32)
+
+    def run(self, output_names, feeds):
+        return [self.table[feeds["input_ids"]]]
+
+
+def word_piece_tokenizer():
+    """A BERT-style tokenizer ([CLS] ... [SEP], truncation and padding) over WORDS."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+
+    vocab = {token: i for i, token in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "."])}
+    for word in WORDS:
+        vocab.setdefault(word.lower(), len(vocab))
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+    )
+    tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+    tokenizer.enable_padding(pad_id=vocab["[PAD]"], pad_token="[PAD]")
+    return tokenizer
+
+
+def fake_embedder(do_lower_case):
+    """An OnnxEmbedder with an in-memory tokenizer and TableSession, mean pooling."""
+    embedder = object.__new__(OnnxEmbedder)
+    embedder.tokenizer = word_piece_tokenizer()
+    embedder.config = {"dimension": EMBEDDING_MODELS[MODEL_ID]["dimension"]}
+    embedder.pooling_mode = "mean"
+    embedder.normalize = True
+    embedder.do_lower_case = do_lower_case
+    embedder.max_seq_length = MAX_SEQ_LENGTH
+    embedder.session = TableSession(embedder.tokenizer.get_vocab_size(), embedder.config["dimension"])
+    embedder.input_names = ["input_ids", "attention_mask"]
+    embedder.nbytes = embedder.session.table.nbytes
+    return embedder
+
+
+def sample_texts(n=40, seed=1):
+    """Texts from 1 to 40 words, so some fit and some are cut, in shuffled length order."""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=int(rng.integers(1, 40)))) + "." for _ in range(n)]
+
+
+def install(embedder):
+    embed_utils.configure_embedding_cache(None)
+    embed_utils._model_cache.clear()
+    embed_utils._model_cache.get((MODEL_ID, "onnx"), lambda: embedder)
+    configure_embedding_backend("onnx")
+
+
+def test_order_preserved_across_buckets():
+    """Vectors are returned in input order, whatever batch each text landed in."""
+    embedder = fake_embedder(do_lower_case=False)
+    texts = sample_texts()
+    install(embedder)
+    try:
+        vectors = get_embeddings(texts, MODEL_ID, batch_size=4)
+    finally:
+        configure_embedding_backend("torch")
+        embed_utils._model_cache.clear()
+
+    _, counts = truncate_to_tokens(embedder, texts)
+    assert len(embed_utils.length_buckets(counts, 4)) == 10
+    expected = np.stack([embedder.encode([text])[0] for text in texts])
+    assert np.allclose(vectors, expected, atol=1e-6)
+    print("✓ Vectors come back in input order across length buckets")
+
+
+def test_truncation_matches_model():
+    """Cut texts hold exactly the kept tokens and embed like the model's own truncation."""
+    for do_lower_case in (False, True):
+        embedder = fake_embedder(do_lower_case)
+        texts = sample_texts(seed=2)
+        cut, counts = truncate_to_tokens(embedder, texts)
+        assert any(count == MAX_SEQ_LENGTH for count in counts) and min(counts) < MAX_SEQ_LENGTH
+
+        embedder.tokenizer.no_truncation()
+        for cut_text, count in zip(cut, counts):
+            # The cut text is what the model sees: no tokens beyond max_seq_length are left
+            assert len(embedder.tokenizer.encode(cut_text).ids) == count, (do_lower_case, cut_text)
+        embedder.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+
+        assert np.allclose(embedder.encode(cut), embedder.encode(texts), atol=1e-6)
+    print("✓ Truncated texts embed the same as the model's own truncation (cased and uncased)")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("EMBEDDING TRUNCATION TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_order_preserved_across_buckets()
+        test_truncation_matches_model()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
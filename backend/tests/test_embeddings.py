@@ -107,8 +107,8 @@ def test_query_methods():
         "query_db should NOT use query_texts parameter!"
     print("✓ query_db uses manual embeddings")
     
-    # Check query_hybrid source
-    query_hybrid_source = inspect.getsource(ChromaClient.query_hybrid)
+    # Check query_hybrid source (its dense leg runs the Chroma query)
+    query_hybrid_source = inspect.getsource(ChromaClient._query_dense)
     assert 'query_embeddings' in query_hybrid_source, \
         "query_hybrid should use query_embeddings, not query_texts!"
     assert 'query_texts' not in query_hybrid_source or 'not query_texts' in query_hybrid_source, \
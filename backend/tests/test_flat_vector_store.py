@@ -0,0 +1,131 @@
+"""
+Test script for the flat (exact, memory-mapped) vector backend.
+Checks that queries return the exact cosine top-k, that item-scoped queries
+only score the selected items, and that deletes, compaction and reopening
+keep ids, vectors and metadata consistent.
+
+Usage:
+    python -m backend.tests.test_flat_vector_store
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import backend.flat_vector_store as flat_vector_store
+from backend.flat_vector_store import FlatCollection
+
+DIMENSION = 16
+CHUNKS_PER_ITEM = 10
+
+
+def random_chunks(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    ids = [f"{i // CHUNKS_PER_ITEM}:{i % CHUNKS_PER_ITEM}" for i in range(n)]
+    metas = [{"item_id": str(i // CHUNKS_PER_ITEM), "chunk_idx": i % CHUNKS_PER_ITEM} for i in range(n)]
+    docs = [f"chunk {i}" for i in range(n)]
+    return ids, vectors, metas, docs
+
+
+def exact_ids(ids, vectors, query, k, keep=None):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    order = [i for i in np.argsort(-scores) if keep is None or keep(ids[i])]
+    return [ids[i] for i in order[:k]]
+
+
+def test_exact_and_scoped_top_k():
+    """Unscoped and item-scoped queries return the brute-force cosine ranking."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        ids, vectors, metas, docs = random_chunks(500)
+        collection = FlatCollection(temp_dir)
+        collection.add(ids=ids, embeddings=vectors, metadatas=metas, documents=docs)
+        # Existing ids are skipped, as in Chroma
+        collection.add(ids=ids[:5], embeddings=vectors[:5] * 2, metadatas=metas[:5], documents=docs[:5])
+        assert collection.count() == 500
+
+        queries = np.random.default_rng(1).standard_normal((5, DIMENSION)).astype(np.float32)
+        result = collection.query(query_embeddings=queries, n_results=10)
+        for q, got, distances in zip(queries, result["ids"], result["distances"]):
+            assert got == exact_ids(ids, vectors, q, 10)
+            assert distances == sorted(distances)
+
+        scope = {"item_id": {"$in": ["3", "17", "not-indexed"]}}
+        result = collection.query(query_embeddings=queries[:1], n_results=25, where=scope)
+        expected = exact_ids(ids, vectors, queries[0], 25, keep=lambda d: d.split(":")[0] in ("3", "17"))
+        assert result["ids"][0] == expected
+        assert len(expected) == 20
+        assert all(m["item_id"] in ("3", "17") for m in result["metadatas"][0])
+        print("✓ Exact and item-scoped top-k match brute force")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_delete_compact_and_reopen():
+    """Deleted chunks disappear from results; compaction and reopening keep the rest intact."""
+    temp_dir = tempfile.mkdtemp()
+    original_min_rows = flat_vector_store._COMPACT_MIN_ROWS
+    flat_vector_store._COMPACT_MIN_ROWS = 50
+    try:
+        ids, vectors, metas, docs = random_chunks(300)
+        collection = FlatCollection(temp_dir, dtype="float16")
+        collection.add(ids=ids, embeddings=vectors, metadatas=metas, documents=docs)
+
+        removed = {str(i) for i in range(0, 30, 3)}
+        for item_id in removed:
+            collection.delete(where={"item_id": item_id})
+        assert collection._generation > 0, "expected a compaction"
+        kept = [i for i, d in enumerate(ids) if d.split(":")[0] not in removed]
+        assert collection.count() == len(kept)
+
+        reopened = FlatCollection(temp_dir)
+        assert reopened.dtype == np.float16
+        query = np.random.default_rng(2).standard_normal(DIMENSION).astype(np.float32)
+        got = reopened.query(query_embeddings=[query], n_results=10)["ids"][0]
+        assert got == exact_ids([ids[i] for i in kept], vectors[kept], query, 10)
+
+        fetched = reopened.get(ids=[ids[kept[-1]]], include=["documents", "metadatas", "embeddings"])
+        assert fetched["documents"] == [docs[kept[-1]]]
+        assert fetched["metadatas"] == [metas[kept[-1]]]
+        unit = vectors[kept[-1]] / np.linalg.norm(vectors[kept[-1]])
+        assert np.allclose(fetched["embeddings"][0], unit, atol=1e-3)
+        print("✓ Deletes, compaction and reopening keep chunks consistent")
+    finally:
+        flat_vector_store._COMPACT_MIN_ROWS = original_min_rows
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("FLAT VECTOR STORE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_exact_and_scoped_top_k()
+        test_delete_compact_and_reopen()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Test script for hybrid (dense + BM25) retrieval.
+Checks reciprocal rank fusion scores and tie order, and that query_hybrid
+returns the fused ranking with the documents of whichever leg found each
+chunk and a dense distance only for chunks the dense leg retrieved, and that
+the two legs run at the same time and report their timings. Also checks that
+query_bm25 fetches all hits from Chroma in one call and returns them in BM25
+score order.
+The query embedding (and, for the fusion test, both legs) is stubbed, so no
+embedding model is loaded.
+
+Usage:
+    python -m backend.tests.test_hybrid_retrieval
+"""
+
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_db import ChromaClient, RRF_K, reciprocal_rank_fusion
+
+DIMENSION = 8
+# Time added to each leg of query_hybrid in the concurrency test
+LEG_SECONDS = 0.3
+
+
+def test_rrf_scores_and_ties():
+    """Scores are sums of 1 / (RRF_K + rank); equal scores keep first-seen order."""
+    assert RRF_K == 60
+
+    # Found by both legs at rank 2 beats rank 1 in a single leg
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "b"]])
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "c"]
+    assert dict(fused) == {"b": 2 / 62, "a": 1 / 61, "c": 1 / 61}
+
+    # Ties: swapped ranks, and the top hit of each leg found by that leg alone
+    assert reciprocal_rank_fusion([["x", "y"], ["y", "x"]]) == [("x", 1 / 61 + 1 / 62), ("y", 1 / 61 + 1 / 62)]
+    assert reciprocal_rank_fusion([["dense"], ["sparse"]]) == [("dense", 1 / 61), ("sparse", 1 / 61)]
+    assert reciprocal_rank_fusion([["sparse"], ["dense"]]) == [("sparse", 1 / 61), ("dense", 1 / 61)]
+
+    # A document found by only one leg scores by its rank there
+    fused = dict(reciprocal_rank_fusion([["d1", "d2", "d3"], []]))
+    assert fused == {"d1": 1 / 61, "d2": 1 / 62, "d3": 1 / 63}
+    fused = dict(reciprocal_rank_fusion([[], ["s1", "s2"]]))
+    assert fused == {"s1": 1 / 61, "s2": 1 / 62}
+    assert reciprocal_rank_fusion([[], []]) == []
+
+    # k damps the top ranks
+    assert dict(reciprocal_rank_fusion([["a"]], k=0)) == {"a": 1.0}
+    print("✓ Reciprocal rank fusion scores and tie order")
+
+
+def dense_result(ids, distances):
+    """A Chroma-style query result for the dense leg."""
+    return {
+        "ids": [ids],
+        "documents": [[f"dense text of {doc_id}" for doc_id in ids]],
+        "metadatas": [[{"item_id": doc_id.split(":")[0], "leg": "dense"} for doc_id in ids]],
+        "distances": [distances],
+    }
+
+
+def sparse_results(ids):
+    """query_bm25-style results for the sparse leg, best first."""
+    return [
+        {"id": doc_id, "score": 10.0 - n, "document": f"sparse text of {doc_id}",
+         "metadata": {"item_id": doc_id.split(":")[0], "leg": "sparse"}}
+        for n, doc_id in enumerate(ids)
+    ]
+
+
+def stub_legs(client, dense, sparse):
+    client._query_dense = lambda query, k, where, embedding_model_id: (dense, {"dense_leg_ms": 1.0})
+    client._query_sparse = lambda query, k, where: (sparse, {"sparse_leg_ms": 1.0})
+
+
+def test_query_hybrid_fuses_legs():
+    """query_hybrid returns fused ids with distances only for chunks the dense leg found."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        stub_legs(
+            client,
+            dense_result(["1:0", "2:0", "3:0"], [0.1, 0.2, 0.3]),
+            sparse_results(["2:0", "4:0", "1:0"]),
+        )
+        results = client.query_hybrid("retrieval", k=3, embedding_model_id="test")
+
+        ids = results["ids"][0]
+        expected = reciprocal_rank_fusion([["1:0", "2:0", "3:0"], ["2:0", "4:0", "1:0"]])
+        assert ids == [doc_id for doc_id, _ in expected] == ["2:0", "1:0", "4:0", "3:0"], ids
+        assert results["scores"][0] == [score for _, score in expected]
+        assert results["distances"][0] == [0.2, 0.1, None, 0.3]
+
+        # Chunks both legs found keep the dense leg's document and metadata
+        documents = dict(zip(ids, results["documents"][0]))
+        metadatas = dict(zip(ids, results["metadatas"][0]))
+        assert documents["2:0"] == "dense text of 2:0" and metadatas["1:0"]["leg"] == "dense"
+        assert documents["4:0"] == "sparse text of 4:0" and metadatas["4:0"]["leg"] == "sparse"
+
+        # Only BM25 hits (e.g. the dense query found nothing in scope)
+        stub_legs(client, {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]},
+                  sparse_results(["5:0", "6:0"]))
+        results = client.query_hybrid("retrieval", k=3, embedding_model_id="test")
+        assert results["ids"][0] == ["5:0", "6:0"]
+        assert results["distances"][0] == [None, None]
+        assert results["documents"][0] == ["sparse text of 5:0", "sparse text of 6:0"]
+        client.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ query_hybrid returns the fused ranking, with no distance for BM25-only hits")
+
+
+def test_query_hybrid_legs_overlap():
+    """The dense and sparse legs run concurrently: a query takes about as long as the slower leg."""
+    import backend.embed_utils as embed_utils
+
+    temp_dir = tempfile.mkdtemp()
+    get_embedding = embed_utils.get_embedding
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        texts = ["dense retrieval of papers", "sparse keyword retrieval", "an unrelated chunk"]
+        client.add_chunks(
+            ids=[f"{i}:0" for i in range(3)],
+            documents=texts,
+            metadatas=[{"item_id": str(i), "chunk_idx": 0} for i in range(3)],
+            embeddings=[[float(i == j) for j in range(DIMENSION)] for i in range(3)],
+        )
+        embed_utils.get_embedding = lambda query, model_id=None: np.eye(DIMENSION, dtype=np.float32)[0]
+        client.query_hybrid("retrieval", k=3, embedding_model_id="test")  # warm up Chroma and the BM25 index
+
+        # Each leg sleeps in its search step, as a slow HNSW query or BM25 scoring would
+        query_vectors, search = client.query_vectors, client.sparse_index.search
+
+        def slow_query_vectors(*args, **kwargs):
+            time.sleep(LEG_SECONDS)
+            return query_vectors(*args, **kwargs)
+
+        def slow_search(*args, **kwargs):
+            time.sleep(LEG_SECONDS)
+            return search(*args, **kwargs)
+
+        client.query_vectors = slow_query_vectors
+        client.sparse_index.search = slow_search
+
+        start = time.perf_counter()
+        results = client.query_hybrid("retrieval", k=3, embedding_model_id="test")
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        timings = results["timings"]
+        leg_keys = {"embed_ms", "dense_ms", "dense_leg_ms", "bm25_search_ms", "bm25_fetch_ms", "sparse_leg_ms"}
+        assert leg_keys | {"total_ms"} <= set(timings), timings
+        leg_ms = LEG_SECONDS * 1000
+        assert timings["dense_leg_ms"] >= leg_ms and timings["sparse_leg_ms"] >= leg_ms, timings
+        # Run one after the other the legs would take 2 * LEG_SECONDS
+        assert wall_ms < 1.5 * leg_ms, f"query took {wall_ms:.0f} ms for two {leg_ms:.0f} ms legs"
+        assert timings["total_ms"] < timings["dense_leg_ms"] + timings["sparse_leg_ms"], timings
+        assert set(results["ids"][0]) >= {"0:0", "1:0"}
+        client.close()
+    finally:
+        embed_utils.get_embedding = get_embedding
+        shutil.rmtree(temp_dir)
+    print(f"✓ Hybrid legs overlap: {wall_ms:.0f} ms for two {leg_ms:.0f} ms legs")
+
+
+class RecordingCollection:
+    """Wraps a Chroma collection, recording get() calls and returning their rows in reverse order."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.get_calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def get(self, ids=None, **kwargs):
+        self.get_calls.append(list(ids))
+        result = self.collection.get(ids=ids, **kwargs)
+        return {key: value[::-1] if isinstance(value, list) else value for key, value in result.items()}
+
+
+def test_query_bm25_fetches_hits_in_one_call():
+    """BM25 hits are fetched with a single get(), kept in score order, and dropped if Chroma lacks them."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        # More mentions of the query term score higher
+        texts = [f"{'retrieval ' * (n + 1)}chunk {n}" for n in range(5)] + ["an unrelated chunk"]
+        ids = [f"{n}:0" for n in range(len(texts))]
+        client.add_chunks(
+            ids=ids,
+            documents=texts,
+            metadatas=[{"item_id": str(n), "chunk_idx": 0} for n in range(len(texts))],
+            embeddings=[[float(n == j) for j in range(DIMENSION)] for n in range(len(texts))],
+        )
+        client.query_bm25("retrieval", k=3)  # loads (and checks) the BM25 index
+
+        collection = RecordingCollection(client.collection)
+        client.collection = collection
+        hits = client.sparse_index.search("retrieval", k=10)
+        results = client.query_bm25("retrieval", k=10)
+
+        assert collection.get_calls == [[doc_id for doc_id, _ in hits]]
+        assert len(hits) == 5 and [result["id"] for result in results] == [doc_id for doc_id, _ in hits]
+        scores = [result["score"] for result in results]
+        assert scores == sorted(scores, reverse=True) and results[0]["id"] == "4:0"
+        for result in results:
+            n = int(result["id"].split(":")[0])
+            assert result["document"] == texts[n] and result["metadata"]["item_id"] == str(n)
+
+        # A chunk deleted from Chroma but still in the BM25 index is left out
+        collection.collection.delete(ids=["3:0"])
+        collection.get_calls.clear()
+        results = client.query_bm25("retrieval", k=10)
+        assert len(collection.get_calls) == 1 and "3:0" in collection.get_calls[0]
+        assert [result["id"] for result in results] == ["4:0", "2:0", "1:0", "0:0"]
+        assert all(result["document"] == texts[int(result["id"][0])] for result in results)
+
+        # No hits, no fetch
+        collection.get_calls.clear()
+        assert client.query_bm25("nonexistentterm", k=10) == []
+        assert collection.get_calls == []
+        client.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ query_bm25 fetches all hits in one call and keeps BM25 score order")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("HYBRID RETRIEVAL TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_rrf_scores_and_ties()
+        test_query_hybrid_fuses_legs()
+        test_query_hybrid_legs_overlap()
+        test_query_bm25_fetches_hits_in_one_call()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
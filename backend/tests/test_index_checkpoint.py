@@ -0,0 +1,249 @@
+"""
+Test script for indexing job checkpoints and resuming interrupted jobs.
+Checks that completed items logged by a job are returned when it is resumed,
+that a torn last line of completed.log is not counted, that finished jobs are
+no longer resumable, and that ZoteroChatbot.start_indexing(resume=True)
+continues an interrupted job in its original mode (full or incremental)
+without re-extracting the items it already completed.
+Indexing runs in-process with a stand-in encoder; no model is downloaded.
+
+Usage:
+    python -m backend.tests.test_index_checkpoint
+"""
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.index_checkpoint import IndexCheckpoint, RESUMABLE_STATUSES
+from backend.zoteroitem import ZoteroItem
+
+
+def test_completed_items_survive_restart():
+    """Items marked completed are returned by resume(), from a fresh checkpoint object."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        job_dir = os.path.join(temp_dir, "minilm-l6")
+        checkpoint = IndexCheckpoint(job_dir)
+        assert checkpoint.load() is None and checkpoint.load_resumable() is None
+
+        job = checkpoint.start("full", "minilm-l6")
+        assert job["status"] == "running" and job["mode"] == "full"
+        checkpoint.mark_completed(["1", "2"])
+        checkpoint.mark_completed(["3"])
+
+        # The backend was killed: nothing closed the log or updated the manifest
+        restarted = IndexCheckpoint(job_dir)
+        resumable = restarted.load_resumable()
+        assert resumable["job_id"] == job["job_id"] and resumable["completed_items"] == 3
+        assert restarted.resume() == {"1", "2", "3"}
+        assert restarted.load()["status"] == "running" and "resumed_at" in restarted.load()
+
+        # Appending after a resume keeps the items of the first run
+        restarted.mark_completed(["4"])
+        assert restarted.completed_ids() == {"1", "2", "3", "4"}
+
+        # A new job starts with an empty log
+        restarted.start("incremental", "minilm-l6")
+        assert restarted.completed_ids() == set()
+        restarted.finish("completed")
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Completed items are returned when a job is resumed")
+
+
+def test_torn_last_line_ignored():
+    """An item ID written without its newline (killed mid-write) is not counted as completed."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        checkpoint = IndexCheckpoint(temp_dir)
+        checkpoint.start("incremental", "minilm-l6")
+        checkpoint.mark_completed(["10", "11"])
+        with open(checkpoint.log_path, "a", encoding="utf-8") as f:
+            f.write("12")
+
+        assert IndexCheckpoint(temp_dir).completed_ids() == {"10", "11"}
+        assert IndexCheckpoint(temp_dir).load_resumable()["completed_items"] == 2
+        checkpoint.finish("failed")
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Torn last line of completed.log is ignored")
+
+
+def test_finish_status_controls_resuming():
+    """Cancelled and failed jobs stay resumable; completed ones do not."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        checkpoint = IndexCheckpoint(temp_dir)
+        for status in ("cancelled", "failed", "completed"):
+            checkpoint.start("full", "minilm-l6")
+            checkpoint.mark_completed(["1"])
+            checkpoint.finish(status)
+            assert checkpoint.load()["status"] == status
+            if status in RESUMABLE_STATUSES:
+                assert checkpoint.load_resumable()["completed_items"] == 1, status
+            else:
+                assert checkpoint.load_resumable() is None, status
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Finished jobs are resumable only if they did not complete")
+
+
+class FakeEncoder:
+    """Stands in for the embedding model, so indexing runs without downloading one."""
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        return np.random.default_rng(len(sentences)).standard_normal((len(sentences), 384)).astype(np.float32)
+
+
+class FakeLibrary:
+    """Stands in for ZoteroLibrary with a fixed set of items."""
+
+    def __init__(self, pdf_paths):
+        self.pdf_paths = pdf_paths
+
+    def library_version(self):
+        return 0
+
+    def search_parent_items_with_pdfs(self):
+        return [
+            ZoteroItem(filepath=path, metadata={
+                "item_id": str(i + 1), "title": f"Paper {i + 1}", "authors": "Smith", "date": "2020",
+                "date_modified": "2024-01-01", "pdf_path": path,
+            })
+            for i, path in enumerate(self.pdf_paths)
+        ]
+
+
+def open_chatbot(directory, n_items):
+    """A chatbot over n one-page PDFs that records which items reach the indexing pipeline."""
+    import fitz
+    from backend.interface import ZoteroChatbot
+
+    pdf_paths = []
+    for i in range(n_items):
+        path = os.path.join(directory, f"paper{i}.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"Paper {i} studies retrieval. " * 5)
+        doc.save(path)
+        doc.close()
+        pdf_paths.append(path)
+
+    chatbot = ZoteroChatbot(
+        db_path=os.path.join(directory, "zotero.sqlite"),
+        chroma_path=os.path.join(directory, "chroma"),
+        embedding_model_id="minilm-l6",
+        jobs_dir=os.path.join(directory, "jobs"),
+    )
+    chatbot.zlib = FakeLibrary(pdf_paths)
+    chatbot.extract_workers = 0
+
+    chatbot.indexed_ids = []
+    run_index_pipeline = chatbot._run_index_pipeline
+
+    def recording_pipeline(items):
+        def record(items):
+            for item in items:
+                chatbot.indexed_ids.append(str(item.metadata["item_id"]))
+                yield item
+        return run_index_pipeline(record(items))
+
+    chatbot._run_index_pipeline = recording_pipeline
+    return chatbot
+
+
+def run_indexing(chatbot, incremental, resume):
+    chatbot.indexed_ids = []
+    chatbot.start_indexing(incremental=incremental, resume=resume)
+    while chatbot.is_indexing:
+        time.sleep(0.05)
+    return chatbot.index_progress
+
+
+def test_resume_skips_completed_items_in_original_mode():
+    """A resumed job keeps its mode and only extracts the items it had not completed."""
+    import backend.embed_utils as embed_utils
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        embed_utils._model_cache.get(("minilm-l6", "torch"), FakeEncoder)
+        chatbot = open_chatbot(temp_dir, 3)
+        assert chatbot.get_resumable_job() is None
+
+        # An incremental sync failed after item 1; asking for a full index resumes it instead
+        checkpoint = chatbot._job_checkpoint()
+        checkpoint.start("incremental", "minilm-l6")
+        checkpoint.mark_completed(["1"])
+        checkpoint.finish("failed")
+        assert chatbot.get_resumable_job()["mode"] == "incremental"
+
+        progress = run_indexing(chatbot, incremental=False, resume=True)
+        assert progress["resumed"] and progress["mode"] == "incremental"
+        assert progress["resumed_items"] == 1 and progress["processed_items"] == 3
+        assert chatbot.indexed_ids == ["2", "3"], chatbot.indexed_ids
+        assert chatbot.get_resumable_job() is None
+        assert checkpoint.load()["status"] == "completed"
+        assert checkpoint.completed_ids() == {"1", "2", "3"}
+
+        # A full re-index was killed after items 1 and 2; an incremental request resumes it as full
+        killed = IndexCheckpoint(checkpoint.job_dir)
+        killed.start("full", "minilm-l6")
+        killed.mark_completed(["1", "2"])
+        assert chatbot.get_resumable_job()["status"] == "running"
+
+        progress = run_indexing(chatbot, incremental=True, resume=True)
+        assert progress["resumed"] and progress["mode"] == "full"
+        assert progress["resumed_items"] == 2 and progress["total_items"] == 3
+        assert chatbot.indexed_ids == ["3"], chatbot.indexed_ids
+        assert chatbot.get_resumable_job() is None
+
+        # Without resume=True a new job starts and every item is indexed again
+        killed.start("full", "minilm-l6")
+        killed.mark_completed(["1"])
+        progress = run_indexing(chatbot, incremental=False, resume=False)
+        assert not progress["resumed"] and progress["resumed_items"] == 0
+        assert chatbot.indexed_ids == ["1", "2", "3"], chatbot.indexed_ids
+        assert chatbot.chroma.get_indexed_item_ids() == {"1", "2", "3"}
+        chatbot.chroma.close()
+    finally:
+        embed_utils._model_cache.clear()
+        shutil.rmtree(temp_dir)
+    print("✓ Resumed jobs keep their mode and skip completed items")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("INDEX CHECKPOINT TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_completed_items_survive_restart()
+        test_torn_last_line_ignored()
+        test_finish_status_controls_resuming()
+        test_resume_skips_completed_items_in_original_mode()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
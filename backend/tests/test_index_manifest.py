@@ -0,0 +1,352 @@
+"""
+Test script for the item manifest kept next to the Chroma store.
+Checks that add_chunks/delete_item keep it in step with the collection,
+including items split across write batches, that item fields are stored
+once per item, that libraries indexed before the manifest existed are
+backfilled from the chunk metadata, and that an incremental sync restores
+the item fields a rebuilt manifest lacks.
+
+Usage:
+    python -m backend.tests.test_index_manifest
+"""
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_db import ChromaClient, ChunkWriteBuffer
+from backend.zoteroitem import ZoteroItem
+
+DIMENSION = 8
+
+
+def item_chunks(item_id, n_chunks, fingerprint):
+    ids = [f"{item_id}:{i}" for i in range(n_chunks)]
+    docs = [f"chunk {i} of {item_id}" for i in range(n_chunks)]
+    metas = [{"item_id": item_id, "chunk_idx": i, "fingerprint": fingerprint} for i in range(n_chunks)]
+    vectors = [[float(i + 1)] * DIMENSION for i in range(n_chunks)]
+    return ids, docs, metas, vectors
+
+
+def test_manifest_follows_writes_and_deletes():
+    """Chunk counts and fingerprints match the collection after adds, batched writes and deletes."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        client.add_chunks(*item_chunks("a", 3, "fa"))
+        # A small batch size splits item "b" across two Chroma writes
+        buffer = ChunkWriteBuffer(client, batch_size=4)
+        buffer.add("b", *item_chunks("b", 5, "fb"))
+        buffer.add("c", *item_chunks("c", 2, "fc"))
+        buffer.flush()
+
+        assert client.get_indexed_fingerprints() == {"a": "fa", "b": "fb", "c": "fc"}
+        assert client.manifest.get_item("b")["chunk_count"] == 5
+        assert client.get_index_stats() == {"items": 3, "chunks": 10}
+
+        assert client.delete_item("b") == 5
+        assert client.delete_item("missing") == 0
+        assert client.get_indexed_item_ids() == {"a", "c"}
+        assert not client.item_exists("b")
+        assert client.get_index_stats() == {"items": 2, "chunks": client.get_document_count()}
+        print("✓ Manifest follows add_chunks, batched writes and delete_item")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_item_fields_stored_once_per_item():
+    """Item fields live in the item table, can be edited without touching chunks, and go with the item."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        fields = {"title": "Paper A", "authors": "Smith", "year": "2020", "pdf_path": "/a.pdf", "fingerprint": "fa"}
+        client.add_chunks(*item_chunks("a", 3, ""), item_metadata={"a": fields, "unwritten": fields})
+
+        assert client.get_items_metadata(["a", "unwritten"]) == {
+            "a": {"title": "Paper A", "authors": "Smith", "tags": "", "collections": "",
+                  "year": "2020", "pdf_path": "/a.pdf", "pdf_fingerprint": ""},
+        }
+        assert client.get_indexed_fingerprints() == {"a": "fa"}
+        assert "title" not in client.collection.get(ids=["a:0"])["metadatas"][0]
+
+        client.update_item_metadata("a", "fa2", {**fields, "title": "Paper A (revised)"})
+        assert client.get_item_metadata("a")["title"] == "Paper A (revised)"
+        assert client.get_indexed_fingerprints() == {"a": "fa2"}
+        assert client.get_document_count() == 3
+
+        client.delete_item("a")
+        assert client.get_items_metadata(["a"]) == {}
+        print("✓ Item fields stored once per item and removed with it")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_manifest_backfilled_from_collection():
+    """A collection without a manifest (or with a stale one) is scanned once to rebuild it."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        client.add_chunks(*item_chunks("a", 3, "fa"))
+        # Chunks written before the item table existed carry the item fields themselves
+        ids, docs, metas, vectors = item_chunks("b", 2, "")
+        client.add_chunks(ids, docs, [{**m, "title": "Legacy B", "authors": "Doe"} for m in metas], vectors)
+        client.manifest.close()
+        os.remove(client.manifest.path)
+
+        reopened = ChromaClient(temp_dir, embedding_model_id="test")
+        assert reopened.get_indexed_fingerprints() == {"a": "fa", "b": ""}
+        assert reopened.get_index_stats() == {"items": 2, "chunks": 5}
+        assert reopened.get_items_metadata(["b"])["b"]["title"] == "Legacy B"
+
+        # A rebuild after the counts drift keeps fingerprints that chunks no longer carry
+        reopened.add_chunks(*item_chunks("c", 2, ""), item_metadata={"c": {"fingerprint": "fc"}})
+        reopened.collection.delete(ids=["a:0"])
+        stale = ChromaClient(temp_dir, embedding_model_id="test")
+        assert stale.get_indexed_fingerprints() == {"a": "fa", "b": "", "c": "fc"}
+        assert stale.manifest.get_item("a")["chunk_count"] == 2
+
+        # Manifests of other embedding models share the file but not the rows
+        other = ChromaClient(temp_dir, embedding_model_id="other")
+        assert other.get_indexed_item_ids() == set()
+        print("✓ Manifest backfilled from chunk metadata")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_write_buffer_embeds_across_items():
+    """Chunks of several items share embed() calls; only complete items are written after a failure."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        calls = []
+
+        def embed(texts):
+            calls.append(len(texts))
+            if fail and len(calls) == 3:
+                raise RuntimeError("encoder failed")
+            return [[float(len(text)), 1.0] + [0.0] * (DIMENSION - 2) for text in texts]
+
+        flushed = []
+        fail = False
+        buffer = ChunkWriteBuffer(client, batch_size=100, on_flush=flushed.extend, embed=embed, embed_batch_size=8)
+        for n, item_id in enumerate("abcdefghij"):
+            ids, docs, metas, _ = item_chunks(item_id, 3, f"f{item_id}")
+            buffer.add(item_id, ids, [f"{doc} {'x' * n}" for doc in docs], metas)
+        assert calls == [9, 9, 9] and flushed == []
+        buffer.flush()
+        assert calls == [9, 9, 9, 3] and buffer.embed_calls == 4
+        assert flushed == list("abcdefghij") and client.get_document_count() == 30
+        stored = client.get_chunks(["e:1"], include=["documents", "embeddings"])
+        assert stored["embeddings"][0][0] == len(stored["documents"][0])
+
+        # An embed() failure keeps items whose chunks were all embedded before it
+        calls.clear()
+        flushed.clear()
+        fail = True
+        try:
+            for item_id in "klmnopqrs":
+                buffer.add(item_id, *item_chunks(item_id, 3, f"f{item_id}")[:3])
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected the embed() failure to be raised")
+        assert calls == [9, 9, 9]
+        buffer.flush()
+        assert flushed == list("klmnop")
+        assert client.get_indexed_item_ids() == set("abcdefghijklmnop")
+        print("✓ Write buffer embeds chunks across items and drops incomplete ones on failure")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+class FakeEncoder:
+    """Stands in for the embedding model, so indexing runs without downloading one."""
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        return np.random.default_rng(len(sentences)).standard_normal((len(sentences), 384)).astype(np.float32)
+
+
+class FakeLibrary:
+    """Stands in for ZoteroLibrary with a fixed set of items; bump version after changing them."""
+
+    def __init__(self, pdf_paths):
+        self.pdf_paths = pdf_paths
+        self.version = 0
+        self.searches = 0
+
+    def library_version(self):
+        return self.version
+
+    def search_parent_items_with_pdfs(self):
+        self.searches += 1
+        return [
+            ZoteroItem(filepath=path, metadata={
+                "item_id": str(i + 1), "title": f"Paper {i + 1}", "authors": "Smith", "date": "2020",
+                "date_modified": "2024-01-01", "pdf_path": path,
+            })
+            for i, path in enumerate(self.pdf_paths)
+        ]
+
+
+def write_pdfs(directory, n):
+    """One-page PDFs paper0.pdf ... paper<n-1>.pdf; returns their paths."""
+    import fitz
+
+    pdf_paths = []
+    for i in range(n):
+        path = os.path.join(directory, f"paper{i}.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"Paper {i} studies retrieval. " * 5)
+        doc.save(path)
+        doc.close()
+        pdf_paths.append(path)
+    return pdf_paths
+
+
+def open_chatbot(directory, pdf_paths):
+    """A chatbot over a FakeLibrary, indexing in-process with the minilm-l6 collection."""
+    from backend.interface import ZoteroChatbot
+
+    chatbot = ZoteroChatbot(
+        db_path=os.path.join(directory, "zotero.sqlite"),
+        chroma_path=os.path.join(directory, "chroma"),
+        embedding_model_id="minilm-l6",
+    )
+    chatbot.zlib = FakeLibrary(pdf_paths)
+    chatbot.extract_workers = 0
+    return chatbot
+
+
+def sync(chatbot):
+    """Run an incremental index and wait for it to finish."""
+    chatbot.start_indexing(incremental=True)
+    while chatbot.is_indexing:
+        time.sleep(0.05)
+    return chatbot.index_progress
+
+
+def test_incremental_sync_restores_lost_item_fields():
+    """After the manifest is lost, the next incremental sync re-indexes items and restores their fields."""
+    import backend.embed_utils as embed_utils
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_paths = write_pdfs(temp_dir, 2)
+        embed_utils._model_cache.get(("minilm-l6", "torch"), FakeEncoder)
+
+        chatbot = open_chatbot(temp_dir, pdf_paths)
+        sync(chatbot)
+        assert set(chatbot.chroma.get_items_metadata(["1", "2"])) == {"1", "2"}
+
+        # Losing the manifest leaves the chunks but neither fingerprints nor item fields
+        chatbot.chroma.manifest.close()
+        os.remove(chatbot.chroma.manifest.path)
+        chatbot = open_chatbot(temp_dir, pdf_paths)
+        assert chatbot.chroma.get_indexed_fingerprints() == {"1": "", "2": ""}
+        assert chatbot.chroma.get_items_metadata(["1", "2"]) == {}
+
+        progress = sync(chatbot)
+        assert progress["updated_items"] == 2, f"expected 2 items re-synced, got {progress['updated_items']}"
+        fields = chatbot.chroma.get_items_metadata(["1", "2"])
+        assert fields["1"]["title"] == "Paper 1" and fields["2"]["pdf_fingerprint"]
+        assert all(chatbot.chroma.get_indexed_fingerprints().values())
+
+        # Once restored, nothing is left to sync
+        added, updated, unchanged, removed = chatbot.diff_library(chatbot.zlib.search_parent_items_with_pdfs())
+        assert (added, updated, unchanged, removed) == ([], [], 2, set())
+        print("✓ Incremental sync restores item fields after the manifest is lost")
+    finally:
+        embed_utils._model_cache.clear()
+        shutil.rmtree(temp_dir)
+
+
+def test_library_stats_reused_until_something_changes():
+    """library_stats() only diffs the library again after the index or the Zotero database changed."""
+    import backend.embed_utils as embed_utils
+    import backend.interface as interface
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_paths = write_pdfs(temp_dir, 3)
+        embed_utils._model_cache.get(("minilm-l6", "torch"), FakeEncoder)
+        chatbot = open_chatbot(temp_dir, pdf_paths[:2])
+        library = chatbot.zlib
+
+        stats = chatbot.library_stats()
+        assert (stats["zotero_items"], stats["new_items"], stats["unchanged_items"]) == (2, 2, 0)
+        assert chatbot.library_stats() == stats and library.searches == 1
+
+        # Indexing writes to the manifest
+        sync(chatbot)
+        searches = library.searches
+        stats = chatbot.library_stats()
+        assert (stats["new_items"], stats["unchanged_items"]) == (0, 2) and library.searches == searches + 1
+
+        # A paper added in Zotero changes the database
+        library.pdf_paths = pdf_paths
+        library.version += 1
+        stats = chatbot.library_stats()
+        assert (stats["zotero_items"], stats["new_items"]) == (3, 1)
+        assert chatbot.library_stats() == stats and library.searches == searches + 2
+
+        # Explicit refreshes and expired results are recomputed
+        chatbot.library_stats(refresh=True)
+        assert library.searches == searches + 3
+        original = interface.LIBRARY_STATS_MAX_AGE
+        interface.LIBRARY_STATS_MAX_AGE = 0
+        try:
+            chatbot.library_stats()
+        finally:
+            interface.LIBRARY_STATS_MAX_AGE = original
+        assert library.searches == searches + 4
+
+        # The store of another embedding model has stats of its own
+        chatbot.embedding_model_id = "minilm-l3"
+        embed_utils._model_cache.get(("minilm-l3", "torch"), FakeEncoder)
+        chatbot.reopen_vector_store()
+        assert chatbot.library_stats()["new_items"] == 3
+        chatbot.chroma.close()
+        print("✓ Library stats are reused until the index or the library changes")
+    finally:
+        embed_utils._model_cache.clear()
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("INDEX MANIFEST TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_manifest_follows_writes_and_deletes()
+        test_item_fields_stored_once_per_item()
+        test_manifest_backfilled_from_collection()
+        test_write_buffer_embeds_across_items()
+        test_incremental_sync_restores_lost_item_fields()
+        test_library_stats_reused_until_something_changes()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
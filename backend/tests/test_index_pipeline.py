@@ -0,0 +1,268 @@
+"""
+Test script for the streaming indexing pipeline.
+Checks that peak memory is bounded by the in-flight limit rather than the
+library size, that the process pool runs at most max_workers extractions and
+holds at most max_in_flight items, that its workers are spawned rather than
+forked, that cancellation stops the pipeline promptly and that producer
+failures reach the consumer.
+
+Usage:
+    python -m backend.tests.test_index_pipeline
+"""
+
+import sys
+import tempfile
+import shutil
+import os
+import multiprocessing
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.index_pipeline import IndexPipeline
+
+# Synthetic library: 5k items with ~200 KB of extracted text each (~1 GB total)
+LIBRARY_SIZE = 5000
+PAGES_PER_ITEM = 20
+PAGE_CHARS = 10_000
+MAX_IN_FLIGHT = 8
+
+
+class SyntheticItem:
+    """Stand-in for ZoteroItem with just the attributes the pipeline uses."""
+
+    def __init__(self, filepath, item_id):
+        self.filepath = filepath
+        self.metadata = {"item_id": str(item_id)}
+
+
+def synthetic_extract(filepath):
+    """Fake PyMuPDF extraction producing fresh page strings for every call."""
+    seed = os.path.basename(filepath)
+    return [
+        {"page_num": i + 1, "text": (f"{seed} page {i} " * (PAGE_CHARS // 16))[:PAGE_CHARS]}
+        for i in range(PAGES_PER_ITEM)
+    ]
+
+
+def slow_extract(filepath):
+    """Extraction that takes a while and records how many run at once.
+
+    Runs in pool worker processes, so concurrency is tracked with marker files
+    in a "running" directory next to the PDFs.
+    """
+    running_dir = os.path.join(os.path.dirname(filepath), "running")
+    marker = os.path.join(running_dir, f"{os.getpid()}-{os.path.basename(filepath)}")
+    open(marker, "w").close()
+    try:
+        with open(os.path.join(os.path.dirname(filepath), "concurrency.log"), "a") as log:
+            log.write(f"{len(os.listdir(running_dir))}\n")
+        time.sleep(0.02)
+        return [{"page_num": 1, "text": f"text of {os.path.basename(filepath)}"}]
+    finally:
+        os.remove(marker)
+
+
+def start_method_extract(filepath):
+    """Extraction reporting how the worker process running it was started."""
+    return [{"page_num": 1, "text": multiprocessing.get_start_method()}]
+
+
+def test_peak_memory_bounded_by_in_flight_limit():
+    """Peak memory allocated while streaming 5k items must not grow with library size."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # One real file is enough: the pipeline only checks that the path exists
+        pdf_path = os.path.join(temp_dir, "synthetic.pdf")
+        Path(pdf_path).touch()
+        items = (SyntheticItem(pdf_path, i) for i in range(LIBRARY_SIZE))
+
+        library_mb = LIBRARY_SIZE * PAGES_PER_ITEM * PAGE_CHARS / (1024 * 1024)
+        item_mb = PAGES_PER_ITEM * PAGE_CHARS / (1024 * 1024)
+
+        processed = 0
+        stages = {}
+        pipeline = IndexPipeline(
+            extract_fn=synthetic_extract,
+            max_workers=0,
+            max_in_flight=MAX_IN_FLIGHT,
+            stages=stages,
+        )
+        # Only allocations made during the run count, whatever earlier tests allocated
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            for item, pages_data in pipeline.iter_extracted(items):
+                # Simulate the embedding stage touching all text of the item
+                processed += sum(len(p["text"]) for p in pages_data) > 0
+            peak_mb = (tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+        print(f"Library text: {library_mb:.0f} MB, peak allocated during the run: {peak_mb:.1f} MB")
+
+        assert processed == LIBRARY_SIZE, f"Expected {LIBRARY_SIZE} items, got {processed}"
+        # The in-flight items' text (plus the one being built) and some slack, far below the library
+        limit_mb = (MAX_IN_FLIGHT + 2) * item_mb * 1.5
+        assert peak_mb < limit_mb, \
+            f"Peak allocation {peak_mb:.1f} MB exceeds {limit_mb:.1f} MB for a {library_mb:.0f} MB library"
+        print("✓ Peak memory is bounded by the in-flight limit")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_process_pool_respects_limits():
+    """With worker processes, at most max_workers extractions run and max_in_flight items are held."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(temp_dir, "running"))
+        items = []
+        for i in range(40):
+            path = os.path.join(temp_dir, f"{i}.pdf")
+            Path(path).touch()
+            items.append(SyntheticItem(path, i))
+
+        max_workers, max_in_flight = 2, 4
+        stages = {}
+        pipeline = IndexPipeline(
+            extract_fn=slow_extract, max_workers=max_workers, max_in_flight=max_in_flight, stages=stages
+        )
+
+        # Sample the stage depths while the pipeline runs, not only between items
+        samples = []
+        done = threading.Event()
+
+        def monitor():
+            while not done.is_set():
+                samples.append(stages.get("extracting", 0) + stages.get("queued", 0) + stages.get("embedding", 0))
+                time.sleep(0.001)
+
+        sampler = threading.Thread(target=monitor, daemon=True)
+        sampler.start()
+        processed = []
+        try:
+            for item, pages_data in pipeline.iter_extracted(items):
+                time.sleep(0.01)  # slow consumer, so extracted items back up
+                processed.append((item, pages_data))
+        finally:
+            done.set()
+            sampler.join()
+
+        with open(os.path.join(temp_dir, "concurrency.log")) as log:
+            concurrency = [int(line) for line in log]
+        assert len(processed) == 40 and all(pages_data for _, pages_data in processed)
+        assert max(concurrency) <= max_workers, f"{max(concurrency)} extractions ran at once"
+        assert max(samples) <= max_in_flight, f"{max(samples)} items in flight > {max_in_flight}"
+        print(f"✓ Process pool: at most {max(concurrency)} extractions and {max(samples)} items in flight")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_pool_workers_are_spawned():
+    """Workers are spawned rather than forked from the multi-threaded backend."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, "synthetic.pdf")
+        Path(pdf_path).touch()
+        items = [SyntheticItem(pdf_path, i) for i in range(2)]
+        pipeline = IndexPipeline(extract_fn=start_method_extract, max_workers=1)
+        methods = {pages_data[0]["text"] for _, pages_data in pipeline.iter_extracted(items)}
+        assert methods == {"spawn"}, methods
+        print("✓ Extraction workers are spawned")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cancellation_stops_pipeline():
+    """Cancelling mid-run must stop extraction and return promptly."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, "synthetic.pdf")
+        Path(pdf_path).touch()
+        items = [SyntheticItem(pdf_path, i) for i in range(200)]
+
+        processed = []
+        pipeline = IndexPipeline(
+            extract_fn=synthetic_extract,
+            max_workers=0,
+            max_in_flight=4,
+            should_cancel=lambda: len(processed) >= 10,
+        )
+        pipeline.run(items, lambda item, pages_data: processed.append(item))
+
+        assert len(processed) == 10, f"Expected 10 items before cancellation, got {len(processed)}"
+        print("✓ Cancellation stops the pipeline")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_missing_files_are_passed_through():
+    """Items without a PDF on disk reach the consumer with empty pages."""
+    items = [SyntheticItem(None, 1), SyntheticItem("/nonexistent/file.pdf", 2)]
+    results = list(IndexPipeline(extract_fn=synthetic_extract, max_workers=0).iter_extracted(items))
+
+    assert len(results) == 2, f"Expected 2 items, got {len(results)}"
+    assert all(pages_data == [] for _, pages_data in results), "Missing PDFs should yield no pages"
+    print("✓ Missing PDFs are passed through with empty pages")
+
+
+def test_producer_failure_is_raised():
+    """A failing producer surfaces in the consumer instead of ending the stream normally."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, "synthetic.pdf")
+        Path(pdf_path).touch()
+
+        def failing_items():
+            for i in range(3):
+                yield SyntheticItem(pdf_path, i)
+            raise OSError("Zotero database went away")
+
+        for max_workers in (0, 1):
+            processed = []
+            pipeline = IndexPipeline(extract_fn=synthetic_extract, max_workers=max_workers, max_in_flight=2)
+            try:
+                pipeline.run(failing_items(), lambda item, pages_data: processed.append(item))
+            except OSError as e:
+                assert "went away" in str(e)
+            else:
+                raise AssertionError(f"max_workers={max_workers}: producer failure was swallowed")
+            assert len(processed) == 3, f"max_workers={max_workers}: expected 3 items, got {len(processed)}"
+        print("✓ Producer failures are raised to the consumer")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("INDEXING PIPELINE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_missing_files_are_passed_through()
+        test_cancellation_stops_pipeline()
+        test_producer_failure_is_raised()
+        test_peak_memory_bounded_by_in_flight_limit()
+        test_process_pool_respects_limits()
+        test_pool_workers_are_spawned()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Test script for deferred model loading.
+Checks that importing the embedding helpers and creating the chatbot's
+retrieval stack imports neither torch, sentence_transformers nor chromadb,
+and that readiness is reported before any model has loaded.
+
+Usage:
+    python -m backend.tests.test_lazy_loading
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "chromadb")
+
+CHECK = """
+import json, sys
+import backend.embed_utils as embed_utils
+import backend.vector_store
+print(json.dumps({
+    "loaded": [m for m in %r if m in sys.modules],
+    "readiness": embed_utils.get_readiness(),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def test_imports_are_light():
+    """Embedding helpers and vector stores import without the model stack or Chroma."""
+    import json
+
+    # A fresh interpreter, so modules imported by other tests do not count
+    output = subprocess.run(
+        [sys.executable, "-c", CHECK], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["loaded"] == [], f"imported at startup: {result['loaded']}"
+    readiness = result["readiness"]
+    assert readiness["ready"] is False and readiness["status"] == "idle"
+    assert readiness["embedding_model"] is None and readiness["reranker"] is False
+    print("✓ Model stack and Chroma are not imported at startup")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("LAZY LOADING TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_imports_are_light()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Test script for the in-memory model cache.
+Checks that concurrent requests for one model load it once, that the least
+recently used models are unloaded to stay within the memory budget, that
+idle models are unloaded, and that the counters add up.
+
+Usage:
+    python -m backend.tests.test_model_cache
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.model_cache import ModelCache
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.nbytes = nbytes
+
+
+def test_concurrent_requests_load_once():
+    """Threads asking for a model that is still loading share one load."""
+    cache = ModelCache(max_bytes=100 * MB, idle_seconds=None, size_of=lambda m: m.nbytes)
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return FakeModel("a", 10 * MB)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("a", slow_loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({id(model) for model in results}) == 1
+    stats = cache.stats()
+    assert stats["loads"] == 1 and stats["hits"] + stats["misses"] == 8
+    assert stats["load_seconds"] >= 0.2
+    print("✓ Concurrent requests share one load")
+
+
+def test_lru_eviction_and_idle_unloading():
+    """Models past the budget go least recently used first; idle ones are unloaded."""
+    cache = ModelCache(max_bytes=25 * MB, idle_seconds=None, size_of=lambda m: m.nbytes)
+    for name in ("a", "b"):
+        cache.get(name, lambda name=name: FakeModel(name, 10 * MB))
+    cache.get("a", lambda: FakeModel("a", 10 * MB))  # hit: "b" is now least recently used
+    cache.get("c", lambda: FakeModel("c", 10 * MB))
+    assert cache.keys() == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+    # A model larger than the budget is still kept on its own
+    cache.get("huge", lambda: FakeModel("huge", 40 * MB))
+    assert cache.keys() == ["huge"]
+
+    cache.configure(idle_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.unload_idle() == 1
+    assert cache.keys() == []
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["loads"]) == (1, 4, 4)
+    assert stats["idle_unloads"] == 1 and stats["bytes"] == 0
+    print("✓ LRU eviction by memory budget and idle unloading")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("MODEL CACHE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_concurrent_requests_load_once()
+        test_lru_eviction_and_idle_unloading()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Parity test for the ONNX Runtime embedding backends.
+Exports each embedding model (or the ones given on the command line) to a
+temporary directory and checks that the 'onnx' and 'onnx-int8' backends
+agree with the PyTorch SentenceTransformer output in cosine similarity.
+Needs torch, sentence_transformers and onnx, and downloads the models, so
+under pytest it is skipped unless ZOTERO_LLM_DOWNLOAD_TESTS=1 is set.
+
+Usage:
+    python -m backend.tests.test_onnx_embedder [model_id ...]
+"""
+
+import os
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnx")
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from sentence_transformers import SentenceTransformer
+
+import backend.embed_utils as embed_utils
+from backend.embed_utils import EMBEDDING_MODELS, configure_embedding_backend, get_embeddings
+
+# Set to run the tests that download models under pytest
+DOWNLOAD_ENV = "ZOTERO_LLM_DOWNLOAD_TESTS"
+
+# Minimum cosine agreement with PyTorch, per backend
+MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.98}
+
+TEXTS = [
+    "Deep learning uses neural networks with multiple layers.",
+    "  Citation analysis of HUMANITIES journals, 1990-2010  ",
+    "Transformers",
+    "Natural language processing enables computers to understand text. " * 60,  # longer than max_seq_length
+]
+
+
+def check_parity(model_id):
+    """Both ONNX backends reproduce model.encode() for one embedding model."""
+    temp_dir = tempfile.mkdtemp()
+    original_backend = embed_utils.get_embedding_backend()
+    try:
+        reference = SentenceTransformer(EMBEDDING_MODELS[model_id]["name"], device="cpu").encode(
+            TEXTS, convert_to_numpy=True
+        )
+        for backend, min_cosine in MIN_COSINE.items():
+            configure_embedding_backend(backend, temp_dir)
+            vectors = get_embeddings(TEXTS, model_id=model_id, batch_size=2)
+            cosine = (reference * vectors).sum(axis=1) / (
+                np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1)
+            )
+            assert vectors.shape == reference.shape, f"{model_id}/{backend}: shape {vectors.shape}"
+            assert cosine.min() >= min_cosine, f"{model_id}/{backend}: cosine {cosine.min():.5f} < {min_cosine}"
+            print(f"✓ {model_id} {backend}: min cosine {cosine.min():.5f}")
+    finally:
+        configure_embedding_backend(original_backend, embed_utils.DEFAULT_ONNX_DIR)
+        shutil.rmtree(temp_dir)
+
+
+def test_onnx_parity(model_ids=None):
+    """Every embedding model agrees with PyTorch under both ONNX backends."""
+    if model_ids is None and not os.environ.get(DOWNLOAD_ENV):
+        pytest.skip(f"downloads every embedding model; set {DOWNLOAD_ENV}=1 to run")
+    for model_id in model_ids or EMBEDDING_MODELS:
+        check_parity(model_id)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("ONNX EMBEDDING PARITY TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_onnx_parity(sys.argv[1:] or list(EMBEDDING_MODELS))
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
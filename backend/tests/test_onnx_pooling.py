@@ -0,0 +1,116 @@
+"""
+Offline tests for the ONNX embedding backend.
+Checks OnnxEmbedder's pooling (cls, mean, max, with and without
+normalization) against a NumPy reference on padded batches, and that
+read_export_config() rejects missing, malformed and older exports. Needs
+neither onnxruntime sessions nor model downloads.
+
+Usage:
+    python -m backend.tests.test_onnx_pooling
+"""
+
+import json
+import os
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.onnx_embedder import EXPORT_FORMAT_VERSION, OnnxEmbedder, read_export_config
+
+
+def pooler(mode, normalize):
+    """An OnnxEmbedder with only the pooling settings, without loading a model."""
+    embedder = object.__new__(OnnxEmbedder)
+    embedder.pooling_mode = mode
+    embedder.normalize = normalize
+    return embedder
+
+
+def padded_batch(seed=0):
+    """Hidden states for three texts of 5, 3 and 1 tokens, padded to 5 with large values."""
+    rng = np.random.default_rng(seed)
+    lengths = [5, 3, 1]
+    hidden = rng.standard_normal((3, 5, 8)).astype(np.float32)
+    mask = np.zeros((3, 5), dtype=np.int64)
+    for row, length in enumerate(lengths):
+        mask[row, :length] = 1
+        hidden[row, length:] = 100.0  # padding must never leak into the pooled vector
+    return hidden, mask, lengths
+
+
+def test_pooling_modes():
+    """cls/mean/max pooling ignore padding and match a per-text reference."""
+    hidden, mask, lengths = padded_batch()
+    references = {
+        "cls": [hidden[row, 0] for row in range(3)],
+        "mean": [hidden[row, :n].mean(axis=0) for row, n in enumerate(lengths)],
+        "max": [hidden[row, :n].max(axis=0) for row, n in enumerate(lengths)],
+    }
+    for mode, expected in references.items():
+        expected = np.stack(expected)
+        pooled = pooler(mode, normalize=False)._pool(hidden, mask)
+        assert pooled.dtype == np.float32 and pooled.shape == (3, 8)
+        assert np.allclose(pooled, expected, atol=1e-5), f"{mode} pooling differs"
+
+        normalized = pooler(mode, normalize=True)._pool(hidden, mask)
+        assert np.allclose(np.linalg.norm(normalized, axis=1), 1.0, atol=1e-5)
+        assert np.allclose(normalized, expected / np.linalg.norm(expected, axis=1, keepdims=True), atol=1e-5)
+    print("✓ cls/mean/max pooling ignore padding, with and without normalization")
+
+
+def test_export_config_versions():
+    """Only configs of the current export format are accepted."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "config.json")
+        assert read_export_config(temp_dir) is None  # no export yet
+
+        with open(path, "w") as f:
+            f.write("{not json")
+        assert read_export_config(temp_dir) is None
+
+        for version in (None, EXPORT_FORMAT_VERSION - 1, EXPORT_FORMAT_VERSION + 1):
+            with open(path, "w") as f:
+                json.dump({"format": version, "pooling_mode": "mean"}, f)
+            assert read_export_config(temp_dir) is None, f"accepted format {version}"
+
+        with open(path, "w") as f:
+            json.dump({"format": EXPORT_FORMAT_VERSION, "pooling_mode": "mean"}, f)
+        assert read_export_config(temp_dir)["pooling_mode"] == "mean"
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Missing, malformed and other-version exports are rejected")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("ONNX POOLING TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_pooling_modes()
+        test_export_config_versions()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Test script for the query embedding cache.
+Checks that repeating a query (up to whitespace) does not run the encoder
+again, that entries are per model, and that the size cap and invalidation
+on an embedding backend change hold. Uses a counting fake encoder, so no
+model is downloaded.
+
+Usage:
+    python -m backend.tests.test_query_embedding_cache
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import backend.embed_utils as embed_utils
+from backend.embed_utils import (
+    EMBEDDING_MODELS, configure_embedding_backend, get_embedding, get_query_embedding_cache_stats,
+)
+
+
+class CountingEncoder:
+    """Stands in for a SentenceTransformer and counts the texts it encodes."""
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.encoded = []
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.encoded.extend(sentences)
+        rng = np.random.default_rng(len(self.encoded))
+        return rng.standard_normal((len(sentences), self.dimension)).astype(np.float32)
+
+
+def install_encoder(model_id, backend="torch"):
+    encoder = CountingEncoder(EMBEDDING_MODELS[model_id]["dimension"])
+    embed_utils._model_cache.get((model_id, backend), lambda: encoder)
+    return encoder
+
+
+def test_repeated_queries_skip_the_encoder():
+    """Repeated queries hit the cache; other models and a backend change miss it."""
+    embed_utils.configure_embedding_cache(None)
+    embed_utils._model_cache.clear()
+    embed_utils.clear_query_embedding_cache()
+    bge = install_encoder("bge-base")
+    minilm = install_encoder("minilm-l6")
+
+    first = get_embedding("What is  retrieval augmented generation?", model_id="bge-base")
+    again = get_embedding("What is retrieval augmented generation? ", model_id="bge-base")
+    other = get_embedding("What is retrieval augmented generation?", model_id="minilm-l6")
+    assert len(bge.encoded) == 1 and len(minilm.encoded) == 1
+    assert np.array_equal(first, again) and other.shape == (EMBEDDING_MODELS["minilm-l6"]["dimension"],)
+    assert not first.flags.writeable
+
+    stats = get_query_embedding_cache_stats()
+    assert (stats["hits"], stats["entries"]) == (1, 2)
+
+    onnx = install_encoder("bge-base", "onnx")
+    try:
+        configure_embedding_backend("onnx")
+        get_embedding("What is retrieval augmented generation?", model_id="bge-base")
+        assert len(onnx.encoded) == 1
+        assert get_query_embedding_cache_stats()["entries"] == 1
+    finally:
+        configure_embedding_backend("torch")
+    print("✓ Repeated queries skip the encoder, per model and backend")
+
+
+def test_size_cap():
+    """The least recently used queries are dropped beyond max_entries."""
+    embed_utils._model_cache.clear()
+    embed_utils.clear_query_embedding_cache()
+    encoder = install_encoder("bge-base")
+    original = embed_utils._query_cache.max_entries
+    embed_utils._query_cache.max_entries = 2
+    try:
+        for query in ("a", "b", "a", "c", "a", "b"):
+            get_embedding(query, model_id="bge-base")
+        # "b" was dropped when "c" came in, so it is encoded twice
+        assert encoder.encoded == ["a", "b", "c", "b"]
+        assert get_query_embedding_cache_stats()["entries"] == 2
+    finally:
+        embed_utils._query_cache.max_entries = original
+    print("✓ Query cache stays within its size cap")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("QUERY EMBEDDING CACHE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_repeated_queries_skip_the_encoder()
+        test_size_cap()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
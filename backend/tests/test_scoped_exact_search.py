@@ -0,0 +1,115 @@
+"""
+Test script for exact dense search within small item scopes.
+Checks that item-filtered queries against Chroma return the brute-force
+cosine top-k of the selected items, that their embeddings are cached per
+item and dropped when the item changes, and that large scopes still go to
+the HNSW index.
+
+Usage:
+    python -m backend.tests.test_scoped_exact_search
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_db import ChromaClient
+
+DIMENSION = 16
+CHUNKS_PER_ITEM = 20
+
+
+def add_items(client, item_ids, rng):
+    vectors = {}
+    for item_id in item_ids:
+        ids = [f"{item_id}:{i}" for i in range(CHUNKS_PER_ITEM)]
+        matrix = rng.standard_normal((CHUNKS_PER_ITEM, DIMENSION)).astype(np.float32)
+        client.add_chunks(
+            ids,
+            [f"chunk {i} of {item_id}" for i in range(CHUNKS_PER_ITEM)],
+            [{"item_id": item_id, "chunk_idx": i} for i in range(CHUNKS_PER_ITEM)],
+            matrix.tolist(),
+        )
+        vectors.update(zip(ids, matrix))
+    return vectors
+
+
+def exact_ids(vectors, query, k, item_ids):
+    ids = [d for d in vectors if d.split(":")[0] in item_ids]
+    scores = [vectors[d] @ query / np.linalg.norm(vectors[d]) for d in ids]
+    return [ids[i] for i in np.argsort(scores)[::-1][:k]]
+
+
+def test_scoped_queries_are_exact_and_cached():
+    """Small item scopes are answered by brute force from per-item cached embeddings."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(0)
+        client = ChromaClient(temp_dir, embedding_model_id="test")
+        vectors = add_items(client, [str(i) for i in range(30)], rng)
+        query = rng.standard_normal(DIMENSION).astype(np.float32)
+
+        scope = {"item_id": {"$in": ["4", "11", "not-indexed"]}}
+        result = client.query_vectors(query, 25, scope)
+        assert result["ids"][0] == exact_ids(vectors, query, 25, {"4", "11"})
+        assert all(m["item_id"] in ("4", "11") for m in result["metadatas"][0])
+        item_id, chunk_idx = result["ids"][0][0].split(":")
+        assert result["documents"][0][0] == f"chunk {chunk_idx} of {item_id}"
+        assert result["distances"][0] == sorted(result["distances"][0])
+        assert len(client.item_embeddings) == 2
+
+        # All of a small scope is returned when k exceeds it
+        result = client.query_vectors(query, 50, {"item_id": "4"})
+        assert len(result["ids"][0]) == CHUNKS_PER_ITEM
+
+        # Re-indexing an item drops its cached embeddings
+        client.delete_item("4")
+        assert client.item_embeddings.get("4") is None
+        vectors = {d: v for d, v in vectors.items() if not d.startswith("4:")}
+        vectors.update(add_items(client, ["4"], rng))
+        result = client.query_vectors(query, 10, scope)
+        assert result["ids"][0] == exact_ids(vectors, query, 10, {"4", "11"})
+
+        # Scopes above the limit (and other filters) use the HNSW index
+        client.scoped_exact_max_chunks = CHUNKS_PER_ITEM
+        assert client._exact_scope(scope) is None
+        assert client._exact_scope({"item_id": "4"}) == ["4"]
+        assert client._exact_scope({"item_id": "4", "page": 1}) is None
+        result = client.query_vectors(query, 5, scope)
+        assert all(m["item_id"] in ("4", "11") for m in result["metadatas"][0])
+        print("✓ Item-scoped queries are exact and cached per item")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("SCOPED EXACT SEARCH TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_scoped_queries_are_exact_and_cached()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Test script for the /settings endpoint while an indexing job runs.
+Checks that changing the embedding backend, embedding model or vector store
+during indexing is rejected with 409 and leaves the running configuration
+and saved settings untouched, that re-posting unchanged values is accepted,
+and that the embedding backend switch goes through once indexing is done.
+Uses a temporary home directory for profiles; no model is loaded.
+
+Usage:
+    python -m backend.tests.test_settings_api
+"""
+
+import os
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+
+def test_indexing_settings_rejected_while_indexing():
+    """Settings the index depends on cannot change mid-job; others can."""
+    home = tempfile.mkdtemp()
+    original_home = os.environ.get("HOME")
+    os.environ["HOME"] = home
+    try:
+        from fastapi.testclient import TestClient
+        import backend.embed_utils as embed_utils
+        import backend.main as main
+
+        client = TestClient(main.app)  # not entered: no startup warm-up
+        chatbot = main.chatbot
+        chatbot.start_warm_up = lambda: None
+        saved = main.load_settings()
+        assert chatbot.embedding_backend == "torch"
+
+        chatbot.is_indexing = True
+        try:
+            for change in ({"embeddingBackend": "onnx"}, {"embeddingModel": "minilm-l6"},
+                           {"vectorBackend": "flat"}, {"flatVectorDtype": "float16"}):
+                response = client.post("/settings", json=change)
+                assert response.status_code == 409, (change, response.status_code)
+                assert "indexing" in response.json()["error"]
+            assert chatbot.embedding_backend == "torch" and embed_utils._embedding_backend == "torch"
+            assert main.load_settings() == saved
+
+            # The UI posts the whole settings object: unchanged values are accepted
+            response = client.post("/settings", json={**saved, "embeddingBatchSize": 16})
+            assert response.status_code == 200, response.json()
+            assert chatbot.embedding_batch_size == 16
+        finally:
+            chatbot.is_indexing = False
+
+        response = client.post("/settings", json={"embeddingBackend": "onnx"})
+        assert response.status_code == 200, response.json()
+        assert chatbot.embedding_backend == "onnx" and embed_utils._embedding_backend == "onnx"
+        embed_utils.configure_embedding_backend("torch")
+    finally:
+        if original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = original_home
+        shutil.rmtree(home)
+    print("✓ Embedding backend, model and vector store changes rejected with 409 while indexing")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("SETTINGS API TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_indexing_settings_rejected_while_indexing()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
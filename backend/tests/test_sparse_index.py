@@ -0,0 +1,200 @@
+"""
+Test script for the BM25 sparse index.
+Checks that scores and rankings match rank_bm25's BM25Okapi, including after
+incremental adds, removals, compaction and reloading from disk, and that
+the on-disk base is memory-mapped rather than unpickled.
+
+Usage:
+    python -m backend.tests.test_sparse_index
+"""
+
+import sys
+import random
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.sparse_index import SparseIndex
+
+QUERIES = [
+    "w1 w2",
+    "w5 w300 w2999",
+    "w0",              # in almost every document: negative IDF, floored to epsilon * average IDF
+    "w10 w10 w77",     # repeated query terms count once per occurrence
+    "W42 w43",         # case-insensitive
+    "missing terms only",
+]
+
+
+def synthetic_corpus(n_docs, vocab_size=3000, seed=1):
+    """Zipf-like documents with ids "<item>:<chunk>", ten chunks per item."""
+    rnd = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1 / (i + 1) for i in range(vocab_size)]
+    docs = [" ".join(rnd.choices(vocab, weights=weights, k=rnd.randint(20, 200))) for _ in range(n_docs)]
+    ids = [f"{i // 10}:{i % 10}" for i in range(n_docs)]
+    return ids, docs
+
+
+def item_of(doc_id):
+    return doc_id.split(":")[0]
+
+
+def assert_matches_rank_bm25(index, ids, docs, k=10):
+    """Compare index.search() with BM25Okapi built over the same documents."""
+    reference = BM25Okapi([doc.lower().split() for doc in docs])
+    for query in QUERIES:
+        scores = reference.get_scores(query.lower().split())
+        order = np.argsort(-scores, kind="stable")[:k]
+        expected = [(ids[i], scores[i]) for i in order if scores[i] > 0]
+        got = index.search(query, k=k)
+
+        assert len(got) == len(expected), f"{query!r}: {len(got)} hits, expected {len(expected)}"
+        assert np.allclose([s for _, s in got], [s for _, s in expected], rtol=1e-6), \
+            f"{query!r}: scores differ from rank_bm25"
+        # Ids must agree wherever the reference ranking is not a tie
+        for (got_id, _), (exp_id, exp_score) in zip(got, expected):
+            if np.sum(np.isclose(scores, exp_score, rtol=1e-9)) == 1:
+                assert got_id == exp_id, f"{query!r}: got {got_id}, expected {exp_id}"
+
+
+def test_parity_with_rank_bm25():
+    """Scores match BM25Okapi for documents held in base and delta postings."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        ids, docs = synthetic_corpus(3000)
+        index = SparseIndex(temp_dir)
+        index.add(ids[:2000], docs[:2000], [item_of(i) for i in ids[:2000]])
+        index.save(compact=True)
+        # The rest stays in the delta postings
+        index.add(ids[2000:], docs[2000:], [item_of(i) for i in ids[2000:]])
+
+        assert len(index) == len(ids)
+        assert_matches_rank_bm25(index, ids, docs)
+        print("✓ Matches rank_bm25 across base and delta postings")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_parity_after_removal_and_reload():
+    """Removed items stop contributing to scores and statistics, before and after reload."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        ids, docs = synthetic_corpus(3000)
+        index = SparseIndex(temp_dir)
+        index.add(ids, docs, [item_of(i) for i in ids])
+        index.save(compact=True)
+
+        removed = {"5", "17", "250"}
+        index.remove_items(removed)
+        # Re-adding an id replaces the previous document
+        index.add([ids[0]], ["w1 w2 w2 w3"], [item_of(ids[0])])
+        docs = ["w1 w2 w2 w3"] + docs[1:]
+
+        keep = [i for i, doc_id in enumerate(ids) if item_of(doc_id) not in removed]
+        kept_ids = [ids[i] for i in keep]
+        kept_docs = [docs[i] for i in keep]
+
+        assert_matches_rank_bm25(index, kept_ids, kept_docs)
+        index.save()
+        assert_matches_rank_bm25(SparseIndex(temp_dir), kept_ids, kept_docs)
+
+        index.save(compact=True)
+        reloaded = SparseIndex(temp_dir)
+        assert len(reloaded) == len(kept_ids)
+        assert_matches_rank_bm25(reloaded, kept_ids, kept_docs)
+        print("✓ Matches rank_bm25 after removals, compaction and reload")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_scoped_search_matches_filtered_search():
+    """Scoping to items returns the unscoped ranking restricted to those items, with equal scores."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        ids, docs = synthetic_corpus(3000)
+        index = SparseIndex(temp_dir)
+        index.add(ids[:2500], docs[:2500], [item_of(i) for i in ids[:2500]])
+        index.save(compact=True)
+        index.add(ids[2500:], docs[2500:], [item_of(i) for i in ids[2500:]])
+        # A removed chunk splits its item's row range
+        index.remove(["12:4"])
+
+        scope = {"3", "12", "260", "299", "not-indexed"}
+        for query in QUERIES:
+            full = index.search(query, k=len(ids))
+            expected = [(doc_id, score) for doc_id, score in full if item_of(doc_id) in scope][:10]
+            got = index.search(query, k=10, item_ids=scope)
+            assert [d for d, _ in got] == [d for d, _ in expected], f"{query!r}: scoped ranking differs"
+            assert np.allclose([s for _, s in got], [s for _, s in expected]), f"{query!r}: scoped scores differ"
+            assert all(item_of(d) in scope for d, _ in got)
+
+        assert index.search("w1", k=10, item_ids=[]) == []
+        assert index.search("w1", k=10, item_ids=["not-indexed"]) == []
+        print("✓ Scoped search only returns in-scope chunks, with unscoped scores")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_reload_maps_base_from_disk():
+    """A reopened index memory-maps its base segment; a pickled snapshot is discarded, not loaded."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        ids, docs = synthetic_corpus(500)
+        index = SparseIndex(temp_dir)
+        index.add(ids, docs, [item_of(i) for i in ids])
+        index.save(compact=True)
+        index.close()
+
+        reloaded = SparseIndex(temp_dir)
+        assert len(reloaded) == len(ids)
+        assert isinstance(reloaded._base.rows, np.memmap)
+        assert_matches_rank_bm25(reloaded, ids, docs)
+        reloaded.close()
+
+        # Index files from earlier versions are ignored so the caller rebuilds
+        shutil.rmtree(temp_dir)
+        Path(temp_dir).mkdir()
+        (Path(temp_dir) / "snapshot.pkl").write_bytes(b"not a pickle")
+        legacy = SparseIndex(temp_dir)
+        assert len(legacy) == 0
+        assert not (Path(temp_dir) / "snapshot.pkl").exists()
+        print("✓ Reload maps the base from disk and ignores pickled snapshots")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("SPARSE INDEX TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_parity_with_rank_bm25()
+        test_parity_after_removal_and_reload()
+        test_scoped_search_matches_filtered_search()
+        test_reload_maps_base_from_disk()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
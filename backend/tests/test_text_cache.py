@@ -0,0 +1,199 @@
+"""
+Test script for the extracted PDF text cache.
+Checks cache hits and misses, that a file's content hash is reused while its
+size and mtime are unchanged and recomputed once they change, that the cache
+stays within its size budget by evicting the least recently used entries, and
+that the indexing pipeline hands cached PDFs to the consumer (counting them in
+cache_hits) instead of extracting them again.
+
+Usage:
+    python -m backend.tests.test_text_cache
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.index_pipeline import IndexPipeline
+from backend.text_cache import ExtractionCache
+
+
+class SyntheticItem:
+    """Stand-in for ZoteroItem with just the attributes the pipeline uses."""
+
+    def __init__(self, filepath, item_id):
+        self.filepath = filepath
+        self.metadata = {"item_id": str(item_id)}
+
+
+def logged_extract(filepath):
+    """Fake extraction that logs each call next to the PDF (it may run in a worker process)."""
+    with open(os.path.join(os.path.dirname(filepath), "extractions.log"), "a") as log:
+        log.write(f"{os.path.basename(filepath)}\n")
+    return [{"page_num": 1, "text": f"text of {os.path.basename(filepath)}"}]
+
+
+def random_pages(seed, chars=4000):
+    """Pages of random hex, which zlib cannot shrink, so entry sizes are predictable."""
+    text = np.random.default_rng(seed).bytes(chars // 2).hex()
+    return [{"page_num": 1, "text": text}]
+
+
+def test_get_put_hit_and_miss():
+    """Stored pages come back for their key; unknown keys miss."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        cache = ExtractionCache(temp_dir)
+        pages = [{"page_num": 1, "text": "Première page"}, {"page_num": 2, "text": "Second page"}]
+        assert cache.get("ab" * 32) is None
+
+        cache.put("ab" * 32, pages)
+        assert cache.get("ab" * 32) == pages
+        assert cache.get("cd" * 32) is None
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["bytes"] > 0
+        cache.close()
+
+        # Entries and their total size persist across restarts
+        reopened = ExtractionCache(temp_dir)
+        assert reopened.get("ab" * 32) == pages and reopened.stats() == stats
+        reopened.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Cache hits return stored pages, unknown keys miss")
+
+
+def test_key_reused_until_file_changes():
+    """The stored hash is reused while (path, size, mtime) match and recomputed when they change."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        cache = ExtractionCache(os.path.join(temp_dir, "cache"))
+        pdf_path = os.path.join(temp_dir, "paper.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF version one")
+        key = cache.key_for(pdf_path)
+        assert key == hashlib.sha256(b"%PDF version one").hexdigest()
+
+        # Same size and mtime: the stored hash is returned without reading the file
+        stat = os.stat(pdf_path)
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF version two")
+        os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert cache.key_for(pdf_path) == key
+
+        # A new mtime means the file is hashed again
+        os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert cache.key_for(pdf_path) == hashlib.sha256(b"%PDF version two").hexdigest()
+        cache.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Content hash reused while size and mtime are unchanged")
+
+
+def test_budget_evicts_least_recently_used():
+    """Putting past max_bytes evicts least recently used entries down to the eviction target."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        cache = ExtractionCache(temp_dir)
+        cache.put("probe", random_pages(0))
+        entry_bytes = cache.stats()["bytes"]
+        cache.close()
+        shutil.rmtree(temp_dir)
+
+        # Room for three entries and a half
+        cache = ExtractionCache(temp_dir, max_bytes=int(entry_bytes * 3.5))
+        for n, key in enumerate(("a", "b", "c")):
+            cache.put(key * 64, random_pages(n + 1))
+            time.sleep(0.01)
+        # Reading "a" makes "b" the least recently used
+        assert cache.get("a" * 64) is not None
+        time.sleep(0.01)
+        cache.put("d" * 64, random_pages(4))
+
+        stats = cache.stats()
+        assert stats["entries"] == 3 and stats["bytes"] <= stats["max_bytes"], stats
+        assert cache.get("b" * 64) is None
+        assert not os.path.exists(cache._blob_path("b" * 64))
+        assert all(cache.get(key * 64) is not None for key in ("a", "c", "d"))
+        cache.close()
+
+        reopened = ExtractionCache(temp_dir, max_bytes=int(entry_bytes * 3.5))
+        assert reopened.stats()["bytes"] == stats["bytes"]
+        reopened.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ Cache stays within its budget, evicting least recently used entries")
+
+
+def test_pipeline_skips_extraction_of_cached_pdfs():
+    """A second run over the same PDFs reads the cache instead of submitting them for extraction."""
+    for max_workers in (0, 1):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache = ExtractionCache(os.path.join(temp_dir, "cache"))
+            log_path = os.path.join(temp_dir, "extractions.log")
+            items = []
+            for i in range(4):
+                path = os.path.join(temp_dir, f"{i}.pdf")
+                with open(path, "wb") as f:
+                    f.write(f"%PDF {i}".encode())
+                items.append(SyntheticItem(path, i))
+
+            first = IndexPipeline(extract_fn=logged_extract, max_workers=max_workers, cache=cache)
+            extracted = {item.metadata["item_id"]: pages for item, pages in first.iter_extracted(items)}
+            assert first.cache_hits == 0 and cache.stats()["entries"] == 4
+            with open(log_path) as log:
+                assert len(log.readlines()) == 4
+
+            # One PDF is replaced; only that one is extracted again
+            with open(items[2].filepath, "wb") as f:
+                f.write(b"%PDF replaced")
+            second = IndexPipeline(extract_fn=logged_extract, max_workers=max_workers, cache=cache)
+            again = {item.metadata["item_id"]: pages for item, pages in second.iter_extracted(items)}
+            assert second.cache_hits == 3, f"max_workers={max_workers}: {second.cache_hits} cache hits"
+            with open(log_path) as log:
+                assert [line.strip() for line in log][4:] == ["2.pdf"], f"max_workers={max_workers}"
+            assert again == extracted
+            cache.close()
+        finally:
+            shutil.rmtree(temp_dir)
+    print("✓ Pipeline counts cache hits and does not extract cached PDFs again")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("EXTRACTION CACHE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_get_put_hit_and_miss()
+        test_key_reused_until_file_changes()
+        test_budget_evicts_least_recently_used()
+        test_pipeline_skips_extraction_of_cached_pdfs()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
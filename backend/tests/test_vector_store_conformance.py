@@ -0,0 +1,158 @@
+"""
+Conformance tests run against every registered vector store backend.
+Checks that each backend opened through the registry implements the
+VectorStore interface with the same behaviour: adds skip existing ids,
+get_chunks keeps the requested order, queries return the cosine ranking
+(exact for item scopes), iteration covers every chunk once, deletes remove
+an item's chunks, and stores of one embedding model show up in
+list_vector_collections.
+
+Usage:
+    python -m backend.tests.test_vector_store_conformance
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.vector_store import (
+    VECTOR_BACKENDS,
+    VectorStore,
+    list_vector_collections,
+    open_vector_store,
+)
+
+DIMENSION = 16
+CHUNKS_PER_ITEM = 10
+N_ITEMS = 12
+
+# name -> (registered backend, profile settings); every registered backend plus option variants
+CONFIGURATIONS = {name: (name, {}) for name in VECTOR_BACKENDS}
+CONFIGURATIONS["flat16"] = ("flat", {"flatVectorDtype": "float16"})
+
+
+def chunks(rng):
+    n = N_ITEMS * CHUNKS_PER_ITEM
+    ids = [f"{i // CHUNKS_PER_ITEM}:{i % CHUNKS_PER_ITEM}" for i in range(n)]
+    docs = [f"chunk {i % CHUNKS_PER_ITEM} of item {i // CHUNKS_PER_ITEM}" for i in range(n)]
+    metas = [{"item_id": str(i // CHUNKS_PER_ITEM), "chunk_idx": i % CHUNKS_PER_ITEM} for i in range(n)]
+    vectors = rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    return ids, docs, metas, vectors
+
+
+def cosine_ranking(ids, vectors, query, keep=lambda doc_id: True):
+    scores = vectors @ query / np.linalg.norm(vectors, axis=1) / np.linalg.norm(query)
+    return [ids[i] for i in np.argsort(-scores) if keep(ids[i])]
+
+
+def check_backend(name, backend, options):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(0)
+        store = open_vector_store(backend, temp_dir, "conformance", options)
+        assert isinstance(store, VectorStore), name
+        assert store.max_write_batch_size() > 0
+
+        ids, docs, metas, vectors = chunks(rng)
+        version = store.index_version()
+        store.add_chunks(ids, docs, metas, vectors.tolist())
+        assert store.index_version() != version, name
+        # Chunks that already exist are skipped
+        store.add_chunks(ids[:3], ["changed"] * 3, metas[:3], (vectors[:3] * -1).tolist())
+        assert store.get_document_count() == len(ids), name
+
+        fetched = store.get_chunks(["3:4", "missing", "0:1"], include=["documents", "metadatas", "embeddings"])
+        assert fetched["ids"] == ["3:4", "0:1"], name
+        assert fetched["documents"] == [docs[34], docs[1]], name
+        assert fetched["metadatas"] == [metas[34], metas[1]], name
+        assert np.allclose(fetched["embeddings"][1] / np.linalg.norm(fetched["embeddings"][1]),
+                           vectors[1] / np.linalg.norm(vectors[1]), atol=1e-3), name
+
+        query = rng.standard_normal(DIMENSION).astype(np.float32)
+        result = store.query_vectors(query, 5)
+        expected = cosine_ranking(ids, vectors, query)
+        # HNSW is approximate: require most of the exact top 5 and ascending distances
+        assert len(set(result["ids"][0]) & set(expected[:5])) >= 4, name
+        assert result["distances"][0] == sorted(result["distances"][0]), name
+        assert result["documents"][0][0] == docs[ids.index(result["ids"][0][0])], name
+
+        scope = {"item_id": {"$in": ["2", "7"]}}
+        result = store.query_vectors(query, 15, scope)
+        assert result["ids"][0] == cosine_ranking(ids, vectors, query, lambda d: d.split(":")[0] in ("2", "7"))[:15], name
+        assert all(m["item_id"] in ("2", "7") for m in result["metadatas"][0]), name
+
+        seen = [doc_id for page in store.iter_chunks(["metadatas"], page_size=25) for doc_id in page["ids"]]
+        assert sorted(seen) == sorted(ids), name
+
+        version = store.index_version()
+        assert store.delete_item("2") == CHUNKS_PER_ITEM, name
+        assert store.index_version() != version, name
+        assert store.delete_item("2") == 0, name
+        assert store.get_document_count() == len(ids) - CHUNKS_PER_ITEM, name
+        result = store.query_vectors(query, 15, scope)
+        assert {m["item_id"] for m in result["metadatas"][0]} == {"7"}, name
+
+        collections = list_vector_collections(backend, temp_dir)
+        assert [(c["embedding_model_id"], c["item_count"]) for c in collections] == \
+            [("conformance", len(ids) - CHUNKS_PER_ITEM)], name
+
+        # Closing releases the store; everything is there when it is opened again
+        store.close()
+        reopened = open_vector_store(backend, temp_dir, "conformance", options)
+        assert reopened.get_document_count() == len(ids) - CHUNKS_PER_ITEM, name
+        assert reopened.query_vectors(query, 15, scope)["ids"] == result["ids"], name
+        reopened.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_backends_conform():
+    """Every registered backend (and option variant) behaves the same through the VectorStore interface."""
+    for name, (backend, options) in CONFIGURATIONS.items():
+        check_backend(name, backend, options)
+        print(f"✓ {name} conforms to VectorStore")
+
+
+def test_unknown_backend_rejected():
+    """Selecting a backend that is not registered fails with the list of available ones."""
+    try:
+        open_vector_store("missing", tempfile.gettempdir(), "conformance")
+    except ValueError as e:
+        assert "chroma" in str(e)
+    else:
+        raise AssertionError("expected ValueError for an unknown backend")
+    print("✓ Unknown backend rejected")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 70)
+    print("VECTOR STORE CONFORMANCE TEST SUITE")
+    print("=" * 70)
+
+    try:
+        test_backends_conform()
+        test_unknown_backend_rejected()
+
+        print("\n" + "=" * 70)
+        print("✓ ALL TESTS PASSED")
+        print("=" * 70)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# text_cache.py
+"""
+Persistent cache of extracted PDF text.
+
+Stores the per-page output of PDF.extract_text_with_pages() on disk, keyed by
+the SHA-256 of the PDF's content, so re-indexing (e.g. after switching the
+embedding model or chunking parameters) does not re-parse unchanged PDFs.
+
+Layout under the cache directory:
+- index.sqlite: entry sizes and last-access times (for LRU eviction), plus a
+  (path, size, mtime) -> content hash table so unchanged files are not re-hashed
+- <hh>/<hash>.json.z: zlib-compressed JSON list of {'page_num', 'text'} dicts
+
+The cache is size-bounded: once the compressed entries exceed the budget, the
+least recently used ones are evicted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Default size budget for compressed cache entries
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+# Evict down to this fraction of the budget so eviction is not run on every put
+_EVICT_TARGET = 0.9
+
+
+class ExtractionCache:
+    """
+    LRU on-disk cache of PDF page text keyed by file content hash.
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.cache_dir, "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, key TEXT NOT NULL)"
+        )
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def key_for(self, filepath: str) -> str:
+        """Content hash of a file, reusing the stored hash while size and mtime are unchanged."""
+        stat = os.stat(filepath)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, key FROM files WHERE path = ?", (filepath,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        key = digest.hexdigest()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, key) VALUES (?, ?, ?, ?)",
+                (filepath, stat.st_size, stat.st_mtime_ns, key),
+            )
+        return key
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached pages_data for a content hash, or None on a miss."""
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                pages_data = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        except (OSError, ValueError, zlib.error):
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return pages_data
+
+    def put(self, key: str, pages_data: List[Dict[str, Any]]) -> None:
+        """Store pages_data for a content hash, evicting old entries if over budget."""
+        blob = zlib.compress(json.dumps(pages_data, ensure_ascii=False).encode("utf-8"), 6)
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, len(blob), time.time()),
+            )
+            self._total_bytes += len(blob) - (row[0] if row else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def get_for_file(self, filepath: str) -> Optional[List[Dict[str, Any]]]:
+        """Convenience lookup by file path."""
+        try:
+            return self.get(self.key_for(filepath))
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and size of the cache."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"entries": count, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.z")
+
+    def _evict_locked(self) -> None:
+        """Delete least recently used entries until under the target size. Caller holds the lock."""
+        target = self.max_bytes * _EVICT_TARGET
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+            self._total_bytes -= size
+            evicted.append((key,))
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
@@ -1,11 +1,30 @@
 #vector_db.py
-import chromadb
-from chromadb.config import Settings
 import os
-from typing import List, Dict, Any, Iterable, Optional
-from rank_bm25 import BM25Okapi
-import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import numpy as np
+from backend.sparse_index import SparseIndex
+from backend.index_manifest import IndexManifest, count_chunks, item_fields
+
+# Chunks per Chroma write when buffering across items (further capped by Chroma's max batch size)
+DEFAULT_WRITE_BATCH_SIZE = 2048
+
+# Threads shared by all clients for running the dense and sparse legs of hybrid queries
+RETRIEVAL_WORKERS = 4
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+# Rank offset of reciprocal rank fusion (60 is the usual choice; larger flattens the rank weighting)
+RRF_K = 60
+
+# Item-scoped dense queries covering at most this many chunks are answered by
+# exact search over the items' embeddings instead of a filtered HNSW query
+SCOPED_EXACT_MAX_CHUNKS = 20000
+# Memory budget of the per-item embedding cache used by scoped exact search
+ITEM_EMBEDDING_CACHE_BYTES = 256 * 1024 * 1024
 
 class ChromaClient:
     """
@@ -17,48 +36,144 @@ class ChromaClient:
     from embed_utils.py to ensure consistent dimensional vectors.
     
     Each embedding model gets its own collection to prevent dimension mismatch errors.
+    
+    Implements the VectorStore interface and is registered as the "chroma"
+    backend (see backend.vector_store).
     """
 
+    # Largest item scope (in chunks) answered by exact search; 0 disables it
+    scoped_exact_max_chunks = SCOPED_EXACT_MAX_CHUNKS
+
     def __init__(self, db_path: str, collection_name: str = "zotero_lib", embedding_model_id: str = "bge-base"):
         self.db_path = db_path
         self.embedding_model_id = embedding_model_id
         # Include embedding model in collection name to avoid dimension conflicts
         self.collection_name = f"{collection_name}_{embedding_model_id}"
         os.makedirs(self.db_path, exist_ok=True)
+        self.collection = self._open_collection()
+        
+        # BM25 index for sparse retrieval, updated as chunks are added/deleted (loaded lazily)
+        # Each embedding model has its own BM25 index
+        self.sparse_index = SparseIndex(os.path.join(self.db_path, f"sparse_index_{embedding_model_id}"))
+        self._sparse_checked = False
+        self._sparse_check_lock = threading.Lock()
+        # Pickled rank_bm25 index written by earlier versions; removed once the sparse index is built
+        self.bm25_path = os.path.join(self.db_path, f"bm25_index_{embedding_model_id}.pkl")
+        
+        # Item-level manifest (chunk counts, fingerprints) for stats and incremental diffs
+        self.manifest = IndexManifest(self.db_path, embedding_model_id)
+        self._manifest_checked = False
+        self._manifest_check_lock = threading.Lock()
+        
+        # Normalized chunk embeddings of recently queried items, for scoped exact search
+        self.item_embeddings = ItemEmbeddingCache()
+
+    @classmethod
+    def open(cls, base_path: str, embedding_model_id: str, options: Optional[Dict[str, Any]] = None) -> "ChromaClient":
+        """Open an embedding model's store under a profile's vector store directory.
+        
+        Args:
+            base_path: The profile's chromaPath
+            embedding_model_id: Embedding model whose collection to open
+            options: Profile settings with backend-specific options (none for Chroma)
+        """
+        return cls(base_path, embedding_model_id=embedding_model_id)
+
+    @classmethod
+    def list_collections(cls, base_path: str) -> List[Dict[str, Any]]:
+        """Collections of every embedding model stored under base_path.
+        
+        Returns:
+            List of dicts with 'collection_name', 'embedding_model_id' and 'item_count'
+        """
+        import chromadb
+        from chromadb.config import Settings
+        
+        client = chromadb.PersistentClient(path=base_path, settings=Settings())
+        collections = []
+        for col in client.list_collections():
+            # Collection names follow pattern: zotero_lib_{embedding_model_id}
+            if col.name.startswith("zotero_lib_"):
+                collections.append({
+                    "collection_name": col.name,
+                    "embedding_model_id": col.name.replace("zotero_lib_", ""),
+                    "item_count": col.count(),
+                })
+        return collections
+
+    def _open_collection(self):
+        """Open the collection holding chunk vectors, documents and metadata.
+        
+        Subclasses storing vectors elsewhere return an object with the same
+        add/get/query/delete/count methods (see FlatVectorClient).
+        """
+        # Imported here: chromadb takes most of a second to import, and FlatVectorClient does not need it
+        import chromadb
+        from chromadb.config import Settings
+        
         self.chroma_client = chromadb.PersistentClient(path=self.db_path, settings=Settings())
         
         # Create collection WITHOUT an embedding function (we provide embeddings manually)
         # This prevents ChromaDB from using its default all-MiniLM-L6-v2 (384 dims)
-        self.collection = self.chroma_client.get_or_create_collection(
+        return self.chroma_client.get_or_create_collection(
             name=self.collection_name,
             metadata={
                 "hnsw:space": "cosine",  # Use cosine similarity for retrieval
-                "embedding_model": embedding_model_id  # Track which model created this collection
+                "embedding_model": self.embedding_model_id  # Track which model created this collection
             }
         )
-        
-        # BM25 index for sparse retrieval (loaded lazily)
-        # Each embedding model has its own BM25 index
-        self.bm25_index = None
-        self.bm25_corpus = None
-        self.bm25_ids = None
-        self.bm25_path = os.path.join(self.db_path, f"bm25_index_{embedding_model_id}.pkl")
 
     def add_chunks(self,
         ids: List[str],
         documents: List[str],
         metadatas: Optional[List[Dict[str, Any]]] = None,
         embeddings: Optional[List[List[float]]] = None,
+        item_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
     ) -> None:
         """
-        Bulk-adds document chunks and their vectors to the Chroma collection.
+        Bulk-adds document chunks and their vectors to the Chroma collection,
+        the sparse (BM25) index and the item manifest.
+        
+        Chunk metadata only needs item_id, chunk_idx and page; per-item fields
+        (bibliographic fields from ITEM_FIELDS plus 'fingerprint') are passed
+        once per item in item_metadata and stored in the manifest.
         """
+        self._ensure_manifest()
         self.collection.add(
             ids=ids,
             documents=documents,
             metadatas=metadatas,
             embeddings=embeddings,
         )
+        chunks = count_chunks(metadatas or [])
+        for item_id, fields in (item_metadata or {}).items():
+            if item_id in chunks and fields.get("fingerprint"):
+                chunks[item_id] = (chunks[item_id][0], fields["fingerprint"])
+        self.manifest.record_chunks(chunks, item_metadata)
+        for item_id in chunks:
+            self.item_embeddings.discard(item_id)
+        item_ids = [(m or {}).get("item_id", "") for m in metadatas] if metadatas else [""] * len(ids)
+        self.sparse_index.add(ids, documents, item_ids)
+
+    def max_write_batch_size(self) -> int:
+        """Largest number of records Chroma accepts in a single add()."""
+        get_max = getattr(self.chroma_client, "get_max_batch_size", None)
+        return get_max() if get_max else DEFAULT_WRITE_BATCH_SIZE
+
+    def close(self) -> None:
+        """Persist the BM25 index and release the store's files (e.g. when switching stores).
+        
+        Chroma's client is shared per path by chromadb and is only dropped;
+        collections with a close() method (FlatCollection) are closed.
+        """
+        self.save_bm25_index()
+        self.sparse_index.close()
+        self.manifest.close()
+        self.item_embeddings.clear()
+        close_collection = getattr(self.collection, "close", None)
+        if close_collection is not None:
+            close_collection()
+        self.chroma_client = None
 
     def query_db(self,
         query: str,
@@ -78,60 +193,194 @@ class ChromaClient:
         # Manually embed query to ensure consistent dimensions
         query_embedding = get_embedding(query)
         
-        results = self.collection.query(
+        return self.query_vectors(query_embedding, k, where)
+    
+    def query_vectors(self, query_embedding: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Dense top-k for an embedded query: exact within small item scopes, HNSW otherwise.
+        
+        Returns:
+            Chroma query result (lists of ids, documents, metadatas and
+            cosine distances for the single query)
+        """
+        scope = self._exact_scope(where)
+        if scope is not None:
+            return self._query_scoped_exact(query_embedding, k, scope)
+        return self.collection.query(
             query_embeddings=[query_embedding.tolist()],  # Use query_embeddings, not query_texts!
             n_results=k,
             where=where,
         )
-        return results
     
-    def query_bm25(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+    def _exact_scope(self, where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """Indexed items to search exhaustively, or None to use the HNSW index.
+        
+        Only filters on item_id alone qualify, and only while the items hold
+        at most scoped_exact_max_chunks chunks in total (per the manifest).
+        HNSW with a selective filter explores most of the graph and can still
+        return fewer than k hits; brute force over a few papers is exact and
+        costs time proportional to the scope.
+        """
+        if not self.scoped_exact_max_chunks or not where or len(where) != 1:
+            return None
+        item_ids = _item_scope(where)
+        if item_ids is None:
+            return None
+        self._ensure_manifest()
+        counts = self.manifest.chunk_counts(item_ids)
+        if sum(counts.values()) > self.scoped_exact_max_chunks:
+            return None
+        return [item_id for item_id in dict.fromkeys(item_ids) if counts.get(item_id)]
+    
+    def _query_scoped_exact(self, query_embedding: np.ndarray, k: int, item_ids: List[str]) -> Dict[str, Any]:
+        """Brute-force cosine top-k over the chunks of item_ids, shaped like a Chroma query result."""
+        ids, vectors = [], []
+        for chunk_ids, matrix in self._load_item_embeddings(item_ids):
+            ids.extend(chunk_ids)
+            vectors.append(matrix)
+        if not ids:
+            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = np.concatenate(vectors) @ query if len(vectors) > 1 else vectors[0] @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top_ids = [ids[i] for i in top]
+        
+        fetched = self.get_chunks(top_ids)
+        distances = {ids[i]: float(1.0 - scores[i]) for i in top}
+        return {
+            'ids': [fetched['ids']],
+            'documents': [fetched['documents']],
+            'metadatas': [fetched['metadatas']],
+            'distances': [[distances[doc_id] for doc_id in fetched['ids']]],
+        }
+    
+    def _load_item_embeddings(self, item_ids: List[str]) -> List[tuple]:
+        """(chunk ids, normalized float32 embeddings) per item, from the cache or one batched get."""
+        found = {}
+        missing = []
+        for item_id in item_ids:
+            entry = self.item_embeddings.get(item_id)
+            if entry is None:
+                missing.append(item_id)
+            else:
+                found[item_id] = entry
+        
+        if missing:
+            version = self.item_embeddings.version
+            where = {"item_id": missing[0]} if len(missing) == 1 else {"item_id": {"$in": missing}}
+            results = self.collection.get(where=where, include=["embeddings", "metadatas"])
+            grouped = {}
+            for doc_id, embedding, metadata in zip(results['ids'], results['embeddings'], results['metadatas']):
+                chunk_ids, vectors = grouped.setdefault(str(metadata.get("item_id", "")), ([], []))
+                chunk_ids.append(doc_id)
+                vectors.append(embedding)
+            for item_id, (chunk_ids, vectors) in grouped.items():
+                matrix = np.asarray(vectors, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.where(norms == 0, 1.0, norms)
+                found[item_id] = (chunk_ids, matrix)
+                self.item_embeddings.put(item_id, chunk_ids, matrix, version)
+        
+        return [found[item_id] for item_id in item_ids if item_id in found]
+    
+    def get_chunks(self, ids: List[str], include: Iterable[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        """Chunks by id, in the order of ids (unknown ids are left out).
+        
+        Returns:
+            Dict with 'ids' and one list per included field
+            ("documents", "metadatas", "embeddings")
+        """
+        include = list(include)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {'ids': [], **{field: [] for field in include}}
+        results = self.collection.get(ids=ids, include=include)
+        position = {doc_id: i for i, doc_id in enumerate(results['ids'])}
+        order = [position[doc_id] for doc_id in ids if doc_id in position]
+        return {
+            'ids': [results['ids'][i] for i in order],
+            **{field: [results[field][i] for i in order] for field in include},
+        }
+    
+    def iter_chunks(self, include: Iterable[str] = ("documents", "metadatas"), page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Page through every chunk in the store.
+        
+        Yields:
+            Dicts like get_chunks() results, at most page_size chunks each
+        """
+        include = list(include)
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=page_size, offset=offset)
+            if not page['ids']:
+                return
+            yield page
+            offset += len(page['ids'])
+    
+    def query_bm25(
+        self,
+        query: str,
+        k: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
         """Query using BM25 sparse retrieval.
         
         Args:
             query: Search query
             k: Number of results to return
+            where: Optional metadata filter; item_id filters ($eq/$in) restrict
+                   scoring to the chunks of those items
+            timings: Optional dict receiving 'bm25_search_ms' and 'bm25_fetch_ms'
             
         Returns:
             List of dicts with 'id', 'score', 'document', and 'metadata'
         """
-        if self.bm25_index is None:
-            self._load_bm25_index()
-        
-        if self.bm25_index is None:
-            return []  # No BM25 index available
-        
-        # Tokenize query (simple whitespace tokenization)
-        query_tokens = query.lower().split()
+        start = time.perf_counter()
+        self._ensure_sparse_index()
         
-        # Get BM25 scores
-        scores = self.bm25_index.get_scores(query_tokens)
+        # Top k documents with positive BM25 scores
+        hits = self.sparse_index.search(query, k=k, item_ids=_item_scope(where))
+        searched = time.perf_counter()
         
-        # Get top k indices
-        top_indices = np.argsort(scores)[::-1][:k]
-        
-        # Retrieve documents from ChromaDB
+        # Retrieve documents and metadata of all hits from ChromaDB in one lookup
         results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only include results with positive scores
-                doc_id = self.bm25_ids[idx]
-                # Get full document and metadata from ChromaDB
-                chroma_result = self.collection.get(ids=[doc_id])
-                if chroma_result['ids']:
+        if hits:
+            chroma_result = self.collection.get(
+                ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas"]
+            )
+            # Chroma does not preserve the order of the requested ids
+            found = {
+                doc_id: (doc, meta)
+                for doc_id, doc, meta in zip(
+                    chroma_result['ids'], chroma_result['documents'], chroma_result['metadatas']
+                )
+            }
+            for doc_id, score in hits:
+                if doc_id in found:
                     results.append({
                         'id': doc_id,
-                        'score': float(scores[idx]),
-                        'document': chroma_result['documents'][0],
-                        'metadata': chroma_result['metadatas'][0]
+                        'score': float(score),
+                        'document': found[doc_id][0],
+                        'metadata': found[doc_id][1]
                     })
         
+        if timings is not None:
+            timings['bm25_search_ms'] = round((searched - start) * 1000, 2)
+            timings['bm25_fetch_ms'] = round((time.perf_counter() - searched) * 1000, 2)
         return results
     
     def query_hybrid(self, query: str, k: int = 10, where: Optional[Dict[str, Any]] = None, embedding_model_id: str = "bge-base") -> Dict[str, Any]:
         """Hybrid search combining dense (semantic) and sparse (BM25) retrieval.
         
         Best practice from Reddit thread: Retrieve top-k from both methods,
-        create a union, then re-rank using cross-encoder.
+        create a union, then re-rank using cross-encoder. The union is ordered
+        by reciprocal rank fusion, so callers can re-rank only its head.
         
         Args:
             query: Search query
@@ -140,103 +389,130 @@ class ChromaClient:
             embedding_model_id: ID of the embedding model to use (default: "bge-base")
             
         Returns:
-            Combined results dict with documents, metadatas, and distances
+            Combined results dict with ids, documents, metadatas and distances,
+            ordered by 'scores' (reciprocal rank fusion of both rankings, higher
+            is better), plus 'timings' (milliseconds per retrieval step and
+            per leg; the legs run concurrently, so total_ms is close to the
+            slower one)
         """
-        from backend.embed_utils import get_embedding
-        
-        # Embed query using the configured embedding model
-        query_embedding = get_embedding(query, model_id=embedding_model_id)
-        
-        # Get dense retrieval results
-        dense_results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()],  # Use query_embeddings, not query_texts!
-            n_results=k,
-            where=where,
-        )
+        start = time.perf_counter()
         
-        # Get sparse retrieval results
-        bm25_results = self.query_bm25(query, k=k)
+        # The legs are independent (HNSW/SQLite vs NumPy), so run them side by side
+        executor = get_retrieval_executor()
+        dense_future = executor.submit(self._query_dense, query, k, where, embedding_model_id)
+        sparse_future = executor.submit(self._query_sparse, query, k, where)
+        dense_results, dense_timings = dense_future.result()
+        bm25_results, sparse_timings = sparse_future.result()
+        timings = {**dense_timings, **sparse_timings}
         
-        # Combine results (union of document IDs)
-        seen_ids = set()
-        combined_docs = []
-        combined_metas = []
-        combined_ids = []
-        
-        # Add dense results
+        # Fuse the two rankings; each hit keeps the document and metadata from whichever leg found it
+        found = {}
+        dense_ranking = []
+        dense_distances = {}
         if dense_results['ids'] and dense_results['ids'][0]:
             for i, doc_id in enumerate(dense_results['ids'][0]):
-                if doc_id not in seen_ids:
-                    seen_ids.add(doc_id)
-                    combined_ids.append(doc_id)
-                    combined_docs.append(dense_results['documents'][0][i])
-                    combined_metas.append(dense_results['metadatas'][0][i])
-        
-        # Add BM25 results not already included
+                dense_ranking.append(doc_id)
+                dense_distances[doc_id] = dense_results['distances'][0][i]
+                found[doc_id] = (dense_results['documents'][0][i], dense_results['metadatas'][0][i])
         for result in bm25_results:
-            if result['id'] not in seen_ids:
-                seen_ids.add(result['id'])
-                combined_ids.append(result['id'])
-                combined_docs.append(result['document'])
-                combined_metas.append(result['metadata'])
+            found.setdefault(result['id'], (result['document'], result['metadata']))
+        fused = reciprocal_rank_fusion([dense_ranking, [result['id'] for result in bm25_results]])
         
-        # Format as ChromaDB-style result
+        # Format as ChromaDB-style result, best fused score first
+        combined_ids = [doc_id for doc_id, _ in fused]
         return {
             'ids': [combined_ids],
-            'documents': [combined_docs],
-            'metadatas': [combined_metas],
-            'distances': [[0.0] * len(combined_ids)]  # Placeholder, will be re-ranked
+            'documents': [[found[doc_id][0] for doc_id in combined_ids]],
+            'metadatas': [[found[doc_id][1] for doc_id in combined_ids]],
+            # Dense (cosine) distance, None for chunks only BM25 retrieved
+            'distances': [[dense_distances.get(doc_id) for doc_id in combined_ids]],
+            'scores': [[score for _, score in fused]],
+            'timings': {**timings, 'total_ms': round((time.perf_counter() - start) * 1000, 2)},
         }
     
-    def _load_bm25_index(self):
-        """Load BM25 index from disk if it exists."""
-        if os.path.exists(self.bm25_path):
+    def _query_dense(self, query: str, k: int, where: Optional[Dict[str, Any]], embedding_model_id: str):
+        """Dense leg of query_hybrid: embed the query and run the dense query.
+        
+        Returns:
+            (Chroma query result, timings with 'embed_ms', 'dense_ms' and 'dense_leg_ms')
+        """
+        from backend.embed_utils import get_embedding
+        
+        start = time.perf_counter()
+        timings = {}
+        
+        # Embed query using the configured embedding model
+        query_embedding = get_embedding(query, model_id=embedding_model_id)
+        embedded = time.perf_counter()
+        timings['embed_ms'] = round((embedded - start) * 1000, 2)
+        
+        # Get dense retrieval results (exact within small item scopes)
+        dense_results = self.query_vectors(query_embedding, k, where)
+        end = time.perf_counter()
+        timings['dense_ms'] = round((end - embedded) * 1000, 2)
+        timings['dense_leg_ms'] = round((end - start) * 1000, 2)
+        return dense_results, timings
+    
+    def _query_sparse(self, query: str, k: int, where: Optional[Dict[str, Any]]):
+        """Sparse leg of query_hybrid: BM25 search within the same scope.
+        
+        Returns:
+            (query_bm25 results, timings with 'bm25_search_ms', 'bm25_fetch_ms' and 'sparse_leg_ms')
+        """
+        start = time.perf_counter()
+        timings = {}
+        bm25_results = self.query_bm25(query, k=k, where=where, timings=timings)
+        timings['sparse_leg_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return bm25_results, timings
+    
+    def _ensure_sparse_index(self):
+        """Rebuild the sparse index once if it is missing or out of step with the collection.
+        
+        Covers libraries indexed before incremental BM25 updates existed and
+        indexes left behind by an interrupted write.
+        """
+        if self._sparse_checked:
+            return
+        # Concurrent queries wait for the first one's check (and rebuild) to finish
+        with self._sparse_check_lock:
+            if self._sparse_checked:
+                return
             try:
-                with open(self.bm25_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.bm25_index = data['index']
-                    self.bm25_corpus = data['corpus']
-                    self.bm25_ids = data['ids']
+                in_sync = len(self.sparse_index) == self.collection.count()
             except Exception as e:
                 print(f"Error loading BM25 index: {e}")
-                self.bm25_index = None
+                in_sync = False
+            if not in_sync:
+                print("BM25 index missing or out of date, rebuilding from the collection...")
+                self.build_bm25_index()
+            self._sparse_checked = True
     
-    def _save_bm25_index(self):
-        """Save BM25 index to disk."""
-        if self.bm25_index is not None:
-            try:
-                with open(self.bm25_path, 'wb') as f:
-                    pickle.dump({
-                        'index': self.bm25_index,
-                        'corpus': self.bm25_corpus,
-                        'ids': self.bm25_ids
-                    }, f)
-            except Exception as e:
-                print(f"Error saving BM25 index: {e}")
+    def save_bm25_index(self):
+        """Persist pending BM25 index updates (call after a batch of add_chunks/delete_item)."""
+        try:
+            self.sparse_index.save()
+        except Exception as e:
+            print(f"Error saving BM25 index: {e}")
     
-    def build_bm25_index(self):
-        """Build BM25 index from all documents in ChromaDB."""
-        # Get all documents from ChromaDB
-        all_docs = self.collection.get()
-        
-        if not all_docs['ids']:
-            print("No documents in collection to index")
-            return
-        
-        # Tokenize documents (simple whitespace tokenization)
-        corpus = []
-        for doc in all_docs['documents']:
-            tokens = doc.lower().split()
-            corpus.append(tokens)
+    def build_bm25_index(self, page_size: int = 5000):
+        """Rebuild the BM25 index from scratch from all documents in ChromaDB.
         
-        # Build BM25 index
-        self.bm25_corpus = corpus
-        self.bm25_ids = all_docs['ids']
-        self.bm25_index = BM25Okapi(corpus)
+        Normal indexing keeps the index up to date incrementally; this is only
+        needed to migrate or repair it.
+        """
+        self.sparse_index.clear()
+        total = 0
+        # Page through documents only; embeddings are not needed for BM25
+        for page in self.iter_chunks(["documents", "metadatas"], page_size):
+            item_ids = [(m or {}).get("item_id", "") for m in page['metadatas']]
+            self.sparse_index.add(page['ids'], page['documents'], item_ids)
+            total += len(page['ids'])
+        self.sparse_index.save(compact=True)
+        self._sparse_checked = True
         
-        # Save index
-        self._save_bm25_index()
-        print(f"BM25 index built with {len(corpus)} documents")
+        if os.path.exists(self.bm25_path):
+            os.remove(self.bm25_path)
+        print(f"BM25 index built with {total} documents")
 
     def sync_db(self,
         items: Iterable[Any],  
@@ -265,6 +541,7 @@ class ChromaClient:
         docs: List[str] = []
         metas: List[Dict[str, Any]] = []
         embeddings: List[List[float]] = []
+        item_metadata: Dict[str, Dict[str, Any]] = {}
 
         for item in items:
             text = getattr(item, "metadata", {}).get("text") or item.get("text") if isinstance(item, dict) else None
@@ -280,24 +557,20 @@ class ChromaClient:
                 doc_id = f"{str(item_id)}:{str(idx)}"
                 ids_batch.append(doc_id)
                 docs_batch.append(ch)
-
-                title = meta_src.get("title") or ""
-                authors = meta_src.get("authors") or ""
-                tags = meta_src.get("tags") or ""
-                collections = meta_src.get("collections") or ""
-                year = meta_src.get("date") or ""
-                pdf_path = meta_src.get("pdf_path") or ""
-
                 metas_batch.append({
                     "item_id": str(item_id),
                     "chunk_idx": int(idx),
-                    "title": title,
-                    "authors": authors,
-                    "tags": tags,
-                    "collections": collections,
-                    "year": year,
-                    "pdf_path": pdf_path,
                 })
+
+            # Bibliographic fields are stored once per item, not per chunk
+            item_metadata[str(item_id)] = {
+                "title": meta_src.get("title") or "",
+                "authors": meta_src.get("authors") or "",
+                "tags": meta_src.get("tags") or "",
+                "collections": meta_src.get("collections") or "",
+                "year": meta_src.get("date") or "",
+                "pdf_path": meta_src.get("pdf_path") or "",
+            }
             ids += ids_batch
             docs += docs_batch
             metas += metas_batch
@@ -310,7 +583,8 @@ class ChromaClient:
                 ids=[str(i) for i in ids],
                 documents=docs,
                 metadatas=metas,
-                embeddings=embeddings if embed_fn is not None else None
+                embeddings=embeddings if embed_fn is not None else None,
+                item_metadata=item_metadata,
             )
 
     def get_or_create_db(self):
@@ -330,19 +604,112 @@ class ChromaClient:
         Returns:
             Set of item_id strings
         """
-        # Get all documents with their metadata
-        all_data = self.collection.get()
+        self._ensure_manifest()
+        return self.manifest.item_ids()
+    
+    def get_indexed_fingerprints(self) -> Dict[str, str]:
+        """
+        Get the fingerprint recorded for each indexed item.
+        
+        Items indexed before fingerprints were recorded map to an empty string.
+        
+        Returns:
+            Dict mapping item_id to fingerprint
+        """
+        self._ensure_manifest()
+        return self.manifest.fingerprints()
+    
+    def get_indexed_pdf_fingerprints(self) -> Dict[str, str]:
+        """
+        Get the fingerprint of the PDF each indexed item was extracted from.
+        
+        Items indexed before PDF fingerprints were recorded map to an empty string.
+        
+        Returns:
+            Dict mapping item_id to PDF fingerprint
+        """
+        self._ensure_manifest()
+        return self.manifest.pdf_fingerprints()
+    
+    def get_items_metadata(self, item_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the bibliographic fields of indexed items from the item table.
+        
+        Args:
+            item_ids: Zotero item IDs
+            
+        Returns:
+            Dict mapping item_id to its fields; items without an entry are omitted
+        """
+        self._ensure_manifest()
+        return self.manifest.get_items_metadata(item_ids)
+    
+    def update_item_metadata(self, item_id: str, fingerprint: str, fields: Dict[str, Any]) -> None:
+        """
+        Replace an indexed item's bibliographic fields and fingerprint without
+        touching its chunks (e.g. after a metadata-only edit in Zotero).
         
-        if not all_data['metadatas']:
-            return set()
+        Args:
+            item_id: The Zotero item ID
+            fingerprint: The item's new fingerprint
+            fields: Bibliographic fields (see ITEM_FIELDS)
+        """
+        self._ensure_manifest()
+        self.manifest.update_item(str(item_id), fingerprint, fields)
+    
+    def get_index_stats(self) -> Dict[str, int]:
+        """
+        Get the number of indexed items and chunks from the manifest.
         
-        # Extract unique item_ids from metadata
-        item_ids = set()
-        for metadata in all_data['metadatas']:
-            if metadata and 'item_id' in metadata:
-                item_ids.add(metadata['item_id'])
+        Returns:
+            Dict with 'items' and 'chunks'
+        """
+        self._ensure_manifest()
+        return self.manifest.stats()
+    
+    def index_version(self) -> int:
+        """
+        Counter that changes whenever items are written to or removed from the index.
         
-        return item_ids
+        Returns:
+            The manifest's write count since the store was opened
+        """
+        self._ensure_manifest()
+        return self.manifest.version
+    
+    def _ensure_manifest(self):
+        """Rebuild the item manifest once if it is out of step with the collection.
+        
+        Covers libraries indexed before the manifest existed and writes
+        interrupted between Chroma and the manifest.
+        """
+        if self._manifest_checked:
+            return
+        with self._manifest_check_lock:
+            if self._manifest_checked:
+                return
+            if self.manifest.stats()["chunks"] != self.collection.count():
+                print("Index manifest missing or out of date, rebuilding from the collection...")
+                self.build_manifest()
+            self._manifest_checked = True
+    
+    def build_manifest(self, page_size: int = 5000):
+        """Rebuild the item manifest from the chunk metadata in the collection.
+        
+        Chunks written before the item table existed also carry the items'
+        bibliographic fields, which are copied into it.
+        """
+        chunks = {}
+        legacy_metadata = {}
+        for page in self.iter_chunks(["metadatas"], page_size):
+            for item_id, (count, fingerprint) in count_chunks(page['metadatas']).items():
+                total, previous = chunks.get(item_id, (0, ""))
+                chunks[item_id] = (total + count, previous or fingerprint)
+            for metadata in page['metadatas']:
+                if metadata and 'title' in metadata and str(metadata.get('item_id')) not in legacy_metadata:
+                    legacy_metadata[str(metadata['item_id'])] = item_fields(metadata)
+        self.manifest.replace_all(chunks, legacy_metadata)
+        print(f"Index manifest built with {len(chunks)} items")
     
     def item_exists(self, item_id: str) -> bool:
         """
@@ -354,12 +721,8 @@ class ChromaClient:
         Returns:
             True if item exists, False otherwise
         """
-        # Query for any chunk with this item_id
-        results = self.collection.get(
-            where={"item_id": str(item_id)},
-            limit=1
-        )
-        return len(results['ids']) > 0
+        self._ensure_manifest()
+        return self.manifest.get_item(str(item_id)) is not None
     
     def get_item_metadata(self, item_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -369,15 +732,18 @@ class ChromaClient:
             item_id: The Zotero item ID
             
         Returns:
-            Metadata dict or None if not found
+            Metadata dict (a chunk's metadata joined with the item's fields) or
+            None if not found
         """
         results = self.collection.get(
             where={"item_id": str(item_id)},
-            limit=1
+            limit=1,
+            include=["metadatas"]
         )
         
         if results['metadatas']:
-            return results['metadatas'][0]
+            fields = self.get_items_metadata([str(item_id)]).get(str(item_id), {})
+            return {**results['metadatas'][0], **fields}
         return None
     
     def delete_item(self, item_id: str) -> int:
@@ -390,15 +756,19 @@ class ChromaClient:
         Returns:
             Number of chunks deleted
         """
+        self._ensure_manifest()
         # Get all chunk IDs for this item
         results = self.collection.get(
-            where={"item_id": str(item_id)}
+            where={"item_id": str(item_id)},
+            include=[]
         )
         
         if results['ids']:
             self.collection.delete(ids=results['ids'])
-            return len(results['ids'])
-        return 0
+            self.sparse_index.remove(results['ids'])
+        self.manifest.remove_item(str(item_id))
+        self.item_embeddings.discard(str(item_id))
+        return len(results['ids'])
 
     def embed_chunks(self, chunks: List[str], embed_fn) -> List[List[float]]:
         """
@@ -447,3 +817,233 @@ class ChromaClient:
             "model": MODEL_NAME,
             "document_count": len(sample['ids'])
         }
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all ChromaClients for hybrid query legs (created on first use)."""
+    global _retrieval_executor
+    with _retrieval_executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+            )
+        return _retrieval_executor
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[tuple]:
+    """Fuse ranked id lists by reciprocal rank: score(id) = sum of 1 / (k + rank).
+    
+    Args:
+        rankings: Id lists, best first
+        k: Rank offset damping the weight of the top ranks
+        
+    Returns:
+        List of (id, score) tuples sorted by score (descending); ties keep
+        the order in which ids were first seen
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def _item_scope(where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+    """Item IDs a Chroma where-filter restricts results to, or None if it does not restrict items.
+    
+    Understands {"item_id": id}, {"item_id": {"$eq": id}} and {"item_id": {"$in": [...]}}.
+    """
+    if not where or "item_id" not in where:
+        return None
+    condition = where["item_id"]
+    if isinstance(condition, dict):
+        if "$in" in condition:
+            return [str(i) for i in condition["$in"]]
+        if "$eq" in condition:
+            return [str(condition["$eq"])]
+        return None
+    return [str(condition)]
+
+
+class ItemEmbeddingCache:
+    """
+    LRU cache of per-item chunk embeddings for scoped exact search.
+
+    Entries are (chunk ids, normalized float32 matrix) and are evicted least
+    recently used first once their total size exceeds max_bytes. Writers
+    discard an item after changing its chunks; loads started before a discard
+    are not cached (see version), so a stale read cannot outlive the change.
+    """
+
+    def __init__(self, max_bytes: int = ITEM_EMBEDDING_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.version = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, item_id: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(item_id)
+            if entry is not None:
+                self._entries.move_to_end(item_id)
+            return entry
+
+    def put(self, item_id: str, chunk_ids: List[str], matrix: np.ndarray, version: int) -> None:
+        """Cache an item's embeddings loaded while the cache was at the given version."""
+        with self._lock:
+            if version != self.version or matrix.nbytes > self.max_bytes:
+                return
+            self._pop(item_id)
+            self._entries[item_id] = (chunk_ids, matrix)
+            self.nbytes += matrix.nbytes
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def discard(self, item_id: str) -> None:
+        with self._lock:
+            self.version += 1
+            self._pop(item_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _pop(self, item_id: str) -> None:
+        entry = self._entries.pop(item_id, None)
+        if entry is not None:
+            self.nbytes -= entry[1].nbytes
+
+
+class ChunkWriteBuffer:
+    """
+    Collects chunks from many items and writes them to Chroma in large batches.
+
+    Writing each item separately costs one Chroma transaction and HNSW insert
+    round per paper; buffering amortizes that across items. Items are reported
+    to on_flush only once all of their chunks have been written, so callers can
+    checkpoint them safely. Call flush() when the job ends or is cancelled.
+
+    With an embed function, items can be added without vectors: their chunks
+    are embedded together with those of the following items once
+    embed_batch_size are waiting (and before every write), so short papers
+    do not each cost a partly filled encoder batch.
+    """
+
+    def __init__(
+        self,
+        client: ChromaClient,
+        batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+        on_flush=None,
+        embed=None,
+        embed_batch_size: int = 32,
+    ):
+        """
+        Args:
+            client: ChromaClient to write to
+            batch_size: Buffered chunks that trigger a flush (capped by Chroma's max batch size)
+            on_flush: Optional callable receiving the list of item IDs written by a flush
+            embed: Optional callable mapping a list of texts to their vectors (one list per text)
+            embed_batch_size: Chunks waiting for vectors that trigger an embed() call
+        """
+        self.client = client
+        self.batch_size = max(1, min(batch_size, client.max_write_batch_size()))
+        self.on_flush = on_flush
+        self.embed = embed
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.flushes = 0
+        self.written = 0
+        self.embed_calls = 0
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        # Vectors of the leading chunks; the chunks after them wait for embed()
+        self._embeddings: List[List[float]] = []
+        self._items: List[str] = []
+        # Number of buffered chunks up to and including each item in _items
+        self._item_ends: List[int] = []
+        self._item_metadata: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self,
+        item_id: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Optional[List[List[float]]] = None,
+        item_metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Buffer the chunks of one item (possibly none), flushing once the batch is full.
+        
+        embeddings may be None if the buffer has an embed function.
+        item_metadata holds the item's own fields (see ChromaClient.add_chunks).
+        """
+        if embeddings is None and ids and self.embed is None:
+            raise ValueError("ChunkWriteBuffer without an embed function needs the chunks' embeddings")
+        if embeddings is not None:
+            # Keep the embedded chunks ahead of those still waiting
+            self._embed_pending()
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._metadatas.extend(metadatas)
+        if embeddings is not None:
+            self._embeddings.extend(embeddings)
+        self._items.append(item_id)
+        self._item_ends.append(len(self._ids))
+        if item_metadata is not None:
+            self._item_metadata[item_id] = item_metadata
+        if len(self._ids) - len(self._embeddings) >= self.embed_batch_size:
+            self._embed_pending()
+        if len(self._ids) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Embed the chunks still waiting, then write all buffered chunks in batches of at most batch_size."""
+        self._embed_pending()
+        for start in range(0, len(self._ids), self.batch_size):
+            end = start + self.batch_size
+            self.client.add_chunks(
+                ids=self._ids[start:end],
+                documents=self._documents[start:end],
+                metadatas=self._metadatas[start:end],
+                embeddings=self._embeddings[start:end],
+                item_metadata=self._item_metadata,
+            )
+            self.flushes += 1
+        self.written += len(self._ids)
+        items = self._items
+        self._ids, self._documents, self._metadatas, self._embeddings, self._items = [], [], [], [], []
+        self._item_ends = []
+        self._item_metadata = {}
+        if items and self.on_flush is not None:
+            self.on_flush(items)
+
+    def _embed_pending(self) -> None:
+        """Compute the vectors of the chunks waiting for them.
+        
+        If embed() fails, the items that were not fully embedded are dropped
+        from the buffer (so a later flush writes and reports only complete
+        items) and the error is raised.
+        """
+        if len(self._embeddings) == len(self._ids):
+            return
+        try:
+            vectors = self.embed(self._documents[len(self._embeddings):])
+        except Exception:
+            kept = sum(1 for end in self._item_ends if end <= len(self._embeddings))
+            keep_chunks = self._item_ends[kept - 1] if kept else 0
+            for dropped in self._items[kept:]:
+                self._item_metadata.pop(dropped, None)
+            self._items, self._item_ends = self._items[:kept], self._item_ends[:kept]
+            del self._ids[keep_chunks:], self._documents[keep_chunks:], self._metadatas[keep_chunks:]
+            del self._embeddings[keep_chunks:]
+            raise
+        self._embeddings.extend(vectors)
+        self.embed_calls += 1
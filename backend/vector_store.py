@@ -0,0 +1,122 @@
+# vector_store.py
+"""
+Interface shared by the vector store backends, and the registry that maps the
+vectorBackend profile setting to one of them.
+
+A backend is a class implementing VectorStore with two classmethods:
+- open(base_path, embedding_model_id, options): the store of one embedding
+  model under a profile's chromaPath (options are the profile settings)
+- list_collections(base_path): the stores of every model found there
+
+ChromaClient ("chroma") and FlatVectorClient ("flat") are registered here.
+New storage engines usually subclass ChromaClient and override
+_open_collection with an object offering Chroma's collection methods (as
+FlatVectorClient does), which keeps BM25, the item manifest and hybrid
+retrieval working unchanged. The chatbot and API only go through
+open_vector_store and list_vector_collections.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol, runtime_checkable
+
+import numpy as np
+
+from backend.vector_db import ChromaClient
+from backend.flat_vector_store import FlatVectorClient
+
+DEFAULT_VECTOR_BACKEND = "chroma"
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """Chunk storage and dense search for one embedding model."""
+
+    embedding_model_id: str
+    collection_name: str
+
+    def add_chunks(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        item_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """Store chunks with their vectors (chunks whose id already exists are skipped)."""
+        ...
+
+    def delete_item(self, item_id: str) -> int:
+        """Remove every chunk of an item and return how many there were."""
+        ...
+
+    def query_vectors(self, query_embedding: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Nearest chunks by cosine distance, as a Chroma query result."""
+        ...
+
+    def get_chunks(self, ids: List[str], include: Iterable[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        """Chunks by id, in the order of ids."""
+        ...
+
+    def get_document_count(self) -> int:
+        """Number of stored chunks."""
+        ...
+
+    def iter_chunks(self, include: Iterable[str] = ("documents", "metadatas"), page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Pages of every stored chunk."""
+        ...
+
+    def max_write_batch_size(self) -> int:
+        """Largest number of chunks accepted by one add_chunks() call."""
+        ...
+
+    def index_version(self) -> int:
+        """Counter that changes whenever items are written to or removed from the store."""
+        ...
+
+    def close(self) -> None:
+        """Persist pending index updates and release open files; the store is not used afterwards."""
+        ...
+
+
+# Backend name (the vectorBackend setting) -> class
+VECTOR_BACKENDS: Dict[str, type] = {}
+
+
+def register_vector_backend(name: str, backend: type) -> None:
+    """Make a VectorStore class selectable as vectorBackend=name."""
+    VECTOR_BACKENDS[name] = backend
+
+
+register_vector_backend("chroma", ChromaClient)
+register_vector_backend("flat", FlatVectorClient)
+
+
+def get_vector_backend(name: str) -> type:
+    if name not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {name} (available: {', '.join(sorted(VECTOR_BACKENDS))})")
+    return VECTOR_BACKENDS[name]
+
+
+def open_vector_store(
+    backend: str,
+    base_path: str,
+    embedding_model_id: str,
+    options: Optional[Dict[str, Any]] = None,
+) -> VectorStore:
+    """
+    Open the vector store of an embedding model with the selected backend.
+
+    Args:
+        backend: Registered backend name (the vectorBackend setting)
+        base_path: The profile's chromaPath
+        embedding_model_id: Embedding model whose store to open
+        options: Profile settings read by the backend (e.g. flatVectorDtype)
+
+    Returns:
+        The opened store
+    """
+    return get_vector_backend(backend).open(base_path, embedding_model_id, options)
+
+
+def list_vector_collections(backend: str, base_path: str) -> List[Dict[str, Any]]:
+    """Stores of every embedding model under base_path for a backend (see ChromaClient.list_collections)."""
+    return get_vector_backend(backend).list_collections(base_path)
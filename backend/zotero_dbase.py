@@ -90,6 +90,22 @@ class ZoteroLibrary:
             return cur.fetchall()
     
 
+    def library_version(self):
+        """Cheap signature of the database that changes whenever Zotero writes to it.
+        
+        Returns:
+            Tuple of the size and modification time of the database file and
+            of its write-ahead log, if any
+        """
+        version = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+                version += [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                version += [None, None]
+        return tuple(version)
+
     def search_parent_items_with_pdfs(self, 
                                       authors=None, 
                                       titles=None, 
@@ -113,7 +129,10 @@ class ZoteroLibrary:
             GROUP_CONCAT(DISTINCT t.name) AS tags,
             GROUP_CONCAT(DISTINCT c.collectionName) AS collections,
             att.key AS attachment_key,
-            att_path.path AS attachment_path
+            att_path.path AS attachment_path,
+            i.dateModified AS date_modified,
+            i.version AS version,
+            att.dateModified AS attachment_date_modified
         FROM items i
         JOIN itemCreators ic ON i.itemID = ic.itemID
         JOIN creators cr ON ic.creatorID = cr.creatorID
@@ -166,7 +185,10 @@ class ZoteroLibrary:
                 'collections': item[6],    
                 'attachment_key': item[7],
                 'attachment_path': item[8],
-                'pdf_path': pdf_full_path
+                'pdf_path': pdf_full_path,
+                'date_modified': item[9],
+                'version': item[10],
+                'attachment_date_modified': item[11]
             }
             zotero_items.append(ZoteroItem(filepath=pdf_full_path, metadata=metadata))
         return zotero_items
@@ -1,5 +1,7 @@
 #zotero_item.py
 import fitz
+import hashlib
+import os
 from backend.external_api_utils import fetch_google_book_reviews, fetch_semantic_scholar_data
 
 class ZoteroItem:
@@ -52,6 +54,39 @@ class ZoteroItem:
             print(f"Metadata extraction error (author): {e}")
         return "Unknown author"
 
+    def fingerprint(self):
+        """Short hash identifying the current version of this item and its PDF.
+
+        Combines Zotero's modification stamps (item and attachment dateModified,
+        item version) with the PDF's size and mtime, so it changes when the
+        metadata is edited or the attachment file is replaced.
+        """
+        parts = [
+            self.metadata.get("date_modified"),
+            self.metadata.get("version"),
+            self.metadata.get("attachment_date_modified"),
+        ]
+        try:
+            stat = os.stat(self.filepath)
+            parts += [stat.st_size, stat.st_mtime_ns]
+        except (OSError, TypeError):
+            parts += [None, None]
+        return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+    def pdf_fingerprint(self):
+        """Short hash identifying the current version of the PDF alone.
+
+        Unlike fingerprint(), it does not change when only the item's
+        metadata is edited, so such edits can be applied without re-embedding.
+        """
+        parts = [self.metadata.get("attachment_date_modified")]
+        try:
+            stat = os.stat(self.filepath)
+            parts += [stat.st_size, stat.st_mtime_ns]
+        except (OSError, TypeError):
+            parts += [None, None]
+        return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
     def get_reviews(self):
         # Placeholder: Implement review lookup later (requires more context)
         if self.metadata.get("type") == "book":